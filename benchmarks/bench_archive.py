@@ -0,0 +1,97 @@
+# ページアーカイブのベンチマーク
+# benchmarks/fixtures/ の作品ページを movie_id を変えて --pages 件アーカイブ (movie_page_archive.py) に保存し、
+#   保存          : PageArchive.append の速度と圧縮率
+#   再抽出 N      : --from-archive と同じ方法 (読み出し + extract_movie_details) で N ワーカーで抽出し直す速度
+# を測る。再抽出の結果が保存前のページを直接解析した結果と一致することも確認し、50,000 ページの所要時間を見積もる。
+#
+# 使い方: python benchmarks/bench_archive.py --pages 2000 --workers 1 2 4
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scrapers import html_parser, parse_pool, structured_data # noqa: E402
+from movie_page_archive import PageArchive, extract_archived # noqa: E402
+from benchmarks.bench_encoding import FIXTURE_URLS # noqa: E402
+from benchmarks.bench_parser import PARSERS, load_fixture # noqa: E402
+
+DETAIL_FIXTURES = [name for name in PARSERS if name.endswith('_detail')]
+ESTIMATE_PAGES = 50000
+
+
+def build_archive(directory, pages):
+    """フィクスチャを順に繰り返して pages 件保存し、(エントリ, 期待する抽出結果, 保存秒数, 元のバイト数, 圧縮後のバイト数) を返す"""
+    contents = {name: load_fixture(name) for name in DETAIL_FIXTURES}
+    expected = {name: PARSERS[name](contents[name], FIXTURE_URLS[name], 'utf-8') for name in DETAIL_FIXTURES}
+    archive = PageArchive(directory)
+    start = time.perf_counter()
+    for i in range(pages):
+        name = DETAIL_FIXTURES[i % len(DETAIL_FIXTURES)]
+        archive.append(name, str(i), FIXTURE_URLS[name], contents[name], 'utf-8')
+    elapsed = time.perf_counter() - start
+    entries = []
+    for name in DETAIL_FIXTURES:
+        entries += [(name, entry) for entry in archive.latest_entries(name).values()]
+    stats = archive.stats
+    archive.close()
+    return entries, expected, elapsed, stats['stored_bytes'], stats['compressed_bytes']
+
+
+def reextract(entries, workers):
+    """--from-archive と同じく、先読みを workers * 4 件に抑えて順に結果を受け取る"""
+    if workers <= 1:
+        return [extract_archived(PARSERS[name], path, offset, length) for name, (_, path, offset, length) in entries]
+    results = []
+    with parse_pool.ParsePool(workers) as pool:
+        pending = deque()
+        for name, (_, path, offset, length) in entries:
+            pending.append(pool.submit_task(extract_archived, PARSERS[name], path, offset, length))
+            if len(pending) >= workers * 4:
+                results.append(pending.popleft().result())
+        results += [future.result() for future in pending]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ページアーカイブへの保存と、アーカイブからの再抽出の速度を測る')
+    parser.add_argument('--pages', type=int, default=1500, help='アーカイブするページ数 (デフォルト: 1500)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='再抽出のワーカー数 (複数指定可, 1 は同一プロセス)')
+    parser.add_argument('--parser', default=None, choices=html_parser.BACKENDS, help='HTMLパーサー (デフォルト: lxml があれば lxml)')
+    parser.add_argument('--structured-data', default=structured_data.DEFAULT_MODE, choices=structured_data.MODES,
+                        help='構造化データの利用方法 (デフォルト: merge)')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    html_parser.configure(args.parser)
+    structured_data.configure(args.structured_data)
+
+    directory = tempfile.mkdtemp(prefix='bench_archive_')
+    try:
+        entries, expected, elapsed, stored_bytes, compressed_bytes = build_archive(directory, args.pages)
+        print(f"パーサー: {html_parser.get_backend()}, 構造化データ: {structured_data.get_mode()}, "
+              f"CPUコア数: {parse_pool.default_workers()}, ページ数: {len(entries)}")
+        print(f"保存: {len(entries) / elapsed:.0f} pages/sec, {stored_bytes / 1024 ** 2:.1f}MB -> "
+              f"{compressed_bytes / 1024 ** 2:.1f}MB (圧縮率 {compressed_bytes / stored_bytes * 100:.1f}%)")
+        print(f"{'再抽出':<12} {'pages/sec':>10} {f'{ESTIMATE_PAGES:,}ページ':>14}")
+        mismatches = 0
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = reextract(entries, workers)
+            rate = len(entries) / (time.perf_counter() - start)
+            mismatches += sum(result != expected[name] for (name, _), result in zip(entries, results))
+            label = '同一プロセス' if workers <= 1 else f'プロセス {workers}'
+            print(f"{label:<12} {rate:>10.1f} {ESTIMATE_PAGES / rate / 60:>11.1f} 分")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"パリティチェック: {'OK' if mismatches == 0 else f'{mismatches} 件の不一致'}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
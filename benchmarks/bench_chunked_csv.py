@@ -0,0 +1,119 @@
+# 分割読み込み (--chunk-size) のベンチマーク
+# 合成した作品カタログのCSV (Shift_JIS) を
+#   全体        : load_csv -> check_and_add_columns -> reorder_columns -> save_csv (従来の読み込み・保存)
+#   分割 N      : scan_csv_dtypes -> iter_csv_chunks (N 行ずつ) -> check_and_add_columns -> CsvChunkWriter
+# で読み込み・保存し、処理時間とピークメモリ (プロセスの最大RSS) を比較する。
+# 各方式は別プロセスで実行し、出力CSVが全体読み込みの出力とバイト単位で一致することも確認する。
+#
+# 使い方: python benchmarks/bench_chunked_csv.py --rows 1000000 --chunk-sizes 10000 100000
+
+import argparse
+import filecmp
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_scraper_utils as utils # noqa: E402
+
+
+def make_csv(path, rows, seed=0):
+    """半分ほどの項目が欠損した作品カタログのCSVを作る (year は空欄を含むため全体では float になる列)"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'movie_id': [f"{i:07d}" for i in range(rows)],
+        'title': [f"作品{i}" for i in range(rows)],
+        'year': np.where(rng.random(rows) < 0.5, rng.integers(1950, 2025, rows), None),
+        'director': np.where(rng.random(rows) < 0.5, '既存の監督', None),
+        'summary': np.where(rng.random(rows) < 0.3, '既存のあらすじ。' * 5, None),
+        'memo': np.where(rng.random(rows) < 0.1, 'メモ', None),
+    })
+    df.to_csv(path, encoding='shift_jis', index=False)
+
+
+def run_full(input_path, output_path):
+    df = utils.load_csv(input_path)
+    df = utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+    utils.save_csv(utils.reorder_columns(df, utils.DEFAULT_OUTPUT_COLUMNS), output_path)
+
+
+def run_chunked(input_path, output_path, chunk_size):
+    dtypes, schema, _ = utils.scan_csv_dtypes(input_path, chunk_size)
+    with utils.CsvChunkWriter(output_path) as writer:
+        for chunk in utils.iter_csv_chunks(input_path, chunk_size, dtypes):
+            chunk = utils.check_and_add_columns(chunk, utils.DEFAULT_OUTPUT_COLUMNS, schema)
+            writer.write(utils.reorder_columns(chunk, utils.DEFAULT_OUTPUT_COLUMNS))
+
+
+def measure(input_path, output_path, chunk_size):
+    """別プロセスで1方式を実行し、(秒数, 最大RSS(MB)) を返す"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', input_path, output_path, str(chunk_size)]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    elapsed, max_rss_kb = result.stdout.split()
+    return float(elapsed), int(max_rss_kb) / 1024
+
+
+def peak_rss_kb():
+    """このプロセスの最大RSS (KB)。ru_maxrss は exec 前の親プロセスの値を引き継ぐため、Linux では VmHWM を使う"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(input_path, output_path, chunk_size):
+    logging.disable(logging.WARNING)
+    start = time.perf_counter()
+    if chunk_size > 0:
+        run_chunked(input_path, output_path, chunk_size)
+    else:
+        run_full(input_path, output_path)
+    print(time.perf_counter() - start, peak_rss_kb())
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+    parser = argparse.ArgumentParser(description='CSVの全体読み込みと分割読み込みの処理時間・ピークメモリを比較する')
+    parser.add_argument('--rows', type=int, default=1000000, help='カタログの行数 (デフォルト: 1000000)')
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[10000, 100000], help='分割読み込みの行数 (複数指定可)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench_chunked_csv_')
+    try:
+        input_path = os.path.join(directory, 'catalogue.csv')
+        make_csv(input_path, args.rows)
+        print(f"行数: {args.rows:,}, 入力CSV: {os.path.getsize(input_path) / 1024 ** 2:.1f}MB")
+        print(f"{'方式':<14} {'秒':>8} {'最大RSS(MB)':>12} {'出力':>6}")
+        full_output = os.path.join(directory, 'full.csv')
+        elapsed, rss = measure(input_path, full_output, 0)
+        print(f"{'全体':<14} {elapsed:>8.2f} {rss:>12.1f} {'-':>6}")
+        mismatches = 0
+        for chunk_size in args.chunk_sizes:
+            output = os.path.join(directory, f"chunked_{chunk_size}.csv")
+            elapsed, rss = measure(input_path, output, chunk_size)
+            same = filecmp.cmp(full_output, output, shallow=False)
+            mismatches += not same
+            print(f"{f'分割 {chunk_size:,}':<14} {elapsed:>8.2f} {rss:>12.1f} {'一致' if same else '不一致':>6}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"パリティチェック: {'OK' if mismatches == 0 else f'{mismatches} 件の不一致'}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# 文字コード方針のベンチマーク
+# benchmarks/fixtures/ の保存済みページを次の形に変えて、
+#   meta UTF-8      : そのまま (<meta charset="utf-8"> あり)
+#   header UTF-8    : <meta charset> を除き、文字コードは Content-Type ヘッダーのみ
+#   meta Shift_JIS  : Shift_JIS (cp932) に変換し、<meta charset="Shift_JIS"> を宣言
+#   header Shift_JIS: Shift_JIS に変換し、文字コードは Content-Type ヘッダーのみ
+# bytes のまま BeautifulSoup に渡して文字コードを推定させる従来の方法と、
+# scrapers/page_encoding.py で決めた文字コードを渡す方法 (ホストごとに記憶) の1ページあたりの時間を比較する。
+# 両者の抽出結果が一致することも確認する。
+#
+# 使い方: python benchmarks/bench_encoding.py --iterations 10 --parser lxml
+
+import argparse
+import gc
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scrapers import html_parser, page_encoding, structured_data # noqa: E402
+from benchmarks.bench_parser import PARSERS, load_fixture # noqa: E402
+
+# フィクスチャ名 -> ページのURL (ホストごとの記憶に使う)
+FIXTURE_URLS = {
+    'eiga_com_search': 'https://eiga.com/search/test',
+    'eiga_com_detail': 'https://eiga.com/movie/100001/',
+    'yahoo_search': 'https://search.yahoo.co.jp/movie?p=test',
+    'yahoo_detail': 'https://movies.yahoo.co.jp/movie/100001/',
+    'filmarks_search': 'https://filmarks.com/search/movies?q=test',
+    'filmarks_detail': 'https://filmarks.com/movies/100001',
+}
+META_CHARSET = re.compile(rb'<meta charset="[^"]*">')
+
+
+def variants(content):
+    """(変形名, 本文, Content-Type ヘッダー) を返す"""
+    no_meta = META_CHARSET.sub(b'', content, count=1)
+    sjis_meta = META_CHARSET.sub(b'<meta charset="Shift_JIS">', content, count=1)
+    to_sjis = lambda b: b.decode('utf-8').encode('cp932', errors='xmlcharrefreplace') # noqa: E731
+    return [
+        ('meta UTF-8', content, 'text/html'),
+        ('header UTF-8', no_meta, 'text/html; charset=utf-8'),
+        ('meta Shift_JIS', to_sjis(sjis_meta), 'text/html'),
+        ('header Shift_JIS', to_sjis(no_meta), 'text/html; charset=Shift_JIS'),
+    ]
+
+
+def compare(func_a, func_b, iterations, repeat=7):
+    """2つの処理を交互に測り (iterations 回の平均を repeat 回)、それぞれの最小値を返す。
+    差が小さいため、交互に測って負荷の変動や GC の影響をそろえる"""
+    best = [None, None]
+    for _ in range(repeat):
+        for i, func in enumerate([func_a, func_b]):
+            gc.collect()
+            start = time.perf_counter()
+            for _ in range(iterations):
+                func()
+            elapsed = (time.perf_counter() - start) / iterations
+            best[i] = elapsed if best[i] is None else min(best[i], elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文字コード推定ありの解析と、既知の文字コードを指定した解析を比較する')
+    parser.add_argument('--iterations', type=int, default=10, help='1回の測定あたりの解析回数 (7回測って最小値を使う, デフォルト: 10)')
+    parser.add_argument('--parser', default=None, choices=html_parser.BACKENDS, help='HTMLパーサー (デフォルト: lxml があれば lxml)')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    html_parser.configure(args.parser)
+    structured_data.configure('off') # HTML解析の時間を比較する
+
+    mismatches = 0
+    totals = {}
+    print(f"パーサー: {html_parser.get_backend()}")
+    print(f"{'fixture':<18} {'変形':<18} {'推定 ms':>9} {'既知 ms':>9} {'短縮 ms':>9}")
+    for name, parse in PARSERS.items():
+        url = FIXTURE_URLS[name]
+        for label, content, content_type in variants(load_fixture(name)):
+            page_encoding.forget(url)
+            expected = parse(content)
+            result = parse(content, encoding=page_encoding.encoding_for(url, content, content_type)) # ホストの文字コードを記憶させる
+            if result != expected:
+                mismatches += 1
+                print(f"  不一致: {name} / {label}")
+            sniffed, known = compare(lambda: parse(content),
+                                     lambda: parse(content, encoding=page_encoding.encoding_for(url, content, content_type)),
+                                     args.iterations)
+            total = totals.setdefault(label, [0.0, 0.0])
+            total[0] += sniffed
+            total[1] += known
+            print(f"{name:<18} {label:<18} {sniffed * 1000:>9.2f} {known * 1000:>9.2f} {(sniffed - known) * 1000:>9.2f}")
+    print()
+    for label, (sniffed, known) in totals.items():
+        pages = len(PARSERS)
+        print(f"{label:<18} 1ページあたり {(sniffed - known) / pages * 1000:>6.2f} ms 短縮 ({(1 - known / sniffed) * 100:>5.1f}%)")
+    print(f"パリティチェック: {'OK' if mismatches == 0 else f'{mismatches} 件の不一致'}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
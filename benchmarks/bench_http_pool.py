@@ -0,0 +1,50 @@
+# 接続プールの効果を測定するベンチマーク
+# ローカルスタブサーバーに対して、素の requests.get と共有セッション (http_client.fetch) の
+# pages/sec を比較する。レート制限 (scrapers.rate_limiter) は無効にして、接続の再利用の効果だけを測る。
+#
+# 使い方: python benchmarks/bench_http_pool.py --requests 500
+
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scrapers import http_client, rate_limiter # noqa: E402
+from benchmarks.stub_server import start_stub_server # noqa: E402
+
+
+def bench(label, fetch, base_url, count):
+    start = time.perf_counter()
+    for i in range(count):
+        response = fetch(f"{base_url}/movie/{i}")
+        response.raise_for_status()
+        _ = response.content
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count:>6} pages  {elapsed:8.3f}s  {count / elapsed:10.1f} pages/sec")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='接続プールあり/なしの取得速度を比較する')
+    parser.add_argument('--requests', type=int, default=300, help='リクエスト数 (デフォルト: 300)')
+    parser.add_argument('--delay', type=float, default=0.0, help='スタブサーバーの応答遅延秒数 (デフォルト: 0)')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(delay=args.delay)
+    try:
+        headers = http_client.HEADERS
+        no_pool = bench('requests.get (プールなし)', lambda url: requests.get(url, headers=headers, timeout=15), base_url, args.requests)
+        http_client.configure(pool_size=10)
+        rate_limiter.configure(rate=0) # スタブサーバー (127.0.0.1) はデフォルトの 2 リクエスト/秒に制限される
+        pooled = bench('http_client.fetch (プール)', http_client.fetch, base_url, args.requests)
+        print(f"速度比: {no_pool / pooled:.2f}x")
+    finally:
+        http_client.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# DataFrame反映処理のベンチマーク
+# 合成した作品カタログに取得データを反映し、従来のセル単位の .loc 更新と
+# 列単位の一括反映 (utils.merge_records) の処理時間を比較する。
+# 従来方式は行数に比例して遅いため、--legacy-max-rows を超える規模では
+# その行数で測った1行あたりの時間から推定値を表示する。
+#
+# 使い方: python benchmarks/bench_merge.py --rows 10000 100000 1000000
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_scraper_utils as utils # noqa: E402
+
+
+def make_catalogue(rows, seed=0):
+    """半分ほどの項目が欠損した作品カタログ (movie_id インデックス) を作る"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'movie_id': [f"{i:07d}" for i in range(rows)], 'title': [f"作品{i}" for i in range(rows)]})
+    df = utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+    has_year = rng.random(rows) < 0.5
+    df.loc[has_year, 'year'] = 2000
+    has_director = rng.random(rows) < 0.5
+    df.loc[has_director, 'director'] = '既存の監督'
+    return df.set_index('movie_id')
+
+
+def make_records(rows, seed=1):
+    """全作品分の取得データ (スクレイパーの戻り値と同じ形の辞書)"""
+    rng = np.random.default_rng(seed)
+    years = rng.integers(1950, 2025, rows)
+    return [{
+        'movie_id': f"{i:07d}",
+        'title': f"作品{i}",
+        'year': int(years[i]),
+        'director': f"監督{i % 997}",
+        'summary': f"あらすじ{i}",
+        'runtime': 90 + i % 60,
+        'cast': "俳優A, 俳優B",
+        'full_cast': [{'name': '俳優A', 'role': '主演'}],
+    } for i in range(rows)]
+
+
+def legacy_merge(df_indexed, records):
+    """従来の1レコード・1セルずつの更新 (比較用)"""
+    update_count = 0
+    for details in records:
+        movie_id = details['movie_id']
+        updated = False
+        for col, value in details.items():
+            if col in df_indexed.columns and col not in ['movie_id', 'title'] and value is not None:
+                if pd.isna(df_indexed.loc[movie_id, col]):
+                    if col in utils.JSON_COLUMNS:
+                        df_indexed.loc[movie_id, col] = json.dumps(value, ensure_ascii=False)
+                    elif col in utils.NUMERIC_COLUMNS:
+                        df_indexed.loc[movie_id, col] = int(value)
+                    else:
+                        df_indexed.loc[movie_id, col] = str(value)
+                    updated = True
+        update_count += updated
+    return update_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='セル単位の更新と一括反映の処理時間を比較する')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000], help='カタログの行数 (複数指定可)')
+    parser.add_argument('--legacy-max-rows', type=int, default=10000, help='従来方式を実際に実行する最大行数。超える場合は推定値 (デフォルト: 10000)')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    columns = [col for col in utils.DEFAULT_OUTPUT_COLUMNS if col not in ['movie_id', 'title']]
+    print(f"{'rows':>9}  {'従来 (.loc)':>14}  {'一括反映':>10}  {'高速化':>8}  更新行数")
+    legacy_per_row = None
+    for rows in args.rows:
+        records = make_records(rows)
+
+        df_bulk = make_catalogue(rows)
+        start = time.perf_counter()
+        bulk_count = int(utils.merge_records(df_bulk, records, columns).sum())
+        bulk_time = time.perf_counter() - start
+
+        legacy_rows = min(rows, args.legacy_max_rows)
+        if legacy_rows == rows or legacy_per_row is None:
+            df_legacy = make_catalogue(rows)
+            start = time.perf_counter()
+            legacy_count = legacy_merge(df_legacy, records[:legacy_rows])
+            legacy_per_row = (time.perf_counter() - start) / legacy_rows
+            if legacy_rows == rows:
+                assert legacy_count == bulk_count, (legacy_count, bulk_count)
+                assert df_legacy.equals(df_bulk), "反映結果が一致しません"
+        legacy_time = legacy_per_row * rows
+        estimated = '' if legacy_rows == rows else ' (推定)'
+        print(f"{rows:>9}  {legacy_time:>11.2f}s{estimated:<3}  {bulk_time:>9.2f}s  {legacy_time / bulk_time:>7.0f}x  {bulk_count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# 解析ワーカープロセス数のベンチマーク
+# benchmarks/fixtures/ の作品ページを繰り返し解析し、ワーカー数ごとの解析スループット (pages/sec) を比較する。
+#   同一プロセス: 取得と同じプロセスで1件ずつ解析 (--parse-workers 0 相当)
+#   スレッド N  : N スレッドで解析 (GIL のため CPU コア数が多くても伸びない)
+#   プロセス N  : scrapers/parse_pool.py の N ワーカープロセスで解析 (--parse-workers N 相当)
+# ワーカーの起動時間は別に表示し、スループットには含めない。解析結果が同一プロセスと一致することも確認する。
+#
+# 使い方: python benchmarks/bench_parse_pool.py --pages 400 --workers 1 2 4 8 16
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scrapers import html_parser, parse_pool, structured_data # noqa: E402
+from benchmarks.bench_parser import PARSERS, load_expected, load_fixture # noqa: E402
+
+DETAIL_FIXTURES = [name for name in PARSERS if name.endswith('_detail')]
+
+
+def make_jobs(pages):
+    """(フィクスチャ名, 解析関数, HTML) を pages 件分、フィクスチャを順に繰り返して作る"""
+    contents = {name: load_fixture(name) for name in DETAIL_FIXTURES}
+    return [(name, PARSERS[name], contents[name]) for name in (DETAIL_FIXTURES * (pages // len(DETAIL_FIXTURES) + 1))[:pages]]
+
+
+def run_in_process(jobs):
+    return [parse(content) for _, parse, content in jobs]
+
+
+def run_threads(jobs, workers):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda job: job[1](job[2]), jobs))
+
+
+def run_processes(pool, jobs):
+    futures = [pool.submit(parse, content) for _, parse, content in jobs]
+    return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='解析ワーカー数ごとの作品ページ解析スループットを比較する')
+    parser.add_argument('--pages', type=int, default=300, help='1測定あたりの解析ページ数 (デフォルト: 300)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='ワーカー数 (複数指定可)')
+    parser.add_argument('--parser', default=None, choices=html_parser.BACKENDS, help='HTMLパーサー (デフォルト: lxml があれば lxml)')
+    parser.add_argument('--structured-data', default='off', choices=structured_data.MODES,
+                        help='構造化データの利用方法 (デフォルト: off = 毎回HTMLを解析)')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    html_parser.configure(args.parser)
+    structured_data.configure(args.structured_data)
+
+    jobs = make_jobs(args.pages)
+    expected = load_expected()
+    print(f"パーサー: {html_parser.get_backend()}, 構造化データ: {structured_data.get_mode()}, "
+          f"CPUコア数: {parse_pool.default_workers()}, ページ数: {len(jobs)}")
+    print(f"{'方式':<14} {'pages/sec':>10} {'対同一プロセス':>14} {'起動 s':>8}")
+
+    start = time.perf_counter()
+    results = run_in_process(jobs)
+    base_rate = len(jobs) / (time.perf_counter() - start)
+    if structured_data.get_mode() == 'off':
+        mismatches = sum(result != expected[name] for (name, _, _), result in zip(jobs, results))
+    else:
+        mismatches = 0 # fast / merge の結果は expected.json (HTML解析のみ) と異なるため、同一プロセスの結果を基準にする
+    print(f"{'同一プロセス':<12} {base_rate:>10.1f} {1.0:>13.1f}x {'':>8}")
+
+    max_workers = max(args.workers)
+    start = time.perf_counter()
+    thread_results = run_threads(jobs, max_workers)
+    rate = len(jobs) / (time.perf_counter() - start)
+    mismatches += sum(a != b for a, b in zip(thread_results, results))
+    print(f"{'スレッド ' + str(max_workers):<14} {rate:>10.1f} {rate / base_rate:>13.1f}x {'':>8}")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        with parse_pool.ParsePool(workers) as pool:
+            # 全ワーカーを起動させてから測定する
+            run_processes(pool, jobs[:workers * 2])
+            startup = time.perf_counter() - start
+            start = time.perf_counter()
+            pool_results = run_processes(pool, jobs)
+            rate = len(jobs) / (time.perf_counter() - start)
+        mismatches += sum(a != b for a, b in zip(pool_results, results))
+        print(f"{'プロセス ' + str(workers):<14} {rate:>10.1f} {rate / base_rate:>13.1f}x {startup:>8.2f}")
+
+    print(f"パリティチェック: {'OK' if mismatches == 0 else f'{mismatches} 件の不一致'}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# HTMLパーサーのベンチマーク兼パリティチェック
+# benchmarks/fixtures/ の保存済みページを各バックエンド (lxml / html.parser) で解析し、
+# 1. 抽出結果が expected.json (従来の html.parser 実装での出力) と一致するか確認する
+# 2. 1ページあたりの解析時間を比較する
+#
+# 使い方: python benchmarks/bench_parser.py --iterations 50
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scrapers import eiga_com_scraper, filmarks_scraper, html_parser, structured_data, yahoo_eiga_scraper # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# フィクスチャ名 -> 解析関数 (ネットワークアクセスなし)
+PARSERS = {
+    'eiga_com_search': eiga_com_scraper.parse_search_results,
+    'eiga_com_detail': eiga_com_scraper.extract_movie_details,
+    'yahoo_search': yahoo_eiga_scraper.parse_search_results,
+    'yahoo_detail': yahoo_eiga_scraper.extract_movie_details,
+    'filmarks_search': filmarks_scraper.parse_search_results,
+    'filmarks_detail': filmarks_scraper.extract_movie_details,
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, f"{name}.html"), 'rb') as f:
+        return f.read()
+
+
+def load_expected():
+    with open(os.path.join(FIXTURES_DIR, 'expected.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_parity(backends):
+    """全バックエンドの抽出結果が expected.json と一致するか確認し、不一致の件数を返す"""
+    expected = load_expected()
+    mismatches = 0
+    for backend in backends:
+        html_parser.configure(backend)
+        for name, parse in PARSERS.items():
+            result = parse(load_fixture(name))
+            if result != expected[name]:
+                mismatches += 1
+                print(f"  不一致: {backend} / {name}")
+                if isinstance(result, dict):
+                    for key in result:
+                        if result[key] != expected[name].get(key):
+                            print(f"    {key}: {result[key]!r} != {expected[name].get(key)!r}")
+                else:
+                    print(f"    {result!r} != {expected[name]!r}")
+    return mismatches
+
+
+def bench(backends, iterations):
+    print(f"{'fixture':<18} {'KB':>6}" + ''.join(f" {backend + ' (ms)':>18}" for backend in backends))
+    totals = dict.fromkeys(backends, 0.0)
+    for name, parse in PARSERS.items():
+        content = load_fixture(name)
+        row = f"{name:<18} {len(content) / 1024:>6.0f}"
+        for backend in backends:
+            html_parser.configure(backend)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                parse(content)
+            per_page = (time.perf_counter() - start) / iterations
+            totals[backend] += per_page
+            row += f" {per_page * 1000:>18.2f}"
+        print(row)
+    print(f"{'合計':<16} {'':>6}" + ''.join(f" {totals[backend] * 1000:>18.2f}" for backend in backends))
+    if len(backends) > 1:
+        base = totals[backends[-1]]
+        for backend in backends[:-1]:
+            print(f"{backend} は {backends[-1]} の {base / totals[backend]:.1f} 倍速")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTMLパーサーのバックエンドごとの抽出結果と解析時間を比較する')
+    parser.add_argument('--iterations', type=int, default=30, help='1フィクスチャあたりの解析回数 (デフォルト: 30)')
+    parser.add_argument('--backends', nargs='+', default=html_parser.BACKENDS, choices=html_parser.BACKENDS, help='比較するバックエンド')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    structured_data.configure('off') # HTML解析そのものを比較する (JSON-LD による省略なし)
+    if 'lxml' in args.backends and not html_parser.LXML_AVAILABLE:
+        print("lxml がインストールされていないため、html.parser のみ測定します。")
+        args.backends = ['html.parser']
+
+    mismatches = check_parity(args.backends)
+    print(f"パリティチェック: {'OK' if mismatches == 0 else f'{mismatches} 件の不一致'} ({', '.join(args.backends)})\n")
+    bench(args.backends, args.iterations)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
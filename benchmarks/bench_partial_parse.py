@@ -0,0 +1,67 @@
+# 部分解析 (Region 指定) のベンチマーク
+# benchmarks/fixtures/ の保存済みページについて、ページ全体を木にする従来の解析と
+# 各サイトが宣言した領域だけを木にする部分解析の、1ページあたりの解析時間とピークメモリを比較する。
+# 抽出結果が expected.json と一致することも確認する。
+#
+# 使い方: python benchmarks/bench_partial_parse.py --iterations 30 --parser lxml
+
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scrapers import html_parser, structured_data # noqa: E402
+from benchmarks.bench_parser import PARSERS, load_expected, load_fixture # noqa: E402
+
+
+def measure(parse, content, iterations):
+    """(1ページあたりの秒数, ピークメモリのバイト数, 抽出結果) を返す"""
+    tracemalloc.start()
+    result = parse(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(content)
+    return (time.perf_counter() - start) / iterations, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ページ全体の解析と部分解析の解析時間・ピークメモリを比較する')
+    parser.add_argument('--iterations', type=int, default=30, help='1フィクスチャあたりの解析回数 (デフォルト: 30)')
+    parser.add_argument('--parser', default=None, choices=html_parser.BACKENDS, help='HTMLパーサー (デフォルト: lxml があれば lxml)')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    structured_data.configure('off') # HTML解析そのものを比較する (JSON-LD による省略なし)
+
+    expected = load_expected()
+    mismatches = 0
+    print(f"パーサー: {args.parser or html_parser.DEFAULT_BACKEND}")
+    print(f"{'fixture':<18} {'KB':>5}  {'全体 ms':>9} {'部分 ms':>9} {'比':>6}  {'全体 MB':>9} {'部分 MB':>9} {'比':>6}")
+    totals = {'full': [0.0, 0], 'partial': [0.0, 0]}
+    for name, parse in PARSERS.items():
+        content = load_fixture(name)
+        results = {}
+        for mode in ['full', 'partial']:
+            html_parser.configure(args.parser, partial=(mode == 'partial'))
+            elapsed, peak, result = measure(parse, content, args.iterations)
+            results[mode] = (elapsed, peak)
+            totals[mode][0] += elapsed
+            totals[mode][1] = max(totals[mode][1], peak)
+            if result != expected[name]:
+                mismatches += 1
+                print(f"  不一致: {name} ({mode})")
+        (full_time, full_peak), (part_time, part_peak) = results['full'], results['partial']
+        print(f"{name:<18} {len(content) / 1024:>5.0f}  {full_time * 1000:>9.2f} {part_time * 1000:>9.2f} {full_time / part_time:>5.1f}x"
+              f"  {full_peak / 1024 ** 2:>9.2f} {part_peak / 1024 ** 2:>9.2f} {full_peak / part_peak:>5.1f}x")
+    print(f"{'合計 / 最大':<16} {'':>5}  {totals['full'][0] * 1000:>9.2f} {totals['partial'][0] * 1000:>9.2f} "
+          f"{totals['full'][0] / totals['partial'][0]:>5.1f}x  {totals['full'][1] / 1024 ** 2:>9.2f} {totals['partial'][1] / 1024 ** 2:>9.2f}")
+    print(f"パリティチェック: {'OK' if mismatches == 0 else f'{mismatches} 件の不一致'}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# 列の型 (utils.COLUMN_DTYPES) のメモリベンチマーク
+# 合成した作品カタログのCSV (Shift_JIS) を読み込み、
+#   object : 出力列をすべて object 型にする従来の列準備 (check_and_add_columns の旧動作)
+#   スキーマ: check_and_add_columns で COLUMN_DTYPES (Int16/Int32, pyarrow の文字列, カテゴリ) に変換
+# の2通りで、DataFrameのメモリ使用量 (memory_usage(deep=True))、ピークメモリ (プロセスの最大RSS)、
+# 読み込み時間と取得データの反映 (utils.merge_records) の時間を比較する。各方式は別プロセスで実行する。
+#
+# 使い方: python benchmarks/bench_schema_memory.py --rows 1000000 --records 100000
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_scraper_utils as utils # noqa: E402
+from benchmarks.bench_chunked_csv import peak_rss_kb # noqa: E402
+
+COUNTRIES = ['日本', 'アメリカ', 'イギリス', 'フランス', '韓国', '中国', '香港', 'イタリア', 'ドイツ', 'インド']
+DISTRIBUTORS = [f"配給会社{i}" for i in range(200)]
+
+
+def _sometimes(rng, rows, rate, values):
+    """rate の割合で values、それ以外は欠損の配列"""
+    return np.where(rng.random(rows) < rate, values, None)
+
+
+def make_csv(path, rows, seed=0):
+    """半分ほどの項目が埋まった作品カタログのCSVを作る (取得済みの行と未取得の行が混ざった状態)"""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(rows)
+    staff = json.dumps({'監督': [{'name': '監督名', 'role': ''}], '脚本': [{'name': '脚本家名', 'role': ''}]}, ensure_ascii=False)
+    cast = json.dumps([{'name': '俳優A', 'role': '主演'}, {'name': '俳優B', 'role': '相棒'}], ensure_ascii=False)
+    df = pd.DataFrame({
+        'movie_id': [f"{i:07d}" for i in ids],
+        'title': [f"作品{i}" for i in ids],
+        'year': _sometimes(rng, rows, 0.5, rng.integers(1950, 2025, rows)),
+        'director': _sometimes(rng, rows, 0.5, [f"監督{i % 20000}" for i in ids]),
+        'summary': _sometimes(rng, rows, 0.5, [f"作品{i}のあらすじ。" + '主人公が旅に出る。' * 4 for i in ids]),
+        'cast': _sometimes(rng, rows, 0.5, '俳優A, 俳優B, 俳優C'),
+        'producer': _sometimes(rng, rows, 0.3, '製作者A'),
+        'cinematographer': _sometimes(rng, rows, 0.3, '撮影者A'),
+        'country': _sometimes(rng, rows, 0.5, rng.choice(COUNTRIES, rows)),
+        'runtime': _sometimes(rng, rows, 0.5, rng.integers(60, 180, rows)),
+        'distributor': _sometimes(rng, rows, 0.5, rng.choice(DISTRIBUTORS, rows)),
+        'full_staff': _sometimes(rng, rows, 0.3, staff),
+        'full_cast': _sometimes(rng, rows, 0.3, cast),
+        'reviews': _sometimes(rng, rows, 0.3, '{"average_score": 3.5, "review_count": 12}'),
+    })
+    df.to_csv(path, encoding='shift_jis', index=False)
+
+
+def make_records(rows, count, seed=1):
+    """取得データ (スクレイパーの戻り値と同じ形の辞書) を count 件作る"""
+    rng = np.random.default_rng(seed)
+    return [{
+        'movie_id': f"{i:07d}",
+        'year': int(rng.integers(1950, 2025)),
+        'director': f"監督{i % 20000}",
+        'summary': f"作品{i}のあらすじ。",
+        'country': COUNTRIES[i % len(COUNTRIES)],
+        'runtime': 90 + i % 60,
+        'distributor': f"新しい配給会社{i % 50}",
+        'full_cast': [{'name': '俳優A', 'role': '主演'}],
+    } for i in rng.choice(rows, count, replace=False)]
+
+
+def load_object(path):
+    df = utils.load_csv(path)
+    df = utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS, schema=None)
+    for col in utils.DEFAULT_OUTPUT_COLUMNS:
+        if col != 'movie_id':
+            df[col] = df[col].astype(object)
+    return df
+
+
+def load_typed(path):
+    df = utils.load_csv(path)
+    return utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+
+
+def child(mode, input_path, records_count):
+    logging.disable(logging.WARNING)
+    start = time.perf_counter()
+    df = load_typed(input_path) if mode == 'typed' else load_object(input_path)
+    load_time = time.perf_counter() - start
+    memory = df.memory_usage(deep=True).sum()
+
+    records = make_records(len(df), records_count)
+    df_indexed = df.set_index('movie_id')
+    del df
+    columns = [col for col in utils.DEFAULT_OUTPUT_COLUMNS if col not in ['movie_id', 'title']]
+    start = time.perf_counter()
+    updated = int(utils.merge_records(df_indexed, records, columns).sum())
+    merge_time = time.perf_counter() - start
+    print(load_time, memory, merge_time, updated, peak_rss_kb())
+
+
+def measure(mode, input_path, records_count):
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode, input_path, str(records_count)]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    load_time, memory, merge_time, updated, max_rss_kb = result.stdout.split()
+    return float(load_time), int(memory) / 1024 ** 2, float(merge_time), int(updated), int(max_rss_kb) / 1024
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+    parser = argparse.ArgumentParser(description='object 型と列の型 (COLUMN_DTYPES) のメモリ使用量を比較する')
+    parser.add_argument('--rows', type=int, default=1000000, help='カタログの行数 (デフォルト: 1000000)')
+    parser.add_argument('--records', type=int, default=100000, help='反映する取得データの件数 (デフォルト: 100000)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench_schema_memory_')
+    try:
+        input_path = os.path.join(directory, 'catalogue.csv')
+        make_csv(input_path, args.rows)
+        print(f"行数: {args.rows:,}, 入力CSV: {os.path.getsize(input_path) / 1024 ** 2:.1f}MB, "
+              f"文字列の型: {utils.TEXT_DTYPE} ({'pyarrow' if utils.pyarrow is not None else 'pyarrow なし'})")
+        print(f"{'方式':<8} {'DataFrame(MB)':>14} {'最大RSS(MB)':>12} {'読み込み(秒)':>12} {'反映(秒)':>9} {'更新行数':>8}")
+        results = {}
+        for mode, label in [('object', 'object'), ('typed', 'スキーマ')]:
+            load_time, memory, merge_time, updated, rss = measure(mode, input_path, args.records)
+            results[mode] = memory
+            print(f"{label:<8} {memory:>14.1f} {rss:>12.1f} {load_time:>12.2f} {merge_time:>9.2f} {updated:>8}")
+        print(f"DataFrameのメモリ: {results['typed'] / results['object']:.0%} (object 型比)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
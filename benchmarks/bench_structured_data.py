@@ -0,0 +1,84 @@
+# 構造化データ (JSON-LD / OpenGraph) 高速抽出のベンチマーク
+# benchmarks/fixtures/ の作品ページについて、HTMLを解析する従来の抽出 (off)、
+# JSON-LD で埋まらなかった項目とキャストの領域だけHTMLを解析する抽出 (merge, デフォルト)、
+# JSON-LD で埋まらなかった項目の領域だけHTMLを解析する抽出 (fast) の1ページあたりの時間を比較し、
+# 各モードでHTMLを解析した項目 (structured_data.dom_fields) を表示する。
+# merge / fast の抽出結果が HTML解析の結果 (expected.json) の項目を落とさず、
+# merge では比較対象の項目 (cast / full_cast を含む) が一致することを確認する。
+#
+# 使い方: python benchmarks/bench_structured_data.py --iterations 5
+
+import argparse
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scrapers import html_parser, structured_data # noqa: E402
+from benchmarks.bench_parser import PARSERS, load_expected, load_fixture # noqa: E402
+
+DETAIL_FIXTURES = [name for name in PARSERS if name.endswith('_detail')]
+CONSISTENT_FIELDS = ['year', 'director', 'summary', 'runtime', 'reviews', 'cast', 'full_cast']
+MODES = ['off', structured_data.DEFAULT_MODE, 'fast']
+ROUNDS = 10
+
+
+def html_fields(parse, content, mode):
+    """mode の抽出でHTMLを解析する項目 (JSON-LD で埋まらなかった項目など)"""
+    scraper = sys.modules[parse.__module__]
+    details = dict.fromkeys(scraper.COVERAGE)
+    details.update(structured_data.extract_json_ld(content.decode('utf-8', errors='replace')))
+    return structured_data.dom_fields(details, scraper.COVERAGE, mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML解析のみの抽出と構造化データ優先の抽出の時間を比較する')
+    parser.add_argument('--iterations', type=int, default=5, help='1フィクスチャ・1回の計測あたりの抽出回数 (デフォルト: 5)')
+    parser.add_argument('--parser', default=None, choices=html_parser.BACKENDS, help='HTMLパーサー (デフォルト: lxml があれば lxml)')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    html_parser.configure(args.parser)
+
+    expected = load_expected()
+    mismatches = 0
+    print(f"パーサー: {html_parser.get_backend()}, デフォルト: {structured_data.DEFAULT_MODE}")
+    print(f"{'fixture':<18} " + ' '.join(f"{mode + ' ms':>10}" for mode in MODES))
+    totals = dict.fromkeys(MODES, 0.0)
+    for name in DETAIL_FIXTURES:
+        parse, content = PARSERS[name], load_fixture(name)
+        results = {}
+        for mode in MODES:
+            structured_data.configure(mode)
+            results[mode] = parse(content)
+        # 計測のばらつきを避けるため、モードを交互に ROUNDS 回ずつ計測し、それぞれの最小値を使う
+        timings = dict.fromkeys(MODES, float('inf'))
+        for _ in range(ROUNDS):
+            for mode in MODES:
+                structured_data.configure(mode)
+                elapsed = timeit.timeit(lambda: parse(content), number=args.iterations)
+                timings[mode] = min(timings[mode], elapsed / args.iterations)
+        for mode in MODES:
+            totals[mode] += timings[mode]
+        print(f"{name:<18} " + ' '.join(f"{timings[mode] * 1000:>10.2f}" for mode in MODES))
+        for mode in MODES[1:]:
+            fields = html_fields(parse, content, mode)
+            print(f"  {mode}: HTMLを解析した項目 {', '.join(fields) if fields else 'なし (HTML解析を省略)'}")
+            # JSON-LD 優先の抽出で HTML解析より項目が減っていないこと
+            lost = [field for field, value in results[mode].items() if value is None and expected[name][field] is not None]
+            if lost:
+                mismatches += len(lost)
+                print(f"  未取得 ({mode}): {', '.join(lost)}")
+        result = results[structured_data.DEFAULT_MODE]
+        for field in CONSISTENT_FIELDS:
+            if result[field] is not None and result[field] != expected[name][field]:
+                mismatches += 1
+                print(f"  不一致: {name} / {field}: {result[field]!r} != {expected[name][field]!r}")
+    print(f"{'合計':<16} " + ' '.join(f"{totals[mode] * 1000:>10.2f}" for mode in MODES))
+    print(f"一致チェック ({structured_data.DEFAULT_MODE}: {', '.join(CONSISTENT_FIELDS)}, 全モード: 項目の欠落): "
+          f"{'OK' if mismatches == 0 else f'{mismatches} 件の不一致'}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
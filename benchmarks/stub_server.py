@@ -0,0 +1,46 @@
+# ベンチマーク用ローカルスタブHTTPサーバー
+# 固定のHTMLページを keep-alive (HTTP/1.1) で返す。
+
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BODY = ("<html><head><meta charset=\"utf-8\"><title>stub</title></head><body>"
+                + "<p>スタブページ</p>" * 200 + "</body></html>").encode('utf-8')
+
+
+def make_handler(body=DEFAULT_BODY, delay=0.0):
+    """指定した本文を返すリクエストハンドラクラスを作成する"""
+    import time
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # ヘッダーと本文の分割送信で Nagle + 遅延ACK の待ちが入らないようにする
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self):
+            if delay:
+                time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # ベンチマーク中はアクセスログを出さない
+
+    return StubHandler
+
+
+def start_stub_server(body=DEFAULT_BODY, delay=0.0):
+    """バックグラウンドスレッドでスタブサーバーを起動し、(server, base_url) を返す"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(body, delay))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
@@ -0,0 +1,57 @@
+# export_work_queue.py
+# --work-queue で複数のワーカーが処理した結果を入力CSVに反映し、Shift_JIS のCSVに書き出す。
+# 各ワーカーも終了時に同じ内容を --output に保存するが、ワーカーが途中で落ちた場合や
+# 複数サイトのキューをまとめる場合はこのスクリプトで書き出す。
+#
+# 使い方:
+#   python export_work_queue.py --queue queue.sqlite --input movies.csv --output movies_filled.csv
+#   python export_work_queue.py --queue queue.sqlite --input movies.csv --output movies_filled.csv --sites eiga.com,filmarks.com
+import argparse
+import logging
+import sys
+
+import movie_scraper_utils as utils
+import movie_scrape_runner as runner
+import movie_work_queue as work_queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description='作業キュー (--work-queue) の結果を入力CSVに反映してCSVに書き出す')
+    parser.add_argument('--queue', required=True, help='作業キューのSQLiteファイル')
+    parser.add_argument('--input', required=True, help='ワーカーに指定した入力CSV (Shift_JIS)')
+    parser.add_argument('--output', required=True, help='出力CSVファイルのパス (Shift_JIS)')
+    parser.add_argument('--sites', default=None,
+                        help='反映するサイト (カンマ区切り, 先に書いたサイトの値を優先, デフォルト: キューにある全サイトを登録順に)')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='ログレベル (デフォルト: INFO)')
+    args = parser.parse_args()
+    utils.setup_logging(args.log_level)
+
+    queue = work_queue.WorkQueue(args.queue)
+    try:
+        queued = queue.sites()
+        sites = [name.strip() for name in args.sites.split(',') if name.strip()] if args.sites else \
+            [name for name in runner.SITE_CONFIGS if name in queued]
+        unknown = [name for name in sites if name not in queued]
+        if unknown:
+            logging.error(f"作業キューに存在しないサイトです: {', '.join(unknown)} (キューにあるサイト: {', '.join(queued) or 'なし'})")
+            sys.exit(1)
+
+        df = utils.load_csv(args.input)
+        df = utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+        df_indexed = df.set_index('movie_id')
+        for name in sites:
+            label = runner.SITE_CONFIGS[name].label if name in runner.SITE_CONFIGS else name
+            counts = work_queue.log_counts(queue, name, label)
+            if counts[work_queue.STATE_PENDING] or counts[work_queue.STATE_LEASED]:
+                logging.warning(f"[{label}] 未完了の対象が残っています (完了した結果のみ反映します)。")
+        updated = work_queue.apply_results(df_indexed, queue, sites)
+    finally:
+        queue.close()
+
+    df_output = utils.reorder_columns(df_indexed.reset_index(), utils.DEFAULT_OUTPUT_COLUMNS)
+    utils.save_csv(df_output, args.output)
+    logging.info(f"作業キューの結果 ({', '.join(sites)}) で {updated} 行を更新しました。")
+
+
+if __name__ == '__main__':
+    main()
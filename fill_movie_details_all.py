@@ -0,0 +1,109 @@
+# fill_movie_details_all.py
+# 登録済みの全サイト (映画.com, Yahoo!映画, Filmarks) に同時に問い合わせ、1回のCSV読み込み・保存で更新する。
+# サイトごとのスクリプトを順に実行する代わりに使う (movie_multi_site_runner.py)。
+import contextlib
+import logging
+import sys
+from datetime import datetime
+
+# --- 共通モジュールのインポート ---
+import movie_scraper_utils as utils
+import movie_scrape_runner as runner
+import movie_multi_site_runner as multi_site
+
+# --- メイン処理 ---
+def main():
+    # --- 引数処理 ---
+    parser = utils.setup_common_parser(description='登録済みの全サイトから映画の詳細情報を同時に取得・更新するスクリプト')
+    parser.add_argument('--limit', type=int, default=9999, help='Webから取得する場合に処理する最大映画数 (デフォルト: 9999, 無制限に近い値)')
+    parser.add_argument('--sites', default=','.join(runner.SITE_CONFIGS),
+                        help=f"問い合わせるサイト (カンマ区切り, 先に書いたサイトの値を優先, デフォルト: {','.join(runner.SITE_CONFIGS)})")
+    parser.add_argument('--fill-columns', nargs='+', default=None, choices=multi_site.FILL_COLUMNS, metavar='COLUMN',
+                        help='この列がすべて埋まったら残りのサイトへの問い合わせを打ち切る (デフォルト: movie_id, title 以外の全列)')
+    args = parser.parse_args()
+
+    # --- ロギング設定 ---
+    log_level = 'DEBUG' if args.debug else args.log_level
+    utils.setup_logging(log_level)
+    try:
+        sites = [runner.SITE_CONFIGS[name] for name in multi_site.parse_sites(args.sites)]
+    except ValueError as e:
+        logging.error(f"--sites の指定が不正です: {e}")
+        sys.exit(1)
+    if args.from_archive or args.work_queue:
+        logging.error("--from-archive / --work-queue はサイトごとのスクリプトで使用してください。")
+        sys.exit(1)
+    runner.configure_http(args)
+    runner.configure_parser(args)
+    logging.info(f"処理を開始します (全サイト: {', '.join(site.label for site in sites)})")
+
+    # --- 分割読み込みモード (--chunk-size, Web検索モードのみ) ---
+    if args.chunk_size > 0 and not args.json_input:
+        logging.info("Webスクレイピングによりデータを取得・更新します。")
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        with contextlib.ExitStack() as stack:
+            record_writers = {}
+            for site in sites:
+                json_output_filepath = utils.record_output_path(site.name, timestamp, args.output_format, args.compress,
+                                                                shard=args.shard)
+                logging.info(f"抽出データの保存先ファイル ({site.label}): {json_output_filepath}")
+                record_writers[site.name] = stack.enter_context(
+                    utils.RecordWriter(json_output_filepath, args.output_format, args.compress))
+            update_count = multi_site.run_multi_site_in_chunks(sites, args, record_writers)
+        logging.info(f"Webスクレイピングによるデータ更新を {update_count} 行に対して行いました。")
+        logging.info("すべての処理が完了しました。")
+        return
+    if args.chunk_size > 0:
+        logging.warning("--chunk-size はWeb検索モードでのみ使用します。CSV全体を読み込みます。")
+
+    # --- CSV読み込みと列準備 ---
+    df = utils.load_csv(args.input)
+    df = utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+
+    # --- 処理の分岐 (JSON入力モード / Web検索モード) ---
+    if args.json_input:
+        logging.info(f"--json-input オプション指定: {args.json_input}")
+        json_data = utils.load_json(args.json_input)
+        if json_data:
+            df['movie_id'] = df['movie_id'].astype(str)
+            df = utils.update_dataframe_from_json(df, json_data)
+        else:
+            logging.error("JSONデータの読み込みに失敗したため、処理を中断します。")
+            sys.exit(1)
+
+    else:
+        # --- Web検索モード ---
+        logging.info("Webスクレイピングによりデータを取得・更新します。")
+
+        target_df = runner.select_targets(df, None, args)
+
+        if not target_df.empty:
+            # 取得データはサイトごとのファイルへ1件ずつ書き出す
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            with contextlib.ExitStack() as stack:
+                record_writers = {}
+                for site in sites:
+                    json_output_filepath = utils.record_output_path(site.name, timestamp, args.output_format, args.compress,
+                                                                    shard=args.shard)
+                    logging.info(f"抽出データの保存先ファイル ({site.label}): {json_output_filepath}")
+                    record_writers[site.name] = stack.enter_context(
+                        utils.RecordWriter(json_output_filepath, args.output_format, args.compress))
+                df, update_count = multi_site.run_multi_site_scraping(df, target_df, sites, args, record_writers)
+
+            for site in sites:
+                if not record_writers[site.name].count:
+                    logging.info(f"{site.label}: JSONファイルへの保存対象となる有効なスクレイピングデータがありませんでした。")
+
+            logging.info(f"Webスクレイピングによるデータ更新を {update_count} 行に対して行いました。")
+
+        else:
+            logging.info("Webスクレイピングによる更新対象映画が見つかりませんでした。")
+
+    # --- 最終的なCSV保存 ---
+    df_output = utils.reorder_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+    utils.save_csv(df_output, args.output)
+
+    logging.info("すべての処理が完了しました。")
+
+if __name__ == '__main__':
+    main()
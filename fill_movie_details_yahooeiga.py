@@ -1,16 +1,13 @@
 # Yahoo!映画 詳細情報自動補完ツール
 
-import pandas as pd
 import logging
 import sys
-import time
 from datetime import datetime
 import argparse
-import json
 
 # --- 共通モジュールとサイト固有モジュールのインポート ---
 import movie_scraper_utils as utils
-from scrapers import yahoo_eiga_scraper # Yahoo!用のスクレイパーをインポート
+import movie_scrape_runner as runner
 
 # --- メイン処理 ---
 def main():
@@ -18,12 +15,13 @@ def main():
     parser = utils.setup_common_parser(description='Yahoo!映画 から映画の詳細情報を取得・更新するスクリプト')
     # Yahoo!映画固有の引数を追加 (映画.comと同じものを流用)
     parser.add_argument('--limit', type=int, default=9999, help='Webから取得する場合に処理する最大映画数 (デフォルト: 9999, 無制限に近い値)')
-    parser.add_argument('--wait', type=float, default=0.5, help='各映画処理後の待機時間(秒) (デフォルト: 0.5)') # Yahooは少し長めに設定
     args = parser.parse_args()
 
     # --- ロギング設定 ---
     log_level = 'DEBUG' if args.debug else args.log_level
     utils.setup_logging(log_level)
+    runner.configure_http(args)
+    runner.configure_parser(args)
     logging.info("処理を開始します (Yahoo!映画)")
 
     # --- JSON出力ファイル名 (Webスクレイピング時のみ) ---
@@ -31,8 +29,23 @@ def main():
     if not args.json_input:
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         # サイト名をファイル名に含める
-        json_output_filepath = f"MovieData_yahoo.co.jp_{timestamp}.json"
-        logging.info(f"抽出データの保存先JSONファイル: {json_output_filepath}")
+        json_output_filepath = utils.record_output_path('yahoo.co.jp', timestamp, args.output_format, args.compress, shard=args.shard,
+                                                        worker=args.worker_id if args.work_queue else None)
+        logging.info(f"抽出データの保存先ファイル: {json_output_filepath}")
+
+    # --- 分割読み込みモード (--chunk-size, Web検索モードのみ) ---
+    if args.chunk_size > 0 and not args.json_input:
+        logging.info("Webスクレイピングによりデータを取得・更新します。")
+        site = runner.SITE_CONFIGS['yahoo.co.jp']
+        with utils.RecordWriter(json_output_filepath, args.output_format, args.compress) as record_writer:
+            record_count, update_count = runner.run_web_scraping_in_chunks(site, args, record_writer)
+        if not record_count:
+            logging.info("JSONファイルへの保存対象となる有効なスクレイピングデータがありませんでした。")
+        logging.info(f"Webスクレイピングによるデータ更新を {update_count} 行に対して行いました。")
+        logging.info("すべての処理が完了しました。")
+        return
+    if args.chunk_size > 0:
+        logging.warning("--chunk-size はWeb検索モードでのみ使用します。CSV全体を読み込みます。")
 
     # --- CSV読み込みと列準備 ---
     df = utils.load_csv(args.input)
@@ -53,91 +66,15 @@ def main():
         # --- Web検索モード ---
         logging.info("Webスクレイピングによりデータを取得・更新します。")
 
-        missing_major_info_df = df[
-            df['year'].isna() | df['director'].isna() | df['summary'].isna()
-        ].copy()
-        target_df = missing_major_info_df.sort_values(by='movie_id').head(args.limit)
-
-        logging.info(f"主要情報(年,監督,あらすじ)のいずれかが未入力の映画を {len(target_df)} 件処理対象とします (最大{args.limit}件)。")
-
-        all_scraped_data = []
-        update_count = 0
+        site = runner.SITE_CONFIGS['yahoo.co.jp']
+        target_df = runner.select_targets(df, site, args)
 
         if not target_df.empty:
-            df_indexed = df.set_index('movie_id') # 文字列化済みのはず
-
-            for index, row in target_df.iterrows():
-                movie_id = str(row['movie_id'])
-                title = row['title']
-                logging.info(f"--- 処理開始: {title} (ID: {movie_id}) ---")
-
-                scraped_details = None
-                try:
-                    # 1. 検索実行 (Yahoo!用関数を呼び出し)
-                    movie_page_url = yahoo_eiga_scraper.search_yahoo_eiga(title)
-                    time.sleep(args.wait / 2)
-
-                    # 2. 詳細情報取得 (Yahoo!用関数を呼び出し)
-                    if movie_page_url:
-                        scraped_details = yahoo_eiga_scraper.scrape_movie_details(movie_page_url, debug_mode=args.debug)
-                        if scraped_details and any(v is not None for k, v in scraped_details.items() if k != 'source'):
-                             scraped_details['movie_id'] = movie_id
-                             scraped_details['title'] = title
-                             all_scraped_data.append(scraped_details)
-                        else:
-                             logging.warning(f"  -> 詳細情報の取得に失敗、または有効な情報がありませんでした。URL: {movie_page_url}")
-                             scraped_details = None
-
-                    # 3. DataFrame を直接更新 (ロジックは映画.comと同じ)
-                    if scraped_details and movie_id in df_indexed.index:
-                        updated_this_iteration = False
-                        update_log_messages = []
-                        for col, value in scraped_details.items():
-                            if col in df_indexed.columns and col not in ['movie_id', 'title', 'source'] and value is not None:
-                                if pd.isna(df_indexed.loc[movie_id, col]):
-                                    try:
-                                        log_message = f"{col}"
-                                        if col in ['full_staff', 'full_cast', 'reviews']:
-                                            df_indexed.loc[movie_id, col] = json.dumps(value, ensure_ascii=False)
-                                            log_message += "(JSON)"
-                                        elif col in ['year', 'runtime']:
-                                            df_indexed.loc[movie_id, col] = int(value)
-                                            log_message += f":{int(value)}"
-                                        else:
-                                            df_indexed.loc[movie_id, col] = str(value)
-                                            display_value = str(value)
-                                            if len(display_value) > 30: display_value = display_value[:27] + "..."
-                                            log_message += f":{display_value}"
-                                        updated_this_iteration = True
-                                        update_log_messages.append(log_message)
-                                    except Exception as e:
-                                        logging.warning(f"  -> [{movie_id}:{title}] 列'{col}'の更新中にエラー: {e} (値: {str(value)[:50]}...)")
-
-                        if updated_this_iteration:
-                             logging.info(f"  -> DataFrame更新: {', '.join(update_log_messages)}")
-                             update_count += 1
-                        else:
-                             logging.info(f"  -> スクレイピングデータは取得しましたが、DataFrameの更新対象（NaN）はありませんでした。")
-
-                    elif not movie_page_url:
-                        logging.warning(f"  -> Yahoo!映画で作品ページが見つかりませんでした。")
-                    elif movie_id not in df_indexed.index:
-                         logging.error(f"  -> 致命的エラー: movie_id '{movie_id}' がDataFrameインデックスに存在しません。")
-
-                except Exception as e:
-                    logging.error(f"  -> 映画'{title}' (ID:{movie_id}) の処理中に予期せぬエラーが発生: {e}", exc_info=args.debug)
-
-                finally:
-                     logging.info(f"--- 処理完了: {title} (ID: {movie_id}) ---")
-                     if index != target_df.index[-1]:
-                         logging.debug(f"次の映画の処理まで {args.wait}秒 待機します...")
-                         time.sleep(args.wait)
-
-            df = df_indexed.reset_index()
-
-            if all_scraped_data and json_output_filepath:
-                utils.save_json(all_scraped_data, json_output_filepath)
-            elif not target_df.empty:
+            # 取得データは1件ごとにファイルへ書き出す (全件をメモリに保持しない)
+            with utils.RecordWriter(json_output_filepath, args.output_format, args.compress) as record_writer:
+                df, record_count, update_count = runner.run_web_scraping(df, target_df, site, args, record_writer)
+
+            if not record_count:
                 logging.info("JSONファイルへの保存対象となる有効なスクレイピングデータがありませんでした。")
 
             logging.info(f"Webスクレイピングによるデータ更新を {update_count} 行に対して行いました。")
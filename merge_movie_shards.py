@@ -0,0 +1,76 @@
+# merge_movie_shards.py
+# --shard i/N で分担して実行した各シャードの出力をまとめ、1つのCSVにする。
+# - シャードの出力CSV: どれも入力CSVの全行を含み、担当した行だけが更新されているため、
+#   先頭のシャードを基準に、空欄のセルを他のシャードの値で埋める (書かれている値は文字列のまま引き継ぐ)
+# - 抽出データ (MovieData_<サイト名>_<日時>_shard<i>of<N>.json / .jsonl[.gz|.zst]): --records で指定すると
+#   --json-input と同じ方法で空欄のセルに反映する (シャードのCSVを持ち帰れなかった場合など)
+#
+# 使い方:
+#   python merge_movie_shards.py --output merged.csv out_shard0.csv out_shard1.csv out_shard2.csv
+#   python merge_movie_shards.py --input movies.csv --output merged.csv --records MovieData_eiga.com_*_shard*.jsonl
+import argparse
+import logging
+import sys
+
+import pandas as pd
+
+import movie_scraper_utils as utils
+
+
+def merge_shard_csvs(paths):
+    """シャードの出力CSVをまとめた DataFrame を返す (全列文字列)"""
+    merged = utils.load_csv(paths[0], as_text=True)
+    for path in paths[1:]:
+        shard = utils.load_csv(path, as_text=True)
+        if not shard['movie_id'].reset_index(drop=True).equals(merged['movie_id'].reset_index(drop=True)):
+            logging.error(f"'{path}' の movie_id の並びが '{paths[0]}' と一致しません (同じ入力CSVから作成したシャードの出力を指定してください)。")
+            sys.exit(1)
+        filled = 0
+        conflicts = 0
+        for col in shard.columns:
+            if col not in merged.columns:
+                merged[col] = pd.NA
+            values = shard[col].set_axis(merged.index)
+            fill = merged[col].isna() & values.notna()
+            conflicts += int((merged[col].notna() & values.notna() & (merged[col] != values)).sum())
+            merged.loc[fill, col] = values[fill]
+            filled += int(fill.sum())
+        logging.info(f"'{path}' から {filled} セルを反映しました。")
+        if conflicts:
+            logging.warning(f"'{path}' には先のシャードと異なる値が {conflicts} セルあります (先のシャードの値を使います)。")
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='--shard で分担して実行した各シャードの出力を1つのCSVにまとめる')
+    parser.add_argument('shards', nargs='*', help='各シャードの出力CSV (Shift_JIS)')
+    parser.add_argument('--output', required=True, help='まとめたCSVの出力先 (Shift_JIS)')
+    parser.add_argument('--input', default=None, help='シャードのCSVを指定しない場合の基準にする入力CSV (Shift_JIS)')
+    parser.add_argument('--records', nargs='+', default=[], help='反映する抽出データ (MovieData_*.json / .jsonl[.gz|.zst])')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='ログレベル (デフォルト: INFO)')
+    args = parser.parse_args()
+    utils.setup_logging(args.log_level)
+
+    if args.shards:
+        df = merge_shard_csvs(args.shards)
+    elif args.input:
+        df = utils.load_csv(args.input, as_text=True)
+    else:
+        logging.error("シャードの出力CSV、または --input を指定してください。")
+        sys.exit(1)
+    # 書かれている値を文字列のまま引き継ぐため、列の型は変換しない
+    df = utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS, schema=None)
+
+    for path in args.records:
+        json_data = utils.load_json(path)
+        if json_data is None:
+            sys.exit(1)
+        df = utils.update_dataframe_from_json(df, json_data)
+
+    df_output = utils.reorder_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+    utils.save_csv(df_output, args.output)
+    logging.info(f"{len(args.shards)} シャードのCSVと {len(args.records)} 件の抽出データをまとめました。")
+
+
+if __name__ == '__main__':
+    main()
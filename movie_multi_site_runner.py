@@ -0,0 +1,291 @@
+# Movie Multi-Site Runner
+# fill_movie_details_all.py 用。1タイトルを登録済みの全サイト (movie_scrape_runner.SITE_CONFIGS) へ同時に問い合わせ、
+# CSVの読み込み・保存を1回で済ませる。
+# - タイトルごとに各サイトの検索 -> 詳細取得を並行して行う (ホストごとの同時実行数は --concurrency)
+# - その行で欠損している列 (--fill-columns) がすべて埋まった時点で、残りのサイトへのリクエストを打ち切る
+#   (まだ送信していないリクエストは送らず、送信済みのものは結果を捨てる。http_client.cancellation)
+# - 欠損列をカバレッジ (movie_site_coverage.py) で埋められないサイトには問い合わせず、
+#   どのサイトも埋められない列は打ち切りの判定に含めない
+# - 同じタイトルの行は1回だけ問い合わせ、結果を各 movie_id に反映する (runner.dedupe_targets)
+# - 結果はサイトの優先順位 (--sites の順) で反映する。同じ列を複数のサイトが返した場合は優先順位の高いサイトの値を使う
+#   (打ち切ったサイトの結果は使わない)
+# - 各サイトの結果は取得直後にジャーナル (--journal) へサイト名付きで記録し、--resume では記録済みのサイトにだけ問い合わせない
+# 取得データは従来どおりサイトごとの MovieData_<サイト名>_<日時> に書き出す (--json-input でそのまま読み込める)。
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from scrapers import debug_capture, http_client, parse_pool
+import movie_scraper_utils as utils
+import movie_scrape_runner as runner
+import movie_run_journal as run_journal
+from movie_resolution_cache import ResolutionCache
+from movie_page_archive import PageArchive
+import movie_site_coverage as site_coverage
+
+# 打ち切りの判定に使う列 (--fill-columns のデフォルト)
+FILL_COLUMNS = runner.FILL_COLUMNS
+
+
+def parse_sites(value):
+    """'eiga.com,filmarks.com' 形式の文字列をサイト名のリスト (優先順位順) に変換する"""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in runner.SITE_CONFIGS]
+    if unknown or not names:
+        raise ValueError(f"不明なサイト: {', '.join(unknown) or value} (指定できるサイト: {', '.join(runner.SITE_CONFIGS)})")
+    return list(dict.fromkeys(names))
+
+
+def _has_value(value):
+    return value is not None and value != '' and value != []
+
+
+class FanOutStats:
+    """問い合わせ件数と打ち切りの集計"""
+
+    def __init__(self):
+        self.titles = 0
+        self.queried = 0          # サイトへの問い合わせ (タイトル x サイト)
+        self.cancelled = 0        # 打ち切った問い合わせ
+        self.filled_early = 0     # 全サイトの完了を待たずに欠損列がそろったタイトル
+        self.skipped_requests = 0 # 打ち切りにより始めなかった検索・詳細取得
+        self.negative_skipped = 0 # ネガティブキャッシュにより問い合わせなかったサイト
+        self.coverage_skipped = 0 # 欠損列を埋められないため問い合わせなかったサイト
+        self.elapsed = 0.0
+
+    def log(self, cancelled_requests):
+        avoided = self.skipped_requests + cancelled_requests
+        average = self.elapsed / self.titles if self.titles else 0.0
+        logging.info(f"複数サイト同時取得: {self.titles} タイトル, サイトへの問い合わせ {self.queried} 件 "
+                     f"(打ち切り {self.cancelled} 件, ネガティブキャッシュで省略 {self.negative_skipped} 件, "
+                     f"カバレッジで省略 {self.coverage_skipped} 件 = リクエスト 約 {self.coverage_skipped * 2} 件)")
+        logging.info(f"  欠損列がそろい残りを打ち切ったタイトル {self.filled_early} 件, 送信せずに済んだリクエスト {avoided} 件, "
+                     f"1タイトルあたりの所要時間 平均 {average:.2f}秒")
+
+
+async def _query_site(ctx, movie_id, title, cancel, stages, semaphores):
+    """1サイト分の検索 -> 詳細取得。cancel がセットされると以降のリクエストは送信しない"""
+    name = ctx.site.name
+    stages[name] = 'queued'
+    with http_client.cancellation(cancel): # asyncio.to_thread で実行する取得処理にも引き継がれる
+        async with semaphores[ctx.site.search_host]:
+            stages[name] = 'search'
+            movie_page_url = await asyncio.to_thread(ctx.search, title, movie_id)
+        scraped_details = None
+        if movie_page_url and not cancel.is_set():
+            detail_host = urlsplit(movie_page_url).hostname
+            if detail_host not in semaphores:
+                semaphores[detail_host] = asyncio.Semaphore(ctx.args.concurrency)
+            async with semaphores[detail_host]:
+                stages[name] = 'detail'
+                scraped_details = await asyncio.to_thread(ctx.scrape, movie_page_url, movie_id)
+    stages[name] = 'done'
+    if not cancel.is_set():
+        # 打ち切ったサイトの結果は使わないため記録しない (--resume で問い合わせ直す)
+        ctx.journal_result(movie_id, title, movie_page_url, scraped_details)
+    return movie_page_url, scraped_details
+
+
+async def _fan_out_title(contexts, movie_id, title, missing, semaphores, stats):
+    """全サイトへ同時に問い合わせ、missing の列がすべて埋まったら残りを打ち切る。
+    完了したサイトの結果を {サイト名: (作品ページURL, details)} で返す"""
+    cancel = threading.Event()
+    stages = {}
+    tasks = {asyncio.create_task(_query_site(ctx, movie_id, title, cancel, stages, semaphores)): ctx for ctx in contexts}
+    stats.queried += len(tasks)
+    results = {}
+    filled = set()
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            ctx = tasks[task]
+            try:
+                movie_page_url, scraped_details = task.result()
+            except Exception as e:
+                logging.error(f"  -> [{ctx.site.label}] 映画'{title}' (ID:{movie_id}) の処理中に予期せぬエラーが発生: {e}",
+                              exc_info=ctx.args.debug)
+                continue
+            results[ctx.site.name] = (movie_page_url, scraped_details)
+            if scraped_details:
+                filled.update(col for col in missing if _has_value(scraped_details.get(col)))
+        if pending and missing <= filled:
+            cancel.set()
+            for task in pending:
+                stage = stages.get(tasks[task].site.name, 'queued')
+                # 未開始の検索・詳細取得の数 (送信待ちのものは http_client が数える)
+                stats.skipped_requests += {'queued': 2, 'search': 1}.get(stage, 0)
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            logging.info(f"  -> 欠損列がそろったため {', '.join(tasks[task].site.label for task in pending)} への問い合わせを打ち切りました。")
+            stats.cancelled += len(pending)
+            stats.filled_early += 1
+            pending = set()
+    return results
+
+
+async def _run_fan_out_async(contexts, targets, on_result, stats):
+    args = contexts[0].args
+    loop = asyncio.get_running_loop()
+    # 打ち切った取得処理のスレッドは現在のリクエストが終わるまで残るため、余裕を持たせる
+    executor = ThreadPoolExecutor(max_workers=max(1, args.concurrency * len(contexts) * 2))
+    loop.set_default_executor(executor)
+    semaphores = {}
+    for ctx in contexts:
+        semaphores.setdefault(ctx.site.search_host, asyncio.Semaphore(args.concurrency))
+
+    async def run_title(movie_id, title, missing, site_contexts):
+        start = time.perf_counter()
+        results = await _fan_out_title(site_contexts, movie_id, title, missing, semaphores, stats)
+        stats.elapsed += time.perf_counter() - start
+        return results
+
+    try:
+        # 同時に処理するタイトルは --concurrency 件まで。結果は対象の順に反映する
+        window = deque()
+        for movie_id, title, missing, site_contexts in targets:
+            window.append((movie_id, title, asyncio.create_task(run_title(movie_id, title, missing, site_contexts))))
+            if len(window) >= max(1, args.concurrency):
+                movie_id, title, task = window.popleft()
+                on_result(movie_id, title, await task)
+        while window:
+            movie_id, title, task = window.popleft()
+            on_result(movie_id, title, await task)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def run_multi_site_scraping(df, target_df, sites, args, record_writers, journal=None):
+    """target_df の各映画を sites (SiteConfig のリスト, 優先順位順) へ同時に問い合わせて df を更新する。
+    取得データはサイトごとの record_writers[サイト名] (utils.RecordWriter) へ1件ずつ書き出す。
+    journal を渡した場合 (分割読み込みで全チャンク共有) はそこへ記録し、閉じるのは呼び出し側が行う。
+    (更新後のdf, 更新行数) を返す"""
+    if target_df.empty:
+        return df, 0
+
+    fill_columns = [col for col in (args.fill_columns or FILL_COLUMNS) if col in df.columns]
+    df_indexed = df.set_index('movie_id')
+    updates = runner.UpdateBuffer(df_indexed) # 全サイトで共有し、優先順位の高いサイトのデータから追加する
+    resolution_cache = ResolutionCache(args.resolution_cache) if args.resolution_cache else None
+    contexts = [runner.ScrapeContext(site, df_indexed, args, record_writers[site.name],
+                                     resolution_cache=resolution_cache, updates=updates) for site in sites]
+    archive = PageArchive(args.archive) if args.archive else None
+    pool = parse_pool.ParsePool(args.parse_workers) if args.parse_workers > 0 else None
+    for ctx in contexts:
+        ctx.archive = archive
+        if pool is not None:
+            ctx.extract = pool.extractor(ctx.site.extract)
+    runner.configure_debug_capture(args)
+    target_count = len(target_df)
+    target_df = runner.dedupe_targets(target_df, contexts, args)
+
+    # --- 再開: サイトごとにジャーナルの記録を反映し、記録済みのサイトへは問い合わせない ---
+    journal_path = runner.journal_path_of(args)
+    done_sites = {} # {movie_id: {記録済みのサイト名}}
+    if args.resume:
+        replayed = 0
+        for ctx in contexts: # 優先順位の高いサイトの記録から反映する
+            for entry in run_journal.read_journal(journal_path, site=ctx.site.name):
+                if args.chunk_size and entry['movie_id'] not in df_indexed.index:
+                    continue # 分割読み込みの他のチャンクの記録
+                done_sites.setdefault(entry['movie_id'], set()).add(ctx.site.name)
+                ctx.replay_journal_entry(entry)
+                replayed += 1
+        updates.flush()
+        # 反映後も欠損している列で打ち切りを判定する
+        target_df = target_df[['movie_id', 'title']].join(df_indexed[fill_columns], on='movie_id')
+        logging.info(f"ジャーナル '{journal_path}' から {replayed} 件 (タイトル x サイト) の処理済み結果を反映しました。")
+    shared_journal = journal if journal is not None else run_journal.RunJournal(journal_path, resume=args.resume)
+    for ctx in contexts:
+        ctx.journal = shared_journal
+
+    # サイトごとのネガティブキャッシュ (policy が skip の場合のみ、そのサイトへの問い合わせを省く)
+    negative_keys = {}
+    if resolution_cache is not None and args.negative_policy == 'skip':
+        negative_keys = {site.name: runner.negative_title_keys(site, args) for site in sites}
+    coverages = {site.name: site_coverage.site_coverage(site, args) for site in sites}
+    stats = FanOutStats()
+
+    def targets():
+        for row in target_df[['movie_id', 'title'] + fill_columns].itertuples(index=False):
+            movie_id, title = str(row[0]), row[1]
+            missing = {col for col, value in zip(fill_columns, row[2:]) if pd.isna(value)}
+            key = utils.normalize_title(title)
+            remaining = [ctx for ctx in contexts if ctx.site.name not in done_sites.get(movie_id, ())]
+            site_contexts = [ctx for ctx in remaining if key not in negative_keys.get(ctx.site.name, ())]
+            stats.negative_skipped += len(remaining) - len(site_contexts)
+            if missing and site_contexts and args.site_coverage != 'off':
+                helpful = [ctx for ctx in site_contexts if missing & coverages[ctx.site.name]]
+                stats.coverage_skipped += len(site_contexts) - len(helpful)
+                site_contexts = helpful
+                # どのサイトも埋められない列を待たずに打ち切れるようにする
+                missing = missing & set().union(*(coverages[ctx.site.name] for ctx in site_contexts))
+            if not missing or not site_contexts:
+                continue
+            stats.titles += 1
+            logging.info(f"--- 処理開始: {title} (ID: {movie_id}, 欠損 {len(missing)} 列, {len(site_contexts)} サイト) ---")
+            yield movie_id, title, missing, site_contexts
+
+    def on_result(movie_id, title, results):
+        # 優先順位の高いサイトから反映する (同じセルには先に追加したデータが入る)
+        try:
+            for ctx in contexts:
+                if ctx.site.name in results:
+                    movie_page_url, scraped_details = results[ctx.site.name]
+                    ctx.handle_result(movie_id, title, movie_page_url, scraped_details)
+        except Exception as e:
+            logging.error(f"  -> 映画'{title}' (ID:{movie_id}) の処理中に予期せぬエラーが発生: {e}", exc_info=args.debug)
+        finally:
+            logging.info(f"--- 処理完了: {title} (ID: {movie_id}) ---")
+
+    cancelled_before = http_client.get_cancelled_count()
+    logging.info(f"複数サイト同時取得: {' > '.join(site.label for site in sites)} (優先順位順), "
+                 f"同時処理タイトル数 {max(1, args.concurrency)}, 打ち切り判定の列 {len(fill_columns)} 列")
+    try:
+        asyncio.run(_run_fan_out_async(contexts, targets(), on_result, stats))
+    except KeyboardInterrupt:
+        runner.mark_interrupted()
+        logging.warning(f"中断されました。処理済みの結果でCSV/JSONを保存します (ジャーナル '{journal_path}' に記録済み。"
+                        f"--resume を付けて再実行すると続きから再開できます)。")
+    finally:
+        updates.flush()
+        if shared_journal is not journal:
+            shared_journal.close()
+            logging.info(f"ジャーナル: {shared_journal.recorded} 件を '{journal_path}' に記録しました。")
+        if resolution_cache is not None:
+            resolution_cache.close()
+        if pool is not None:
+            pool.close()
+        debug_capture.close()
+        if archive is not None:
+            logging.info(f"ページアーカイブ: {archive.stats['stored']} 件を '{args.archive}' に保存しました。")
+            archive.close()
+
+    runner.log_http_stats()
+    contexts[0].log_summary()
+    runner.log_dedup_summary(contexts, target_count)
+    stats.log(http_client.get_cancelled_count() - cancelled_before)
+    return df_indexed.reset_index(), updates.update_count
+
+
+def run_multi_site_in_chunks(sites, args, record_writers):
+    """--chunk-size 指定時の複数サイト同時取得。チャンクごとに run_multi_site_scraping を行い、
+    出力CSVもチャンクごとに書き出す。更新行数を返す"""
+    update_count = 0
+
+    def process(chunk, target_df, chunk_args, journal):
+        nonlocal update_count
+        chunk, count = run_multi_site_scraping(chunk, target_df, sites, chunk_args, record_writers, journal)
+        update_count += count
+        return chunk
+
+    runner.process_csv_in_chunks(None, args, process)
+    return update_count
+
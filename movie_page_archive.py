@@ -0,0 +1,162 @@
+# Page Archive
+# 取得した作品ページを圧縮した追記専用のアーカイブに保存し、後からネットワークなしで再抽出できるようにする。
+# - 本文は WARC/1.0 の resource レコードとして1件ずつ gzip メンバーに圧縮し、セグメントファイル
+#   (pages-00001.warc.gz, ...) の末尾に追記する (warcio などの WARC ツールでもそのまま読める)
+# - (サイト, movie_id) と URL -> セグメント・オフセット・長さの索引は SQLite (index.sqlite) に保存する
+# - 同じ作品を再取得した場合は追記し、索引では最新のレコードを使う
+#
+# --archive DIR で取得時に保存し、--from-archive DIR でセレクタ修正後の再抽出 (ネットワークなし) を行う。
+
+import gzip
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+SEGMENT_MAX_BYTES = 1024 ** 3   # セグメントファイル1つあたりの上限 (超えたら次のファイルに切り替える)
+COMPRESS_LEVEL = 6
+
+
+def _segment_name(number):
+    return f"pages-{number:05d}.warc.gz"
+
+
+def _warc_record(site, movie_id, url, content, encoding, fetched_at):
+    """WARC/1.0 resource レコード (ヘッダー + 本文) の bytes を作る"""
+    content_type = f"text/html; charset={encoding}" if encoding else "text/html"
+    headers = [
+        "WARC/1.0",
+        "WARC-Type: resource",
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+        f"WARC-Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(fetched_at))}",
+        f"WARC-Target-URI: {url}",
+        f"Content-Type: {content_type}",
+        f"X-Movie-Site: {site}",
+        f"X-Movie-Id: {movie_id}",
+        f"Content-Length: {len(content)}",
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode('utf-8') + content + b"\r\n\r\n"
+
+
+def read_record(path, offset, length):
+    """セグメントの指定位置から1レコードを読み、(本文, URL, 文字コード) を返す"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = gzip.decompress(f.read(length))
+    header_end = data.index(b"\r\n\r\n")
+    headers = {}
+    for line in data[:header_end].decode('utf-8').split("\r\n")[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body_start = header_end + 4
+    content = data[body_start:body_start + int(headers['content-length'])]
+    _, _, charset = headers.get('content-type', '').partition('charset=')
+    return content, headers.get('warc-target-uri'), charset or None
+
+
+def extract_archived(extract, path, offset, length):
+    """アーカイブのレコードを読んで extract(content, url, encoding) を実行する (ワーカープロセスでも実行できる)"""
+    content, url, encoding = read_record(path, offset, length)
+    return extract(content, url, encoding)
+
+
+class PageArchive:
+    """作品ページの追記専用アーカイブ (スレッドセーフ)"""
+
+    def __init__(self, directory, readonly=False):
+        self.directory = directory
+        self._lock = threading.Lock()
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        elif not os.path.exists(os.path.join(directory, 'index.sqlite')):
+            raise FileNotFoundError(f"アーカイブの索引が見つかりません: {directory}")
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                site TEXT NOT NULL,
+                movie_id TEXT,
+                url TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_movie ON pages (site, movie_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_url ON pages (url)")
+        self._conn.commit()
+        self._segment = None
+        self._file = None
+        self.stats = {'stored': 0, 'stored_bytes': 0, 'compressed_bytes': 0}
+
+    def _open_segment(self):
+        """最後のセグメントに追記する。上限を超えていれば次のセグメントを作る"""
+        numbers = sorted(int(name[6:11]) for name in os.listdir(self.directory)
+                         if name.startswith('pages-') and name.endswith('.warc.gz'))
+        number = numbers[-1] if numbers else 1
+        if numbers and os.path.getsize(os.path.join(self.directory, _segment_name(number))) >= SEGMENT_MAX_BYTES:
+            number += 1
+        self._segment = _segment_name(number)
+        self._file = open(os.path.join(self.directory, self._segment), 'ab')
+
+    def append(self, site, movie_id, url, content, encoding=None):
+        """ページを1件追記し、索引に登録する"""
+        fetched_at = time.time()
+        member = gzip.compress(_warc_record(site, movie_id, url, content, encoding, fetched_at), COMPRESS_LEVEL)
+        with self._lock:
+            if self._file is None or self._file.tell() >= SEGMENT_MAX_BYTES:
+                if self._file is not None:
+                    self._file.close()
+                self._open_segment()
+            offset = self._file.tell()
+            self._file.write(member)
+            self._file.flush()
+            # 本文を書いてから索引に登録する (中断しても索引が壊れたレコードを指さない)
+            self._conn.execute(
+                "INSERT INTO pages (site, movie_id, url, segment, offset, length, size, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (site, movie_id, url, self._segment, offset, len(member), len(content), fetched_at))
+            self._conn.commit()
+            self.stats['stored'] += 1
+            self.stats['stored_bytes'] += len(content)
+            self.stats['compressed_bytes'] += len(member)
+
+    def recording(self, extract, site, movie_id):
+        """extract と同じ呼び出し方で、抽出の前にページをアーカイブへ保存する関数を返す"""
+        def run(content, movie_page_url=None, encoding=None):
+            try:
+                self.append(site, movie_id, movie_page_url, content, encoding)
+            except (OSError, sqlite3.Error) as e:
+                logging.warning(f"  ページのアーカイブ保存中にエラー ({movie_page_url}): {e}")
+            return extract(content, movie_page_url, encoding)
+        return run
+
+    def latest_entries(self, site):
+        """サイトの movie_id ごとの最新レコードを {movie_id: (URL, セグメントのパス, オフセット, 長さ)} で返す"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT movie_id, url, segment, offset, length FROM pages
+                WHERE id IN (SELECT MAX(id) FROM pages WHERE site = ? AND movie_id IS NOT NULL GROUP BY movie_id)
+                """, (site,)).fetchall()
+        return {movie_id: (url, os.path.join(self.directory, segment), offset, length)
+                for movie_id, url, segment, offset, length in rows}
+
+    def lookup_url(self, url):
+        """URLの最新レコードを (本文, URL, 文字コード) で返す (なければ None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT segment, offset, length FROM pages WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)).fetchone()
+        if row is None:
+            return None
+        return read_record(os.path.join(self.directory, row[0]), row[1], row[2])
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._conn.close()
@@ -0,0 +1,118 @@
+# Title Resolution Cache
+# (サイト, 正規化タイトル) -> 作品ページURL の対応を SQLite に永続化する。
+# 2回目以降の実行では検索リクエストとその解析を省略し、直接 scrape_movie_details に進める。
+# 検索で見つからなかったタイトルも試行回数とともに記録し (ネガティブキャッシュ)、
+# TTL が切れるまで対象選定でスキップ/後回しにできるようにする。
+
+import logging
+import sqlite3
+import threading
+import time
+
+import movie_scraper_utils as utils
+
+DEFAULT_NEGATIVE_TTL = 7 * 24 * 3600   # 秒
+MAX_BACKOFF_MULTIPLIER = 8             # 失敗が続くほどTTLを延ばす (最大 TTL x 8)
+
+
+class ResolutionCache:
+    """タイトル解決結果の永続キャッシュ (スレッドセーフ)"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS resolved_urls (
+                site TEXT NOT NULL,
+                title_key TEXT NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                resolved_at REAL NOT NULL,
+                PRIMARY KEY (site, title_key)
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS negative_results (
+                site TEXT NOT NULL,
+                title_key TEXT NOT NULL,
+                title TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                first_failed_at REAL NOT NULL,
+                last_attempt_at REAL NOT NULL,
+                PRIMARY KEY (site, title_key)
+            )""")
+        self._conn.commit()
+        self.stats = {'url_hits': 0, 'url_misses': 0, 'not_found_recorded': 0}
+
+    def get_url(self, site, title):
+        """解決済みの作品ページURLを返す (なければ None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url FROM resolved_urls WHERE site = ? AND title_key = ?",
+                (site, utils.normalize_title(title))).fetchone()
+            self.stats['url_hits' if row else 'url_misses'] += 1
+        return row[0] if row else None
+
+    def put_url(self, site, title, url):
+        """検索で見つかった作品ページURLを保存する"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resolved_urls VALUES (?, ?, ?, ?, ?)",
+                (site, utils.normalize_title(title), title, url, time.time()))
+            self._conn.commit()
+
+    def forget_url(self, site, title):
+        """URLが無効になった場合 (詳細が取れなかった等) にエントリを削除する"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM resolved_urls WHERE site = ? AND title_key = ?",
+                (site, utils.normalize_title(title)))
+            self._conn.commit()
+        logging.debug(f"  [{site}] URL索引から削除: {title}")
+
+    # --- ネガティブキャッシュ ---
+    def record_not_found(self, site, title):
+        """検索で作品ページが見つからなかったことを記録し、累計試行回数を返す"""
+        now = time.time()
+        title_key = utils.normalize_title(title)
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO negative_results VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (site, title_key) DO UPDATE SET attempts = attempts + 1, last_attempt_at = excluded.last_attempt_at
+                """, (site, title_key, title, now, now))
+            self._conn.commit()
+            self.stats['not_found_recorded'] += 1
+            row = self._conn.execute(
+                "SELECT attempts FROM negative_results WHERE site = ? AND title_key = ?", (site, title_key)).fetchone()
+        return row[0]
+
+    def clear_not_found(self, site, title):
+        """見つかるようになったタイトルのネガティブエントリを削除する"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM negative_results WHERE site = ? AND title_key = ?",
+                (site, utils.normalize_title(title)))
+            self._conn.commit()
+
+    def get_negative_entries(self, site):
+        """サイトのネガティブエントリを {正規化タイトル: (試行回数, 最終試行時刻)} で返す"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT title_key, attempts, last_attempt_at FROM negative_results WHERE site = ?", (site,)).fetchall()
+        return {title_key: (attempts, last_attempt_at) for title_key, attempts, last_attempt_at in rows}
+
+    def get_resolved_keys(self, site):
+        """サイトで作品ページURLを解決済みのタイトル (正規化済み) の集合"""
+        with self._lock:
+            rows = self._conn.execute("SELECT title_key FROM resolved_urls WHERE site = ?", (site,)).fetchall()
+        return {row[0] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def negative_expires_at(attempts, last_attempt_at, ttl=DEFAULT_NEGATIVE_TTL):
+    """ネガティブエントリの有効期限 (時刻)。失敗回数に応じてTTLを倍々に延ばす"""
+    multiplier = min(2 ** max(attempts - 1, 0), MAX_BACKOFF_MULTIPLIER)
+    return last_attempt_at + ttl * multiplier
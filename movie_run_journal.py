@@ -0,0 +1,80 @@
+# Run Journal
+# Webスクレイピングの結果を1タイトルごとに追記するJSONLジャーナル。
+# 取得直後に書き込み (flush + fsync) するため、クラッシュや Ctrl-C で中断しても
+# --resume で処理済みの movie_id を再取得せずに再開できる。
+
+import json
+import logging
+import os
+import threading
+import time
+
+# ジャーナルに記録する結果の種類 (いずれもネットワーク処理が完了したもの)
+STATUS_OK = 'ok'                  # 詳細情報を取得できた
+STATUS_NOT_FOUND = 'not_found'    # 検索で作品ページが見つからなかった
+STATUS_NO_DETAILS = 'no_details'  # 作品ページから有効な情報が取れなかった
+
+
+def default_journal_path(output_path):
+    """出力CSVに対応するジャーナルファイルのパス"""
+    return f"{output_path}.journal.jsonl"
+
+
+class RunJournal:
+    """追記専用のジャーナル (スレッドセーフ)"""
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        if not resume and os.path.exists(path) and os.path.getsize(path) > 0:
+            logging.warning(f"既存のジャーナル '{path}' を新しい実行で上書きします (再開する場合は --resume を指定してください)。")
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self._file.tell() > 0 and not _ends_with_newline(path):
+            self._file.write("\n") # 中断で途切れた最終行と新しい行が連結されないようにする
+        self.recorded = 0
+
+    def record(self, site, movie_id, title, status, movie_page_url=None, details=None):
+        entry = {
+            'site': site,
+            'movie_id': movie_id,
+            'title': title,
+            'status': status,
+            'url': movie_page_url,
+            'details': details,
+            'recorded_at': time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def read_journal(path, site=None):
+    """ジャーナルのエントリを順に返すジェネレータ。
+    書き込み途中で中断された最終行など、解析できない行は読み飛ばす"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"ジャーナル '{path}' の {line_no} 行目を解析できないため読み飛ばします。")
+                continue
+            if site is None or entry.get('site') == site:
+                yield entry
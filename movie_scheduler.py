@@ -0,0 +1,95 @@
+# Priority Scheduler
+# --scheduler priority の対象選定。--limit で件数を絞る実行で、1リクエストあたりに埋まるセルが多い行から処理する。
+# 行のスコア = 埋まると見込まれるセル数 / 見込まれるリクエスト数
+# - 埋まるセル数 = 見つかる確率 x 欠損列ごとのサイトの取得率の合計
+#   (取得率は過去の取得データから学習 (movie_site_coverage.learn_rates)。件数が足りなければ宣言済みカバレッジの列を 1 とする)
+# - 見つかる確率: URL索引で解決済みなら 1、それ以外はサイトの検索成功率 (URL索引とネガティブキャッシュの件数から)。
+#   ネガティブキャッシュにあるタイトルは試行回数で割り引き、最終試行から時間が経つほど (有効期限に近づくほど) 戻す
+# - リクエスト数: URL索引で解決済みなら 1 (詳細取得のみ)、それ以外は 検索 1 + 見つかる確率 (詳細取得)
+# サイトを指定しない場合 (複数サイト同時取得) は欠損列の数をスコアとする。
+
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+import movie_scraper_utils as utils
+import movie_site_coverage as site_coverage
+from movie_resolution_cache import ResolutionCache, negative_expires_at
+
+SCHEDULERS = ['movie_id', 'priority']
+
+
+def column_rates(site, args):
+    """{列: サイトで値が取れる割合}。過去の取得データが少なければ宣言済みカバレッジの列を 1 とする"""
+    rates, total = site_coverage.learn_rates(site.name, sorted(site.coverage), args.coverage_dir)
+    if total < site_coverage.MIN_RECORDS:
+        return dict.fromkeys(site.coverage, 1.0)
+    return rates
+
+
+def found_probabilities(titles, site, args):
+    """タイトルごとの (見つかる確率, URL索引で解決済みか) を配列で返す"""
+    found = np.ones(len(titles))
+    resolved = np.zeros(len(titles), dtype=bool)
+    if not args.resolution_cache or len(titles) == 0:
+        return found, resolved
+    cache = ResolutionCache(args.resolution_cache)
+    try:
+        resolved_keys = cache.get_resolved_keys(site.name)
+        negative_entries = cache.get_negative_entries(site.name)
+    finally:
+        cache.close()
+    # 検索成功率 (件数が少ないうちは 0.5 に寄せる)
+    base = (len(resolved_keys) + 1) / (len(resolved_keys) + len(negative_entries) + 2)
+    now = time.time()
+    ttl = args.negative_ttl * 24 * 3600
+    keys = titles.map(utils.normalize_title)
+    resolved = keys.isin(resolved_keys).to_numpy()
+    found[:] = base
+    found[resolved] = 1.0
+    for i in np.flatnonzero(keys.isin(negative_entries.keys()).to_numpy() & ~resolved):
+        attempts, last_attempt_at = negative_entries[keys.iloc[i]]
+        window = negative_expires_at(attempts, last_attempt_at, ttl) - last_attempt_at
+        recovery = min(1.0, (now - last_attempt_at) / window) if window > 0 else 1.0
+        found[i] = base * recovery / (1 + attempts)
+    return found, resolved
+
+
+def score_rows(df, site, args, columns):
+    """行ごとに (スコア, 埋まると見込まれるセル数, 見込まれるリクエスト数) の Series を返す"""
+    columns = [col for col in columns if col in df.columns]
+    missing = df[columns].isna().to_numpy()
+    if site is None:
+        cells = missing.sum(axis=1).astype(float)
+        requests = np.ones(len(df))
+    else:
+        rates = column_rates(site, args)
+        found, resolved = found_probabilities(df['title'], site, args)
+        cells = found * (missing @ np.array([rates.get(col, 0.0) for col in columns]))
+        requests = np.where(resolved, 1.0, 1.0 + found)
+    return (pd.Series(cells / requests, index=df.index), pd.Series(cells, index=df.index),
+            pd.Series(requests, index=df.index))
+
+
+def prioritize(df, site, args, columns, sort_columns):
+    """スコアの高い順に並べ替える (sort_columns の先頭 '_negative' は優先する)。
+    並べ替えた DataFrame に '_score', '_cells', '_requests' 列を付けて返す"""
+    df = df.copy()
+    df['_score'], df['_cells'], df['_requests'] = score_rows(df, site, args, columns)
+    leading = [col for col in sort_columns if col != 'movie_id']
+    return df.sort_values(by=leading + ['_score', 'movie_id'], ascending=[True] * len(leading) + [False, True],
+                          kind='stable')
+
+
+def log_plan(candidates, target_df, label=''):
+    """選んだ行と movie_id 順に選んだ場合の、見込まれる埋まるセル数・リクエスト数を比較してログ出力する"""
+    if target_df.empty:
+        return
+    baseline = candidates.sort_values(by='movie_id').head(len(target_df))
+    cells, requests = target_df['_cells'].sum(), target_df['_requests'].sum()
+    base_cells, base_requests = baseline['_cells'].sum(), baseline['_requests'].sum()
+    logging.info(f"{label}優先度スケジューラ: {len(target_df)} 件で埋まる見込みのセル 約 {cells:.0f} / リクエスト 約 {requests:.0f} "
+                 f"({cells / requests if requests else 0:.2f} セル/リクエスト, movie_id 順の場合 "
+                 f"約 {base_cells:.0f} / {base_requests:.0f} = {base_cells / base_requests if base_requests else 0:.2f})")
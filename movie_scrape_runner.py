@@ -0,0 +1,871 @@
+# Movie Scrape Runner
+# fill_movie_details_<サイト名>.py 共通のWebスクレイピング処理。
+# 逐次モード (従来どおり)、asyncio による並行モード (--concurrency N)、
+# 検索と詳細取得を別々のワーカー群で流す2段パイプラインモード (--pipeline) を提供する。
+# リクエスト間隔は scrapers/rate_limiter.py のホスト別トークンバケットが制御する。
+# --parse-workers N を指定すると、作品ページの解析は scrapers/parse_pool.py のワーカープロセスで行う。
+# --archive DIR で取得した作品ページを保存し、--from-archive DIR でネットワークなしに再抽出できる (movie_page_archive.py)。
+# --work-queue FILE を指定すると、同じキューを開いた複数のワーカープロセスで対象を分担する (movie_work_queue.py)。
+# --chunk-size N を指定すると、入力CSVを N 行ずつ読み込み、チャンクごとに対象選定・取得・保存を行う (process_csv_in_chunks)。
+
+import asyncio
+import copy
+import functools
+import logging
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from scrapers import eiga_com_scraper, filmarks_scraper, yahoo_eiga_scraper
+from scrapers import debug_capture, html_parser, http_client, parse_pool, rate_limiter, structured_data
+import movie_scraper_utils as utils
+from movie_resolution_cache import ResolutionCache, negative_expires_at
+import movie_run_journal as run_journal
+from movie_page_archive import PageArchive, extract_archived
+import movie_site_coverage as site_coverage
+import movie_work_queue as work_queue
+import movie_scheduler as scheduler
+
+# --- サイト定義 ---
+# name: JSON出力ファイル名などに使うサイト名, label: ログ表示名
+# search: タイトル -> 作品ページURL, scrape: 作品ページURL -> details辞書
+# extract: 作品ページのHTML -> details辞書 (ネットワークなし, ワーカープロセスでも実行できる)
+# search_host: 検索リクエストの送信先ホスト (並行数の制御単位)
+# coverage: 作品ページから取得できる列 (movie_site_coverage.py の declared)
+SiteConfig = namedtuple('SiteConfig', ['name', 'label', 'search', 'scrape', 'extract', 'search_host', 'coverage'])
+
+SITE_CONFIGS = {
+    'eiga.com': SiteConfig('eiga.com', '映画.com', eiga_com_scraper.search_eiga_com,
+                           eiga_com_scraper.scrape_movie_details, eiga_com_scraper.extract_movie_details, 'eiga.com',
+                           eiga_com_scraper.COVERAGE),
+    'yahoo.co.jp': SiteConfig('yahoo.co.jp', 'Yahoo!映画', yahoo_eiga_scraper.search_yahoo_eiga,
+                              yahoo_eiga_scraper.scrape_movie_details, yahoo_eiga_scraper.extract_movie_details, 'search.yahoo.co.jp',
+                              yahoo_eiga_scraper.COVERAGE),
+    'filmarks.com': SiteConfig('filmarks.com', 'Filmarks', filmarks_scraper.search_filmarks,
+                               filmarks_scraper.scrape_movie_details, filmarks_scraper.extract_movie_details, 'filmarks.com',
+                               filmarks_scraper.COVERAGE),
+}
+
+# 取得データはこの件数ごとにまとめてDataFrameへ反映する (utils.merge_records)
+MERGE_BATCH_SIZE = 500
+
+# Ctrl-C で中断されたか (分割読み込みで以降のチャンクの取得を行わないために使う)
+_run_state = {'interrupted': False}
+
+
+def mark_interrupted():
+    _run_state['interrupted'] = True
+
+
+# --- HTTP設定 ---
+def configure_http(args):
+    """コマンドライン引数から共有HTTPセッションとレート制限を設定する"""
+    # 並行数より接続プールが小さいと接続が使い捨てになるため、並行数以上を確保する
+    workers = max(args.concurrency, args.search_workers, args.detail_workers) if args.pipeline else args.concurrency
+    http_client.configure(pool_size=max(args.pool_size, workers), timeout=args.timeout)
+
+    rate = args.rate
+    if rate is None and args.wait is not None:
+        # 旧 --wait との互換: 待機秒数をスループット目標に読み替える
+        rate = 1.0 / args.wait if args.wait > 0 else 0
+        logging.warning(f"--wait は非推奨です。--rate {rate:g} として扱います。")
+    try:
+        host_rates = dict(rate_limiter.parse_host_rate(v) for v in args.host_rate)
+    except ValueError as e:
+        logging.error(f"--host-rate の指定が不正です: {e}")
+        sys.exit(1)
+    rate_limiter.configure(rate=rate, burst=args.burst, jitter=args.jitter, host_rates=host_rates)
+    http_client.configure_cache(args.cache_dir, ttl=args.cache_ttl * 3600, max_bytes=int(args.cache_max_mb * 1024 ** 2))
+
+
+def configure_parser(args):
+    """コマンドライン引数から全スクレイパー共通のHTMLパーサーと構造化データの利用方法を設定する"""
+    html_parser.configure(args.parser, partial=not args.full_parse)
+    logging.info(f"HTMLパーサー: {html_parser.get_backend()} ({'部分解析' if html_parser.is_partial() else 'ページ全体を解析'})")
+    structured_data.configure(args.structured_data)
+    logging.info(f"構造化データ (JSON-LD / OpenGraph): {structured_data.get_mode()}")
+
+
+def configure_debug_capture(args):
+    """デバッグ用HTML保存を設定する。--capture-dir 指定時、または --debug 指定時 (保存先は既定) のみ有効"""
+    directory = args.capture_dir or (debug_capture.DEFAULT_DIR if args.debug else None)
+    debug_capture.configure(directory, sample_rate=args.capture_rate, max_bytes=int(args.capture_max_mb * 1024 ** 2))
+
+
+def log_http_stats():
+    """ホストごとのリクエスト数・レート制限による待機時間と、HTTPキャッシュ・カバレッジ・構造化データの統計をログ出力する"""
+    for host, stats in rate_limiter.get_stats().items():
+        logging.info(f"  [{host}] リクエスト {stats['requests']} 件, レート制限による待機 {stats['waited_seconds']:.1f}秒")
+    cache_stats = http_client.get_cache_stats()
+    if cache_stats is not None:
+        logging.info(f"  HTTPキャッシュ: ヒット {cache_stats['hits']} 件, 再検証(304) {cache_stats['revalidated']} 件, "
+                     f"ミス {cache_stats['misses']} 件, 保存 {cache_stats['stored']} 件, 削除 {cache_stats['evicted']} 件")
+    capture_stats = debug_capture.get_stats()
+    if capture_stats['captured']:
+        logging.info(f"  デバッグ用HTML: 保存 {capture_stats['written']} 件, キュー満杯で破棄 {capture_stats['dropped']} 件, "
+                     f"上限超過で削除 {capture_stats['rotated']} 件")
+    coverage_stats = site_coverage.get_stats()
+    if coverage_stats['skipped_rows']:
+        logging.info(f"  サイトのカバレッジ: 欠損列を埋められない {coverage_stats['skipped_rows']} 件を対象から除き、"
+                     f"リクエスト 約 {coverage_stats['avoided_requests']} 件を省略")
+
+
+# --- 対象選定 ---
+MAJOR_COLUMNS = ['year', 'director', 'summary']
+# サイトから取得して埋める列
+FILL_COLUMNS = [col for col in utils.DEFAULT_OUTPUT_COLUMNS if col not in ('movie_id', 'title')]
+
+
+def negative_title_keys(site, args):
+    """ネガティブキャッシュで有効期限内の「見つからなかった」タイトル (正規化済み) の集合"""
+    if not args.resolution_cache:
+        return set()
+    cache = ResolutionCache(args.resolution_cache)
+    try:
+        negative_entries = cache.get_negative_entries(site.name)
+    finally:
+        cache.close()
+    now = time.time()
+    ttl = args.negative_ttl * 24 * 3600
+    return {key for key, (attempts, last_attempt_at) in negative_entries.items()
+            if negative_expires_at(attempts, last_attempt_at, ttl) > now}
+
+
+def rank_candidates(df, site, args, quiet=False):
+    """主要3項目(year, director, summary)のいずれかが欠損している行を処理する順に並べて返す
+    (movie_id 順、--scheduler priority の場合は1リクエストあたりに埋まる見込みのセルが多い順)。
+    ネガティブキャッシュで有効期限内の「見つからなかった」タイトルはスキップ (または後回し) し、
+    欠損している主要項目をそのサイトでは埋められない行 (--site-coverage) も除く
+    (site が None の場合 (複数サイト同時取得) はサイトごとの判断になるため、ここでは除かない)。
+    並べ替えに使った '_negative' / '_score' などの列が付く。quiet=True ならログとスキップ件数の集計を省く"""
+    missing_major_info_df = df[
+        df['year'].isna() | df['director'].isna() | df['summary'].isna()
+    ].copy()
+    if args.shard is not None:
+        candidates = len(missing_major_info_df)
+        missing_major_info_df = missing_major_info_df[utils.in_shard(missing_major_info_df['movie_id'], args.shard)]
+        if not quiet:
+            logging.info(f"シャード {args.shard[0]}/{args.shard[1]}: 対象候補 {candidates} 件のうち {len(missing_major_info_df)} 件を担当します。")
+
+    sort_columns = ['movie_id']
+    if site is not None and args.resolution_cache and not missing_major_info_df.empty:
+        suppressed_keys = negative_title_keys(site, args)
+        if suppressed_keys:
+            suppressed = missing_major_info_df['title'].map(utils.normalize_title).isin(suppressed_keys)
+            if args.negative_policy == 'skip':
+                missing_major_info_df = missing_major_info_df[~suppressed]
+                if not quiet:
+                    logging.info(f"ネガティブキャッシュにより {int(suppressed.sum())} 件をスキップしました (有効期限内の「見つからなかった」タイトル)。")
+            else:
+                missing_major_info_df['_negative'] = suppressed
+                sort_columns = ['_negative', 'movie_id']
+                if not quiet:
+                    logging.info(f"ネガティブキャッシュにより {int(suppressed.sum())} 件を後回しにします。")
+
+    if args.scheduler == 'priority':
+        # 1リクエストあたりに埋まる見込みのセルが多い順 (movie_scheduler.py)
+        missing_major_info_df = scheduler.prioritize(missing_major_info_df, site, args, FILL_COLUMNS, sort_columns)
+    else:
+        missing_major_info_df = missing_major_info_df.sort_values(by=sort_columns)
+    coverage = site_coverage.site_coverage(site, args) if site is not None else None
+    if coverage is not None and not missing_major_info_df.empty:
+        helpful = site_coverage.helpful_rows(missing_major_info_df, coverage, MAJOR_COLUMNS)
+        if not helpful.all():
+            missing_major_info_df = missing_major_info_df[helpful]
+            if not quiet:
+                # この実行で省略できたリクエスト数 = limit 件の枠に入っていた行 x (検索 + 詳細取得)
+                avoided = int((~helpful.head(args.limit)).sum()) * 2
+                site_coverage.record_skipped(int((~helpful).sum()), avoided)
+                logging.info(f"[{site.label}] 欠損している主要項目をこのサイトでは埋められない {int((~helpful).sum())} 件を対象から除きました "
+                             f"(省略したリクエスト 約 {avoided} 件)。")
+    return missing_major_info_df
+
+
+def select_targets(df, site, args, target_ids=None):
+    """処理対象を選ぶ (rank_candidates の順に limit 件)。
+    target_ids (movie_id の集合) を指定すると、その行だけから選ぶ (--chunk-size: select_file_targets)"""
+    missing_major_info_df = rank_candidates(df, site, args)
+    if target_ids is not None:
+        missing_major_info_df = missing_major_info_df[missing_major_info_df['movie_id'].isin(target_ids)]
+
+    # 並べ替えた順 (movie_id 順 / 優先度順) に limit 件数に絞る
+    target_df = missing_major_info_df.head(args.limit)
+    if args.scheduler == 'priority':
+        scheduler.log_plan(missing_major_info_df, target_df, f"[{site.label}] " if site is not None else "")
+    target_df = target_df.drop(columns=['_negative', '_score', '_cells', '_requests'], errors='ignore')
+    logging.info(f"主要情報(年,監督,あらすじ)のいずれかが未入力の映画を {len(target_df)} 件処理対象とします (最大{args.limit}件)。")
+    return target_df
+
+
+def group_titles(target_df):
+    """正規化したタイトル (utils.normalize_title) が同じ行をまとめる。
+    (各タイトルの最初の行だけの DataFrame, {最初の行の movie_id: [(同じタイトルの movie_id, title), ...]}) を返す。
+    タイトルが空の行はまとめない"""
+    keys = target_df['title'].map(utils.normalize_title)
+    first = ~keys.duplicated() | (keys == '')
+    representatives = dict(zip(keys[first], target_df.loc[first, 'movie_id'].astype(str)))
+    duplicates = {}
+    for movie_id, title, key in zip(target_df.loc[~first, 'movie_id'], target_df.loc[~first, 'title'], keys[~first]):
+        duplicates.setdefault(representatives[key], []).append((str(movie_id), title))
+    return target_df[first], duplicates
+
+
+def dedupe_targets(target_df, contexts, args):
+    """同じタイトルの行は1回だけ取得し、結果を各 movie_id に反映するよう contexts に設定する。
+    取得する行だけの DataFrame を返す"""
+    if args.no_title_dedup or target_df.empty:
+        return target_df
+    unique_df, duplicates = group_titles(target_df)
+    for ctx in contexts:
+        ctx.duplicates = duplicates
+    if duplicates:
+        logging.info(f"同じタイトルの行をまとめました: 対象 {len(target_df)} 件 -> 取得 {len(unique_df)} タイトル "
+                     f"(重複 {len(target_df) - len(unique_df)} 件, 重複率 {1 - len(unique_df) / len(target_df):.1%})。")
+    return unique_df
+
+
+def log_dedup_summary(contexts, target_count):
+    """同じタイトルの行をまとめたことによる重複率と省略したリクエスト数をログ出力する"""
+    duplicates = contexts[0].duplicates
+    if not duplicates or not target_count:
+        return
+    rows = sum(len(group) for group in duplicates.values())
+    saved = sum(ctx.saved_requests for ctx in contexts)
+    logging.info(f"  タイトルの重複: 対象 {target_count} 件のうち {rows} 件 (重複率 {rows / target_count:.1%}) に同じタイトルの結果を使い、"
+                 f"リクエスト 約 {saved} 件を省略")
+
+
+# --- 1タイトル分の処理 ---
+def has_scraped_values(scraped_details):
+    """source 以外に何か取得できた値があるか"""
+    return bool(scraped_details) and any(v is not None for k, v in scraped_details.items() if k != 'source')
+
+
+class UpdateBuffer:
+    """取得データをためて、一定件数ごとに df_indexed の欠損セルへ一括反映する。
+    複数サイトの ScrapeContext で共有した場合、先に追加したデータが優先される (utils.merge_records)"""
+
+    def __init__(self, df_indexed):
+        self.df_indexed = df_indexed
+        self.update_count = 0      # 更新された行数
+        self._pending = []         # DataFrameへの反映待ちの取得データ
+
+    def add(self, scraped_details):
+        self._pending.append(scraped_details)
+        if len(self._pending) >= MERGE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """反映待ちの取得データを欠損セルにのみ一括反映する"""
+        if not self._pending:
+            return
+        columns = [col for col in self.df_indexed.columns if col not in ['title', 'source']]
+        updated = utils.merge_records(self.df_indexed, self._pending, columns)
+        count = int(updated.sum())
+        logging.info(f"  -> DataFrame更新: {len(self._pending)} 件の取得データを反映し、{count} 行を更新しました。")
+        self.update_count += count
+        self._pending = []
+
+
+class ScrapeContext:
+    """1回のWebスクレイピング実行で共有する状態 (対象サイト、DataFrame、キャッシュ、集計)"""
+
+    def __init__(self, site, df_indexed, args, record_writer, resolution_cache=None, journal=None, updates=None):
+        self.site = site
+        self.df_indexed = df_indexed
+        self.args = args
+        self.record_writer = record_writer # 取得データを1件ずつ書き出す utils.RecordWriter
+        self.resolution_cache = resolution_cache
+        self.journal = journal
+        self.extract = None        # ワーカープロセスで解析する場合の解析関数 (parse_pool.ParsePool.extractor)
+        self.archive = None        # 取得した作品ページの保存先 (PageArchive)
+        self.updates = updates if updates is not None else UpdateBuffer(df_indexed)
+        self.duplicates = {}       # {取得する movie_id: [(同じタイトルの movie_id, title), ...]} (dedupe_targets)
+        self.saved_requests = 0    # 同じタイトルの結果を使うことで省略した検索・詳細取得の数
+
+    @property
+    def update_count(self):
+        """更新された行数"""
+        return self.updates.update_count
+
+    def queue_update(self, scraped_details):
+        """取得データを反映待ちに追加し、一定件数たまったらまとめてDataFrameへ反映する"""
+        self.updates.add(scraped_details)
+
+    def flush_updates(self):
+        self.updates.flush()
+
+    def write_record(self, movie_id, title, scraped_details):
+        """取得データに movie_id / title を付けて出力ファイルへ書き出す"""
+        scraped_details['movie_id'] = movie_id
+        scraped_details['title'] = title
+        self.record_writer.write(scraped_details)
+
+    def search(self, title, movie_id=None):
+        """作品ページURLを解決する。URL索引にあれば検索リクエストを省略する (ワーカースレッドからも呼ばれる)"""
+        with debug_capture.movie(movie_id): # デバッグ用HTMLを movie_id ごとに保存する
+            return self._search(title)
+
+    def _search(self, title):
+        if self.resolution_cache is not None:
+            movie_page_url = self.resolution_cache.get_url(self.site.name, title)
+            if movie_page_url:
+                logging.info(f"[{self.site.label}] URL索引から作品ページURLを取得 (検索省略): {title} -> {movie_page_url}")
+                return movie_page_url
+        movie_page_url = self.site.search(title)
+        if movie_page_url and self.resolution_cache is not None:
+            self.resolution_cache.put_url(self.site.name, title, movie_page_url)
+        return movie_page_url
+
+    def scrape(self, movie_page_url, movie_id=None):
+        extract = self.extract
+        if self.archive is not None:
+            extract = self.archive.recording(extract or self.site.extract, self.site.name, movie_id)
+        with debug_capture.movie(movie_id):
+            return self.site.scrape(movie_page_url, extract=extract)
+
+    def journal_result(self, movie_id, title, movie_page_url, scraped_details):
+        """取得直後の結果をジャーナルに記録する (ワーカーからも呼ばれる)。
+        記録するのは確定した結果 (取得データ / 見つからなかった / 有効な情報がなかった) のみで、
+        取得に失敗した (http_client.FETCH_FAILED) タイトルは記録せず、--resume で再試行する"""
+        if self.journal is None:
+            return
+        if movie_page_url is http_client.FETCH_FAILED or scraped_details is http_client.FETCH_FAILED:
+            return
+        if not movie_page_url:
+            status = run_journal.STATUS_NOT_FOUND
+        elif has_scraped_values(scraped_details):
+            status = run_journal.STATUS_OK
+        else:
+            status = run_journal.STATUS_NO_DETAILS
+        details = scraped_details if status == run_journal.STATUS_OK else None
+        self.journal.record(self.site.name, movie_id, title, status, movie_page_url, details)
+
+    def replay_journal_entry(self, entry):
+        """前回の実行で記録済みの結果をネットワークなしで反映する"""
+        if entry['status'] != run_journal.STATUS_OK:
+            return
+        movie_id, title, scraped_details = entry['movie_id'], entry['title'], entry['details']
+        self.write_record(movie_id, title, scraped_details)
+        if movie_id in self.df_indexed.index:
+            self.queue_update(scraped_details)
+        self.fan_out(movie_id, scraped_details)
+
+    def fan_out(self, movie_id, scraped_details):
+        """同じタイトルの他の movie_id にも取得データを記録・反映する"""
+        if not scraped_details:
+            return
+        for duplicate_id, duplicate_title in self.duplicates.get(str(movie_id), ()):
+            details = dict(scraped_details)
+            self.write_record(duplicate_id, duplicate_title, details)
+            if duplicate_id in self.df_indexed.index:
+                self.queue_update(details)
+
+    def handle_result(self, movie_id, title, movie_page_url, scraped_details):
+        """1タイトル分のスクレイピング結果を記録・反映する (呼び出しは1スレッドから直列に行う)"""
+        if movie_page_url is http_client.FETCH_FAILED or scraped_details is http_client.FETCH_FAILED:
+            # タイムアウトやHTTPエラーは「見つからなかった」ではないため、ネガティブキャッシュ・URL索引は変えない
+            stage = '検索' if movie_page_url is http_client.FETCH_FAILED else '詳細情報の取得'
+            logging.warning(f"  -> {self.site.label}での{stage}が完了しませんでした (タイムアウト・HTTPエラー・取りやめ)。")
+            return
+        if movie_page_url:
+            if has_scraped_values(scraped_details):
+                self.write_record(movie_id, title, scraped_details)
+            else:
+                logging.warning(f"  -> 詳細情報の取得に失敗、または有効な情報がありませんでした。URL: {movie_page_url}")
+                scraped_details = None
+                if self.resolution_cache is not None:
+                    # 無効なURLを索引に残さず、次回は検索からやり直す
+                    self.resolution_cache.forget_url(self.site.name, title)
+            if self.resolution_cache is not None:
+                self.resolution_cache.clear_not_found(self.site.name, title)
+        elif self.resolution_cache is not None:
+            attempts = self.resolution_cache.record_not_found(self.site.name, title)
+            logging.debug(f"  -> ネガティブキャッシュに記録 (累計 {attempts} 回)")
+
+        if scraped_details and movie_id in self.df_indexed.index:
+            self.queue_update(scraped_details)
+        elif not movie_page_url:
+            logging.warning(f"  -> {self.site.label}で作品ページが見つかりませんでした。")
+        elif movie_id not in self.df_indexed.index:
+            logging.error(f"  -> 致命的エラー: movie_id '{movie_id}' がDataFrameインデックスに存在しません。")
+
+        duplicates = self.duplicates.get(str(movie_id), ())
+        if duplicates:
+            self.saved_requests += len(duplicates) * (2 if movie_page_url else 1)
+            if scraped_details:
+                logging.info(f"  -> 同じタイトルの {len(duplicates)} 件 (ID: {', '.join(d[0] for d in duplicates)}) にも反映します。")
+            self.fan_out(movie_id, scraped_details)
+
+    def log_summary(self):
+        if self.resolution_cache is not None:
+            stats = self.resolution_cache.stats
+            logging.info(f"  URL索引: 検索省略 {stats['url_hits']} 件, 索引なし {stats['url_misses']} 件, "
+                         f"ネガティブキャッシュ記録 {stats['not_found_recorded']} 件")
+
+
+# --- 逐次モード ---
+def _run_sequential(ctx, target_df):
+    for _, row in target_df.iterrows():
+        movie_id = str(row['movie_id'])
+        title = row['title']
+        logging.info(f"--- 処理開始: {title} (ID: {movie_id}) ---")
+        try:
+            # 1. 検索実行 (リクエスト間隔は rate_limiter が制御)
+            movie_page_url = ctx.search(title, movie_id)
+
+            # 2. 詳細情報取得 (取得直後にジャーナルへ記録)
+            scraped_details = None
+            if movie_page_url:
+                scraped_details = ctx.scrape(movie_page_url, movie_id)
+            ctx.journal_result(movie_id, title, movie_page_url, scraped_details)
+
+            # 3. DataFrame を直接更新 (取得できた情報でNaNの箇所のみ)
+            ctx.handle_result(movie_id, title, movie_page_url, scraped_details)
+        except Exception as e:
+            logging.error(f"  -> 映画'{title}' (ID:{movie_id}) の処理中に予期せぬエラーが発生: {e}", exc_info=ctx.args.debug)
+        finally:
+            logging.info(f"--- 処理完了: {title} (ID: {movie_id}) ---")
+
+
+# --- 並行モード (asyncio) ---
+async def _scrape_title_async(ctx, movie_id, title, semaphores):
+    """ホストごとのセマフォで同時実行数を制限しながら検索・詳細取得を行う。
+    送信間隔はスレッド間で共有される rate_limiter が制御する"""
+    async with semaphores[ctx.site.search_host]:
+        movie_page_url = await asyncio.to_thread(ctx.search, title, movie_id)
+    scraped_details = None
+    if movie_page_url:
+        detail_host = urlsplit(movie_page_url).hostname
+        if detail_host not in semaphores:
+            semaphores[detail_host] = asyncio.Semaphore(ctx.args.concurrency)
+        async with semaphores[detail_host]:
+            scraped_details = await asyncio.to_thread(ctx.scrape, movie_page_url, movie_id)
+    # DataFrameへの反映は全件完了後だが、ジャーナルには取得直後に記録する
+    ctx.journal_result(movie_id, title, movie_page_url, scraped_details)
+    return movie_page_url, scraped_details
+
+
+async def _gather_concurrent(ctx, targets):
+    loop = asyncio.get_running_loop()
+    # asyncio.to_thread が使うデフォルトExecutorを並行数に合わせて拡張 (検索+詳細の2ホスト分)
+    executor = ThreadPoolExecutor(max_workers=max(1, ctx.args.concurrency * 2))
+    loop.set_default_executor(executor)
+    semaphores = {ctx.site.search_host: asyncio.Semaphore(ctx.args.concurrency)}
+    try:
+        tasks = [_scrape_title_async(ctx, movie_id, title, semaphores) for movie_id, title in targets]
+        # 例外はタイトル単位で扱うため return_exceptions=True
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def _run_concurrent(ctx, target_df):
+    targets = [(str(row['movie_id']), row['title']) for _, row in target_df.iterrows()]
+    logging.info(f"並行モード: ホストごとに最大 {ctx.args.concurrency} 件を同時に処理します。")
+    results = asyncio.run(_gather_concurrent(ctx, targets))
+
+    # 結果は対象順に反映するため、抽出データの出力と DataFrame 更新は逐次モードと同じになる
+    for (movie_id, title), result in zip(targets, results):
+        logging.info(f"--- 処理開始: {title} (ID: {movie_id}) ---")
+        try:
+            if isinstance(result, BaseException):
+                raise result
+            movie_page_url, scraped_details = result
+            ctx.handle_result(movie_id, title, movie_page_url, scraped_details)
+        except Exception as e:
+            logging.error(f"  -> 映画'{title}' (ID:{movie_id}) の処理中に予期せぬエラーが発生: {e}", exc_info=ctx.args.debug)
+        finally:
+            logging.info(f"--- 処理完了: {title} (ID: {movie_id}) ---")
+
+
+# --- 2段パイプラインモード (検索ステージ -> 詳細ステージ) ---
+_STOP = object() # ワーカー終了の合図
+
+
+class PipelineStats:
+    """パイプラインの各ステージの処理件数とキュー深さを集計する"""
+
+    def __init__(self, search_queue, detail_queue):
+        self.search_queue = search_queue
+        self.detail_queue = detail_queue
+        self.searched = 0
+        self.detailed = 0
+        self.max_search_depth = 0
+        self.max_detail_depth = 0
+
+    def sample(self):
+        self.max_search_depth = max(self.max_search_depth, self.search_queue.qsize())
+        self.max_detail_depth = max(self.max_detail_depth, self.detail_queue.qsize())
+
+    def log(self, prefix="パイプライン状況"):
+        logging.info(f"{prefix}: 検索済み {self.searched} 件, 詳細取得済み {self.detailed} 件, "
+                     f"キュー深さ 検索待ち {self.search_queue.qsize()}/{self.search_queue.maxsize} "
+                     f"(最大 {self.max_search_depth}), 詳細待ち {self.detail_queue.qsize()}/{self.detail_queue.maxsize} "
+                     f"(最大 {self.max_detail_depth})")
+
+
+async def _pipeline_async(ctx, targets, on_result):
+    """検索ワーカー群と詳細ワーカー群を有界キューでつなぎ、結果を on_result に渡す。
+    キューが満杯になると上流のステージが待たされる (バックプレッシャー)"""
+    args = ctx.args
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max(1, args.search_workers + args.detail_workers))
+    loop.set_default_executor(executor)
+    search_queue = asyncio.Queue(maxsize=args.queue_size)
+    detail_queue = asyncio.Queue(maxsize=args.queue_size)
+    stats = PipelineStats(search_queue, detail_queue)
+
+    async def produce():
+        for target in targets: # targets はジェネレータでもよい (全件をキューに積まない)
+            await search_queue.put(target)
+            stats.sample()
+        for _ in range(args.search_workers):
+            await search_queue.put(_STOP)
+
+    async def search_worker():
+        while True:
+            item = await search_queue.get()
+            if item is _STOP:
+                return
+            movie_id, title = item
+            try:
+                movie_page_url = await asyncio.to_thread(ctx.search, title, movie_id)
+            except Exception as e:
+                logging.error(f"  -> 映画'{title}' (ID:{movie_id}) の検索中に予期せぬエラーが発生: {e}", exc_info=args.debug)
+                movie_page_url = http_client.FETCH_FAILED
+            stats.searched += 1
+            if movie_page_url:
+                await detail_queue.put((movie_id, title, movie_page_url))
+                stats.sample()
+            else:
+                on_result(movie_id, title, movie_page_url, None)
+
+    async def detail_worker():
+        while True:
+            item = await detail_queue.get()
+            if item is _STOP:
+                return
+            movie_id, title, movie_page_url = item
+            try:
+                scraped_details = await asyncio.to_thread(ctx.scrape, movie_page_url, movie_id)
+            except Exception as e:
+                logging.error(f"  -> 映画'{title}' (ID:{movie_id}) の詳細取得中に予期せぬエラーが発生: {e}", exc_info=args.debug)
+                scraped_details = http_client.FETCH_FAILED
+            stats.detailed += 1
+            on_result(movie_id, title, movie_page_url, scraped_details)
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.queue_report_interval)
+            stats.log()
+
+    reporter = asyncio.create_task(report())
+    try:
+        search_tasks = [asyncio.create_task(search_worker()) for _ in range(args.search_workers)]
+        detail_tasks = [asyncio.create_task(detail_worker()) for _ in range(args.detail_workers)]
+        await produce()
+        await asyncio.gather(*search_tasks)
+        for _ in range(args.detail_workers):
+            await detail_queue.put(_STOP)
+        await asyncio.gather(*detail_tasks)
+    finally:
+        reporter.cancel()
+        executor.shutdown(wait=False)
+    stats.log(prefix="パイプライン完了")
+
+
+def _run_pipeline(ctx, target_df):
+    args = ctx.args
+    logging.info(f"パイプラインモード: 検索ワーカー {args.search_workers}, 詳細ワーカー {args.detail_workers}, "
+                 f"キューサイズ {args.queue_size}")
+
+    def on_result(movie_id, title, movie_page_url, scraped_details):
+        # イベントループのスレッドで呼ばれるため、DataFrame更新は直列に行われる
+        logging.info(f"--- 処理完了: {title} (ID: {movie_id}) ---")
+        try:
+            ctx.journal_result(movie_id, title, movie_page_url, scraped_details)
+            ctx.handle_result(movie_id, title, movie_page_url, scraped_details)
+        except Exception as e:
+            logging.error(f"  -> 映画'{title}' (ID:{movie_id}) の処理中に予期せぬエラーが発生: {e}", exc_info=args.debug)
+
+    targets = ((str(row.movie_id), row.title) for row in target_df[['movie_id', 'title']].itertuples(index=False))
+    asyncio.run(_pipeline_async(ctx, targets, on_result))
+
+
+# --- アーカイブからの再抽出 (ネットワークなし) ---
+def _run_from_archive(ctx, target_df, archive):
+    """アーカイブ済みの作品ページを抽出し直して反映する。
+    同じタイトルの行 (ctx.duplicates) はアーカイブされたいずれかの movie_id のページを使い、結果を各 movie_id に反映する。
+    複数プロセスで並列に抽出するが、結果は対象の順に反映する (出力はオンライン実行と同じ順序)"""
+    entries = archive.latest_entries(ctx.site.name)
+    archived = []
+    for movie_id, title in zip(target_df['movie_id'], target_df['title']):
+        # アーカイブ時にまとめ方が違った場合 (--no-title-dedup など) に備え、同じタイトルの movie_id のページも探す
+        candidates = [str(movie_id)] + [d[0] for d in ctx.duplicates.get(str(movie_id), ())]
+        entry = next((entries[c] for c in candidates if c in entries), None)
+        if entry is not None:
+            archived.append((movie_id, title, entry))
+    logging.info(f"アーカイブ '{archive.directory}' から {len(archived)} 件を再抽出します "
+                 f"(アーカイブなし {len(target_df) - len(archived)} 件はスキップ)。")
+
+    failed = 0
+
+    def apply(movie_id, title, url, extract):
+        # 途中で切れた・壊れたレコードはその movie_id だけエラーとして記録し、残りの再抽出を続ける
+        nonlocal failed
+        try:
+            scraped_details = extract()
+        except Exception as e:
+            failed += 1
+            logging.error(f"  -> 映画'{title}' (ID:{movie_id}) のアーカイブからの再抽出中にエラーが発生: {e}", exc_info=ctx.args.debug)
+            return
+        ctx.handle_result(movie_id, title, url, scraped_details)
+
+    workers = ctx.args.parse_workers or parse_pool.default_workers()
+    start = time.perf_counter()
+    if workers <= 1:
+        for movie_id, title, (url, path, offset, length) in archived:
+            apply(movie_id, title, url, functools.partial(extract_archived, ctx.site.extract, path, offset, length))
+    else:
+        # 先読みは最大 workers * 4 件 (全件のFutureを一度に作らない)
+        with parse_pool.ParsePool(workers) as pool:
+            pending = deque()
+            for movie_id, title, (url, path, offset, length) in archived:
+                pending.append((movie_id, title, url, pool.submit_task(extract_archived, ctx.site.extract, path, offset, length)))
+                if len(pending) >= workers * 4:
+                    movie_id, title, url, future = pending.popleft()
+                    apply(movie_id, title, url, future.result)
+            while pending:
+                movie_id, title, url, future = pending.popleft()
+                apply(movie_id, title, url, future.result)
+    elapsed = time.perf_counter() - start
+    logging.info(f"アーカイブから {len(archived)} 件を {elapsed:.1f}秒で再抽出しました "
+                 f"({len(archived) / elapsed if elapsed > 0 else 0:.1f} pages/sec, ワーカー {workers})。")
+    if failed:
+        logging.warning(f"アーカイブから再抽出できなかった {failed} 件はスキップしました (レコードの破損・欠けなど)。")
+
+
+# --- 作業キュー (複数のワーカープロセスで分担) ---
+def _run_work_queue(ctx, target_df, queue, run):
+    """対象をキューに登録し、リースした分を run (逐次/並行/パイプラインの各モード) で処理することを繰り返す。
+    結果は ctx.journal (= queue) に記録される。記録されなかったもの (予期せぬエラー) はリトライに回す。
+    他のワーカーが処理中のリースが残っている間は、期限切れになれば引き継げるよう待機する"""
+    site_name = ctx.site.name
+    added = queue.enqueue(site_name, target_df, ctx.duplicates)
+    logging.info(f"作業キュー '{queue.db_path}': {added} 件を新たに登録しました (ワーカー: {queue.owner}, "
+                 f"リース {ctx.args.lease_batch} 件ずつ, 期限 {ctx.args.lease_seconds:g}秒)。")
+    while True:
+        leased = queue.lease(site_name, ctx.args.lease_batch)
+        if not leased:
+            next_expiry = queue.next_expiry(site_name)
+            if next_expiry is None:
+                break
+            time.sleep(min(work_queue.POLL_SECONDS, max(0.1, next_expiry - time.time())))
+            continue
+        run(ctx, pd.DataFrame(leased, columns=['movie_id', 'title']))
+        retried = queue.release(site_name, error='取得に失敗、または処理中に予期せぬエラーが発生')
+        if retried:
+            logging.warning(f"作業キュー: 結果を記録できなかった {retried} 件をリトライ待ちに戻しました "
+                            f"(最大 {ctx.args.max_attempts} 回まで)。")
+
+
+def journal_path_of(args):
+    """--journal (未指定時は出力CSVに対応するパス)"""
+    return args.journal or run_journal.default_journal_path(args.output)
+
+
+def run_web_scraping(df, target_df, site, args, record_writer, journal=None):
+    """target_df の各映画をスクレイピングして df を更新する。
+    取得データは record_writer (utils.RecordWriter) へ1件ずつ書き出す。
+    journal を渡した場合 (分割読み込みで全チャンク共有) はそこへ記録し、閉じるのは呼び出し側が行う。
+    (更新後のdf, 書き出した件数, 更新行数) を返す"""
+    if target_df.empty:
+        return df, 0, 0
+
+    # movie_id をインデックスに設定して効率化
+    df_indexed = df.set_index('movie_id') # movie_id は string 型のはず
+    journal_path = journal_path_of(args)
+    ctx = ScrapeContext(site, df_indexed, args, record_writer)
+
+    if args.work_queue and (args.from_archive or args.archive):
+        logging.error("--archive / --from-archive は --work-queue と併用できません。")
+        sys.exit(1)
+    target_count = len(target_df)
+    target_df = dedupe_targets(target_df, [ctx], args)
+    if args.from_archive:
+        archive = PageArchive(args.from_archive, readonly=True)
+        try:
+            _run_from_archive(ctx, target_df, archive)
+        finally:
+            ctx.flush_updates()
+            archive.close()
+        return df_indexed.reset_index(), record_writer.count, ctx.update_count
+
+    # --- 再開: ジャーナルの記録を反映し、処理済みの movie_id を対象から除く ---
+    queue = None
+    if args.work_queue:
+        # 作業キューがジャーナルを兼ねる (処理済みの movie_id はキューの状態で判断する)
+        queue = work_queue.WorkQueue(args.work_queue, owner=args.worker_id, lease_seconds=args.lease_seconds,
+                                     max_attempts=args.max_attempts)
+        queue.check_input(args.input)
+        journal_path = args.work_queue
+        if args.resume:
+            logging.info("--work-queue 指定時は --resume を指定しなくても、キューに記録済みの結果は再取得しません。")
+    elif args.resume:
+        done_ids = set()
+        for entry in run_journal.read_journal(journal_path, site=site.name):
+            if args.chunk_size and entry['movie_id'] not in df_indexed.index:
+                continue # 分割読み込みの他のチャンクの記録
+            done_ids.add(entry['movie_id'])
+            ctx.replay_journal_entry(entry)
+        remaining = ~target_df['movie_id'].astype(str).isin(done_ids)
+        logging.info(f"ジャーナル '{journal_path}' から {len(done_ids)} 件の処理済み結果を反映しました。"
+                     f"残り {int(remaining.sum())} 件を処理します。")
+        target_df = target_df[remaining]
+
+    ctx.resolution_cache = ResolutionCache(args.resolution_cache) if args.resolution_cache else None
+    if queue is not None:
+        ctx.journal = queue
+    else:
+        ctx.journal = journal if journal is not None else run_journal.RunJournal(journal_path, resume=args.resume)
+    ctx.archive = PageArchive(args.archive) if args.archive else None
+    configure_debug_capture(args)
+    pool = None
+    if args.parse_workers > 0:
+        if not args.pipeline and args.concurrency <= 1:
+            logging.warning("--parse-workers は逐次モードでは効果がありません。--concurrency または --pipeline と併用してください。")
+        pool = parse_pool.ParsePool(args.parse_workers)
+        ctx.extract = pool.extractor(site.extract)
+        logging.info(f"作品ページの解析を {args.parse_workers} 個のワーカープロセスで行います。")
+    if args.pipeline:
+        run = _run_pipeline
+    elif args.concurrency > 1:
+        run = _run_concurrent
+    else:
+        run = _run_sequential
+    try:
+        if queue is not None:
+            _run_work_queue(ctx, target_df, queue, run)
+        else:
+            run(ctx, target_df)
+    except KeyboardInterrupt:
+        # ここまでの結果でCSV/JSONを保存できるよう、例外は上げずに戻る
+        mark_interrupted()
+        if queue is not None:
+            # 処理中だったものはすぐに他のワーカーが引き継げるようにする (試行回数には数えない)
+            queue.release(site.name, error='中断', count_attempt=False)
+            logging.warning(f"中断されました。処理済みの結果は作業キュー '{journal_path}' に記録されています。"
+                            f"同じ --work-queue で再実行すると続きから再開できます。")
+        else:
+            logging.warning(f"中断されました。処理済みの結果はジャーナル '{journal_path}' に記録されています。"
+                            f"--resume を付けて再実行すると続きから再開できます。")
+    finally:
+        ctx.flush_updates()
+        if queue is not None:
+            # 他のワーカーの結果も反映し、この時点でキューにある結果をすべて含むCSVを書き出せるようにする
+            merged = work_queue.apply_results(ctx.df_indexed, queue, [site.name])
+            logging.info(f"作業キュー: 他のワーカーの結果を含め {merged} 行を反映しました。")
+            counts = work_queue.log_counts(queue, site.name, site.label)
+            if counts[work_queue.STATE_PENDING] or counts[work_queue.STATE_LEASED]:
+                logging.warning("作業キューに未完了の対象が残っています。同じ --work-queue でワーカーを再実行してください。")
+        if ctx.journal is not journal:
+            ctx.journal.close()
+            logging.info(f"ジャーナル: {ctx.journal.recorded} 件を '{journal_path}' に記録しました。")
+        if ctx.resolution_cache is not None:
+            ctx.resolution_cache.close()
+        if pool is not None:
+            pool.close()
+        debug_capture.close() # 書き込み待ちのデバッグ用HTMLを書き終える
+        if ctx.archive is not None:
+            stats = ctx.archive.stats
+            logging.info(f"ページアーカイブ: {stats['stored']} 件を '{args.archive}' に保存しました "
+                         f"({stats['stored_bytes'] / 1024 ** 2:.1f}MB -> 圧縮後 {stats['compressed_bytes'] / 1024 ** 2:.1f}MB)。")
+            ctx.archive.close()
+
+    log_http_stats()
+    ctx.log_summary()
+    log_dedup_summary([ctx], target_count)
+    # ループ完了後、インデックスをリセット
+    return df_indexed.reset_index(), record_writer.count, ctx.update_count
+
+
+# --- 分割読み込み (--chunk-size) ---
+def select_file_targets(site, args, dtypes, schema):
+    """--chunk-size 指定時に、ファイル全体を一度に読み込んだ場合と同じ処理対象 (movie_id の集合) を選ぶ。
+    行の並び順 (movie_id / 優先度) は他の行に依存しないため、全体の上位 limit 件は各チャンクの上位 limit 件に含まれる。
+    チャンクごとの上位 limit 件 (movie_id と並べ替えに使った列のみ) を集めて全体で並べ直し、limit 件に絞る"""
+    tops = []
+    for chunk in utils.iter_csv_chunks(args.input, args.chunk_size, dtypes):
+        chunk = utils.check_and_add_columns(chunk, utils.DEFAULT_OUTPUT_COLUMNS, schema)
+        candidates = rank_candidates(chunk, site, args, quiet=True).head(args.limit)
+        tops.append(candidates[[col for col in ['_negative', '_score', 'movie_id'] if col in candidates.columns]])
+    candidates = pd.concat(tops, ignore_index=True)
+    # rank_candidates / scheduler.prioritize と同じ順 (後回しの行は最後, スコアの高い順, movie_id 順)
+    sort_columns = [col for col in ['_negative', '_score', 'movie_id'] if col in candidates.columns]
+    candidates = candidates.sort_values(by=sort_columns, ascending=[col != '_score' for col in sort_columns], kind='stable')
+    target_ids = set(candidates['movie_id'].head(args.limit))
+    logging.info(f"分割読み込み: ファイル全体の対象候補から {len(target_ids)} 件を処理対象に選びました (最大{args.limit}件)。")
+    return target_ids
+
+
+def process_csv_in_chunks(site, args, process):
+    """入力CSVを --chunk-size 行ずつ読み込み、チャンクごとに処理対象を選んで process(chunk, target_df, chunk_args, journal) で
+    更新したチャンクを出力CSVへ順に書き出す。処理対象にした件数を返す。
+    ジャーナルは最初に1回だけ開き (--resume なしなら作り直し)、全チャンクで共有する
+    (--work-queue / --from-archive 指定時は None)。
+    メモリに載るのは1チャンク分だけで、列の型とスキーマ (utils.scan_csv_dtypes) と処理対象 (select_file_targets) は
+    ファイル全体を一度に読み込んだ場合と同じになるよう、先に読み通して決める (行数が --limit 以下なら処理対象の事前選定は省く)。
+    ただし同じタイトルの行をまとめる (dedupe_targets) のはチャンク内だけで、チャンクをまたぐ重複はそれぞれ取得する"""
+    dtypes, schema, rows = utils.scan_csv_dtypes(args.input, args.chunk_size)
+    chunks = max(1, -(-rows // args.chunk_size))
+    logging.info(f"分割読み込み: {rows} 行を {args.chunk_size} 行ずつ {chunks} チャンクに分けて処理します。")
+    # 候補の数は行数以下なので、行数が limit 以下ならチャンクごとに選んでも全体で選んだ場合と同じになる
+    target_ids = select_file_targets(site, args, dtypes, schema) if rows > args.limit else None
+    journal = None
+    if not args.work_queue and not args.from_archive:
+        journal = run_journal.RunJournal(journal_path_of(args), resume=args.resume)
+    remaining = args.limit
+    processed = 0
+    try:
+        with utils.CsvChunkWriter(args.output) as writer:
+            for i, chunk in enumerate(utils.iter_csv_chunks(args.input, args.chunk_size, dtypes)):
+                chunk = utils.check_and_add_columns(chunk, utils.DEFAULT_OUTPUT_COLUMNS, schema)
+                if remaining > 0 and not _run_state['interrupted']:
+                    logging.info(f"--- チャンク {i + 1}/{chunks} ({len(chunk)} 行, 残り最大 {remaining} 件) ---")
+                    chunk_args = copy.copy(args)
+                    chunk_args.limit = remaining
+                    target_df = select_targets(chunk, site, chunk_args, target_ids)
+                    chunk = process(chunk, target_df, chunk_args, journal)
+                    remaining -= len(target_df)
+                    processed += len(target_df)
+                writer.write(utils.reorder_columns(chunk, utils.DEFAULT_OUTPUT_COLUMNS))
+    finally:
+        if journal is not None:
+            journal.close()
+            logging.info(f"ジャーナル: {journal.recorded} 件を '{journal.path}' に記録しました。")
+    return processed
+
+
+def run_web_scraping_in_chunks(site, args, record_writer):
+    """--chunk-size 指定時の Webスクレイピング。チャンクごとに run_web_scraping を行い、
+    出力CSVもチャンクごとに書き出す。(書き出した件数, 更新行数) を返す"""
+    if args.work_queue:
+        # キューのリースはチャンクを区別しないため、読み込んでいないチャンクの movie_id をリースしてしまう
+        logging.error("--chunk-size は --work-queue と併用できません。")
+        sys.exit(1)
+    update_count = 0
+
+    def process(chunk, target_df, chunk_args, journal):
+        nonlocal update_count
+        chunk, _, count = run_web_scraping(chunk, target_df, site, chunk_args, record_writer, journal)
+        update_count += count
+        return chunk
+
+    process_csv_in_chunks(site, args, process)
+    return record_writer.count, update_count
+
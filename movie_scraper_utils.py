@@ -1,18 +1,50 @@
 # Movie Scraper Utilities
+import numpy as np
 import pandas as pd
 import logging
 import sys
 import json
 import os
 import argparse
+import gzip
+import hashlib
+import socket
+import unicodedata
 from datetime import datetime
 
+try:
+    import zstandard # オプション: --compress zstd を使う場合のみ必要
+except ImportError:
+    zstandard = None
+try:
+    import pyarrow # オプション: 文字列の列を pyarrow で保持する (なければ pandas の文字列型)
+except ImportError:
+    pyarrow = None
+
 # --- 定数 ---
 DEFAULT_OUTPUT_COLUMNS = [
     'movie_id', 'title', 'year', 'director', 'summary', 'cast',
     'producer', 'cinematographer', 'country', 'runtime', 'distributor',
     'full_staff', 'full_cast', 'reviews'
 ]
+JSON_COLUMNS = ['full_staff', 'full_cast', 'reviews'] # JSON文字列としてCSVに保存する列
+NUMERIC_COLUMNS = ['year', 'runtime']                  # 整数に変換して保存する列
+# 列の型 (apply_schema)。year / runtime は欠損を扱える整数、値の種類が少ない country / distributor はカテゴリ、
+# その他の文字列の列は pyarrow の文字列 (欠損は NaN のまま)。movie_id は load_csv で文字列として読み込む
+try:
+    TEXT_DTYPE = pd.StringDtype('pyarrow' if pyarrow is not None else 'python', na_value=np.nan)
+except TypeError: # pandas 2.2 以前 (欠損は pd.NA)
+    TEXT_DTYPE = pd.StringDtype('pyarrow' if pyarrow is not None else 'python')
+COLUMN_DTYPES = {
+    **{col: TEXT_DTYPE for col in DEFAULT_OUTPUT_COLUMNS if col != 'movie_id'},
+    'year': 'Int16', 'runtime': 'Int32',
+    'country': 'category', 'distributor': 'category',
+}
+# update_dataframe_from_json で一度に反映するレコード数 (逐次読み込みのJSONでも全件をリストにしない)
+JSON_MERGE_BATCH_SIZE = 10000
+# 抽出データ (MovieData_<サイト>_<日時>) の出力形式と圧縮形式
+RECORD_OUTPUT_FORMATS = ['json', 'jsonl']
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
 
 # --- ロギング設定 ---
 def setup_logging(log_level_str='INFO'):
@@ -21,12 +53,13 @@ def setup_logging(log_level_str='INFO'):
     logging.basicConfig(level=log_level, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stdout)
 
 # --- ファイル I/O ---
-def load_csv(filepath):
-    """指定されたパスからShift_JISエンコーディングでCSVファイルを読み込む"""
+def load_csv(filepath, as_text=False):
+    """指定されたパスからShift_JISエンコーディングでCSVファイルを読み込む
+    (as_text=True の場合は全列を文字列のまま読み込む。書かれている値をそのまま保存し直す場合に使う)"""
     try:
         logging.info(f"CSVファイルを読み込み中: {filepath}")
         # dtype={'movie_id': str} を追加して movie_id を文字列として読み込むことを保証する
-        df = pd.read_csv(filepath, encoding='shift_jis', dtype={'movie_id': str})
+        df = pd.read_csv(filepath, encoding='shift_jis', dtype=str if as_text else {'movie_id': str})
         logging.info("CSVファイルの読み込み完了")
         return df
     except FileNotFoundError:
@@ -41,20 +74,137 @@ def save_csv(df, filepath):
     try:
         logging.info(f"更新されたCSVファイルを保存中: {filepath}")
         # Shift_JISでエンコードできない文字は '?' に置換する
-        df.to_csv(filepath, encoding='shift_jis', index=False, errors='replace')
+        # 一時ファイルに書いてから置き換える (複数のワーカーが同じ出力先に保存しても壊れたファイルが残らない)
+        tmp_path = f"{filepath}.{os.getpid()}.tmp"
+        df.to_csv(tmp_path, encoding='shift_jis', index=False, errors='replace')
+        os.replace(tmp_path, filepath)
         logging.info("CSVファイルの保存完了")
     except Exception as e:
         logging.error(f"CSVファイルの保存中にエラーが発生しました: {e}")
         sys.exit(1)
 
+def scan_csv_dtypes(filepath, chunk_size):
+    """CSVを chunk_size 行ずつ読み、ファイル全体を一度に読み込んだ場合と同じになる列の型を決める。
+    ({列名: 型} (チャンクごとに推定が異なる列のみ), 各チャンクに適用するスキーマ, 行数) を返す。
+    例: 整数だけのチャンクと空欄を含むチャンクがある列はファイル全体では float64、数値と文字列が混ざる列は文字列になる。
+    スキーマは COLUMN_DTYPES から、いずれかのチャンクで整数型に変換できない列 (ファイル全体でも変換できない列) を除いたもの"""
+    kinds = {}
+    unfit = set()
+    rows = 0
+    try:
+        for chunk in pd.read_csv(filepath, encoding='shift_jis', dtype={'movie_id': str}, chunksize=chunk_size):
+            rows += len(chunk)
+            for col, dtype in chunk.dtypes.items():
+                kinds.setdefault(col, set()).add(dtype)
+                if col in NUMERIC_COLUMNS and not _fits_dtype(chunk[col], COLUMN_DTYPES[col]):
+                    unfit.add(col)
+    except FileNotFoundError:
+        logging.error(f"エラー: ファイルが見つかりません: {filepath}")
+        sys.exit(1)
+    except Exception as e:
+        logging.error(f"CSVファイルの読み込み中にエラーが発生しました: {e}")
+        sys.exit(1)
+    dtypes = {}
+    for col, found in kinds.items():
+        if len(found) == 1:
+            continue
+        if all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in found):
+            dtypes[col] = np.result_type(*found)
+        else:
+            dtypes[col] = str
+    for col in sorted(unfit):
+        logging.warning(f"列 '{col}' に {COLUMN_DTYPES[col]} に変換できない値があるため、読み込んだ型のまま扱います。")
+    schema = {col: dtype for col, dtype in COLUMN_DTYPES.items() if col not in unfit}
+    return dtypes, schema, rows
+
+def iter_csv_chunks(filepath, chunk_size, dtypes=None):
+    """CSVを chunk_size 行ずつの DataFrame として返すジェネレータ (dtypes は scan_csv_dtypes の結果)"""
+    dtype = {'movie_id': str, **(dtypes or {})}
+    yield from pd.read_csv(filepath, encoding='shift_jis', dtype=dtype, chunksize=chunk_size)
+
+class CsvChunkWriter:
+    """DataFrameをチャンクごとに Shift_JIS のCSVへ追記する (先頭のチャンクのみヘッダーを書く)。
+    save_csv と同じく一時ファイルに書き、close() で出力先と置き換える"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.rows = 0
+        self._tmp_path = f"{filepath}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, 'w', encoding='shift_jis', errors='replace', newline='')
+        self._header = True
+        logging.info(f"CSVファイルを分割して保存中: {filepath}")
+
+    def write(self, df):
+        df.to_csv(self._file, index=False, header=self._header)
+        self._header = False
+        self.rows += len(df)
+
+    def close(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.filepath)
+        logging.info(f"CSVファイルの保存完了 ({self.rows} 行)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # 途中まで書いた一時ファイルは残さない
+            self._file.close()
+            os.remove(self._tmp_path)
+
+def _compression_of(filepath):
+    """拡張子から圧縮形式を判定する"""
+    if filepath.endswith('.gz'):
+        return 'gzip'
+    if filepath.endswith('.zst'):
+        return 'zstd'
+    return 'none'
+
+def _open_text(filepath, mode, compression='none'):
+    """圧縮形式に応じてUTF-8のテキストファイルを開く (mode は 'r' または 'w')"""
+    if compression == 'gzip':
+        return gzip.open(filepath, mode + 't', encoding='utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd 圧縮には zstandard パッケージが必要です (pip install zstandard)")
+        return zstandard.open(filepath, mode + 't', encoding='utf-8')
+    return open(filepath, mode, encoding='utf-8')
+
+def is_jsonl_path(filepath):
+    """JSON Lines 形式のファイル (.jsonl, .jsonl.gz, .jsonl.zst) かどうか"""
+    return filepath.endswith(('.jsonl', '.jsonl.gz', '.jsonl.zst'))
+
+def iter_jsonl(filepath):
+    """JSON Lines ファイルのレコードを1件ずつ返すジェネレータ (圧縮ファイルにも対応)"""
+    with _open_text(filepath, 'r', _compression_of(filepath)) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                logging.warning(f"JSON Lines ファイル '{filepath}' の {line_no} 行目を解析できないため読み飛ばします: {e}")
+
 def load_json(filepath):
-    """指定されたパスからJSONファイルを読み込む"""
+    """指定されたパスからJSONファイルを読み込む。
+    JSON Lines 形式 (.jsonl / .jsonl.gz / .jsonl.zst) の場合は全件を読み込まず、
+    レコードを1件ずつ返すジェネレータを返す"""
     if not os.path.exists(filepath):
         logging.error(f"エラー: JSON入力ファイルが見つかりません: {filepath}")
         return None
+    if is_jsonl_path(filepath):
+        if _compression_of(filepath) == 'zstd' and zstandard is None:
+            logging.error("エラー: zstd 圧縮ファイルの読み込みには zstandard パッケージが必要です (pip install zstandard)")
+            return None
+        logging.info(f"JSON Linesファイルを逐次読み込みます: {filepath}")
+        return iter_jsonl(filepath)
     try:
         logging.info(f"JSONファイルを読み込み中: {filepath}")
-        with open(filepath, 'r', encoding='utf-8') as f:
+        with _open_text(filepath, 'r', _compression_of(filepath)) as f:
             data = json.load(f)
         logging.info("JSONファイルの読み込み完了")
         if not isinstance(data, list):
@@ -81,32 +231,137 @@ def save_json(data, filepath):
     except Exception as e:
         logging.error(f"JSONファイル '{filepath}' の保存中にエラーが発生しました: {e}")
 
+def record_output_path(site_name, timestamp, output_format='json', compress='none', shard=None, worker=None):
+    """抽出データの出力ファイル名 (例: MovieData_eiga.com_20250101120000.jsonl.gz)。
+    shard=(i, N) の場合は同時に実行した他のシャードと重ならないよう MovieData_eiga.com_20250101120000_shard0of4.jsonl.gz とする。
+    worker (作業キューのワーカーID) を指定した場合も同様に MovieData_eiga.com_20250101120000_<worker>.jsonl.gz とする"""
+    suffix = f"_shard{shard[0]}of{shard[1]}" if shard else ""
+    if worker:
+        suffix += f"_{worker}"
+    return f"MovieData_{site_name}_{timestamp}{suffix}.{output_format}{COMPRESSION_SUFFIXES[compress]}"
+
+class RecordWriter:
+    """抽出データを1件ずつファイルへ書き出すライター。
+    全件をメモリに溜めずに、レコードごとに書き込んで flush する。
+    - 'jsonl': 1行1レコードの JSON Lines
+    - 'json' : save_json (indent=4) と同じ内容のJSON配列
+    ファイルは最初のレコードを書き込むときに作成する (0件ならファイルを作らない)。"""
+
+    def __init__(self, filepath, output_format='json', compress='none'):
+        if output_format not in RECORD_OUTPUT_FORMATS:
+            raise ValueError(f"未対応の出力形式です: {output_format}")
+        if compress == 'zstd' and zstandard is None:
+            logging.error("エラー: --compress zstd には zstandard パッケージが必要です (pip install zstandard)")
+            sys.exit(1)
+        self.filepath = filepath
+        self.output_format = output_format
+        self.compress = compress
+        self.count = 0
+        self._file = None
+
+    def write(self, record):
+        if self._file is None:
+            logging.info(f"抽出データを逐次書き込みます: {self.filepath}")
+            self._file = _open_text(self.filepath, 'w', self.compress)
+            if self.output_format == 'json':
+                self._file.write("[\n")
+        if self.output_format == 'jsonl':
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            # json.dump(list, indent=4) と同じ出力になるよう、要素ごとに1段インデントして書く
+            text = json.dumps(record, ensure_ascii=False, indent=4).replace("\n", "\n    ")
+            self._file.write(("" if self.count == 0 else ",\n") + "    " + text)
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        if self.output_format == 'json':
+            self._file.write("\n]")
+        self._file.close()
+        self._file = None
+        logging.info(f"抽出データ {self.count} 件を '{self.filepath}' に保存しました。")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+# --- タイトル正規化 ---
+def normalize_title(title):
+    """キャッシュやグループ化のキーに使うためにタイトルを正規化する
+    (NFKC で全角/半角を統一、空白を1つにまとめ、英字は小文字化)"""
+    if title is None or (not isinstance(title, str) and pd.isna(title)):
+        return ''
+    normalized = unicodedata.normalize('NFKC', str(title))
+    return ' '.join(normalized.split()).casefold()
+
+# --- シャード分割 ---
+def parse_shard(value):
+    """'i/N' 形式の文字列を (i, N) に変換する (argparse の type 用, i は 0 から N-1)"""
+    index, sep, count = value.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        index = count = None
+    if not sep or count is None or count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"'i/N' (0 <= i < N) の形式で指定してください: {value}")
+    return index, count
+
+def shard_of(movie_id, count):
+    """movie_id が属するシャード番号 (0 から count-1)。実行環境によらず同じ値になるよう md5 を使う"""
+    digest = hashlib.md5(str(movie_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+def in_shard(movie_ids, shard):
+    """movie_ids (Series) のうち shard=(i, N) に属するものを True とする bool Series"""
+    index, count = shard
+    return movie_ids.map(lambda movie_id: shard_of(movie_id, count) == index).astype(bool)
+
 # --- DataFrame 操作 ---
-def check_and_add_columns(df, required_columns):
-    """DataFrameに必要な列が存在するか確認し、なければNaNで追加する。"""
+def check_and_add_columns(df, required_columns, schema=COLUMN_DTYPES):
+    """DataFrameに必要な列が存在するか確認し、なければNaNで追加する。
+    schema ({列名: 型}) の型に変換する (None の場合は変換しない。書かれている値をそのまま保存し直す場合に使う)"""
     added_cols = []
     for col in required_columns:
         if col not in df.columns:
-            df[col] = pd.NA # または np.nan
+            df[col] = np.nan
             added_cols.append(col)
     if added_cols:
         logging.info(f"以下の列をNaNで追加しました: {added_cols}")
+    if schema:
+        df = apply_schema(df, schema)
+    return df
 
-    # --- FutureWarning対策: 主要な出力列の dtype を object に設定 --- 
-    # (movie_id は load_csv で str に変換される想定)
-    # (year, runtime は後で数値に変換されるため、ここでは object のままで良い)
-    cols_to_object = [col for col in DEFAULT_OUTPUT_COLUMNS if col != 'movie_id']
-    try:
-        for col in cols_to_object:
-            if col in df.columns and df[col].dtype != 'object':
-                 # すでに object 型でなければ変換 (NaN を含む場合は object が適切)
-                 # Int64 や Float64 など数値型になっている場合がある
-                 df[col] = df[col].astype('object')
-        logging.debug(f"列 {cols_to_object} の dtype を object に設定しました (FutureWarning対策)")
-    except Exception as e:
-        logging.warning(f"列の dtype 変換中にエラーが発生しました: {e}")
-    # --- ここまで追加 ---
-
+def _fits_dtype(values, dtype):
+    """values (読み込んだ列) を値を失わずに dtype に変換できるか。
+    整数型には、数値として読み込まれ、欠損以外がすべて範囲内の整数の列のみ変換する (文字列の列は解釈しない)"""
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if not pd.api.types.is_integer_dtype(dtype) or values.dtype == dtype:
+        return True
+    if not pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+        return False
+    numbers = values.dropna().to_numpy(dtype=float)
+    info = np.iinfo(dtype.numpy_dtype)
+    return bool(((numbers == np.trunc(numbers)) & (numbers >= info.min) & (numbers <= info.max)).all())
+
+def apply_schema(df, schema=COLUMN_DTYPES):
+    """列を schema ({列名: 型}) の型に変換する。
+    整数型に変換できない値 (小数や文字列) を含む列は、値を失わないよう読み込んだ型のまま残す"""
+    for col, dtype in schema.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if not _fits_dtype(df[col], dtype):
+            logging.warning(f"列 '{col}' に {dtype} に変換できない値があるため、読み込んだ型 ({df[col].dtype}) のまま扱います。")
+            continue
+        if dtype == 'category':
+            # カテゴリは文字列として持つ (後から追加する値と同じ型にする)
+            df[col] = df[col].astype(TEXT_DTYPE).astype('category')
+        else:
+            df[col] = df[col].astype(dtype)
+    logging.debug(f"列の型: {df.dtypes.astype(str).to_dict()}")
     return df
 
 def reorder_columns(df, column_order):
@@ -117,14 +372,92 @@ def reorder_columns(df, column_order):
     final_order = existing_cols_in_order + other_cols
     return df[final_order]
 
+def _convert_merge_values(col, values):
+    """列の種類に応じて値を一括変換する。(変換後の値の配列, 変換に成功したかの bool 配列) を返す"""
+    if col in JSON_COLUMNS:
+        ok = values.map(lambda v: isinstance(v, (list, dict))).to_numpy(dtype=bool)
+        converted = values[ok].map(lambda v: json.dumps(v, ensure_ascii=False))
+    elif col in NUMERIC_COLUMNS:
+        numbers = pd.to_numeric(values, errors='coerce')
+        ok = numbers.notna().to_numpy(dtype=bool)
+        # int() と同じく小数部を切り捨てて Int64 にそろえ、CSVには整数として書き出す
+        converted = np.trunc(numbers[ok].astype(float)).astype('Int64')
+    else:
+        ok = np.ones(len(values), dtype=bool)
+        converted = values.map(str)
+    return converted.astype(object).to_numpy(), ok
+
+def merge_records(df_indexed, records, columns, count_failed_numeric=False):
+    """取得データ (辞書のイテラブル) を1つのDataFrameにまとめ、df_indexed (movie_id インデックス) の
+    欠損セルにのみ列単位で一括反映する。
+    - 同じ movie_id のレコードが複数ある場合は、先に現れた有効な値を採用する (1件ずつ反映した場合と同じ)
+    - year / runtime は整数、full_staff / full_cast / reviews はJSON文字列、その他は文字列として保存する
+    - count_failed_numeric=True の場合、数値に変換できなかった値も「更新を試みた」として数える
+      (update_dataframe_from_json の従来の集計方法)
+    レコードと同じ並びで、DataFrameを更新したかどうかの bool 配列を返す"""
+    frame = pd.DataFrame.from_records(list(records) if not isinstance(records, list) else records)
+    updated = np.zeros(len(frame), dtype=bool)
+    if frame.empty or 'movie_id' not in frame.columns:
+        return updated
+    positions = df_indexed.index.get_indexer(frame['movie_id'].astype(str))
+    found = positions >= 0
+
+    for col in columns:
+        if col not in frame.columns or col not in df_indexed.columns:
+            continue
+        col_idx = df_indexed.columns.get_loc(col)
+        missing = np.zeros(len(frame), dtype=bool)
+        missing[found] = df_indexed.iloc[:, col_idx].isna().to_numpy()[positions[found]]
+        candidate = np.flatnonzero(missing & frame[col].notna().to_numpy())
+        if len(candidate) == 0:
+            continue
+        converted, ok = _convert_merge_values(col, frame[col].iloc[candidate])
+        success = candidate[ok]
+        # セルごとに最初に成功したレコードだけを採用する
+        first = ~pd.Series(positions[success]).duplicated().to_numpy()
+        winners = success[first]
+        updated[winners] = True
+        if count_failed_numeric and col in NUMERIC_COLUMNS:
+            failed = candidate[~ok]
+            # 同じセルに有効な値が入る前に現れた変換失敗のみ数える
+            winner_at = pd.Series(winners, index=positions[winners])
+            filled_by = winner_at.reindex(positions[failed]).to_numpy(dtype=float)
+            updated[failed[np.isnan(filled_by) | (failed < filled_by)]] = True
+        column = _fit_column(df_indexed[col], converted[first])
+        if column is not None:
+            df_indexed[col] = column
+        df_indexed.iloc[positions[winners], col_idx] = converted[first]
+    return updated
+
+def _fit_column(column, values):
+    """values (代入する値の配列) を代入できるように型を調整した列を返す (調整が不要なら None)。
+    カテゴリの列には新しい値をカテゴリに追加し、列の型に収まらない値がある場合は object 型にする"""
+    dtype = column.dtype
+    if dtype == object:
+        return None
+    if isinstance(dtype, pd.CategoricalDtype):
+        if all(isinstance(value, str) for value in values):
+            new_values = pd.Index(values).unique().difference(dtype.categories)
+            return column.cat.add_categories(new_values) if len(new_values) else None
+    elif isinstance(dtype, pd.StringDtype):
+        if all(isinstance(value, str) for value in values):
+            return None
+    elif pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        info = np.iinfo(dtype.numpy_dtype)
+        if all(isinstance(value, (int, np.integer)) and info.min <= value <= info.max for value in values):
+            return None
+    return column.astype(object)
+
 def update_dataframe_from_json(df, json_data):
     """JSONデータリストを使ってDataFrameを更新する"""
-    update_count = 0
-    if not json_data:
+    if isinstance(json_data, list) and not json_data:
         logging.warning("JSONデータが空のため、DataFrameの更新は行われません。")
         return df.copy() # 変更がない場合もコピーを返す
 
-    logging.info(f"JSONデータ ({len(json_data)} 件) を使用してDataFrameを更新します...")
+    if isinstance(json_data, list):
+        logging.info(f"JSONデータ ({len(json_data)} 件) を使用してDataFrameを更新します...")
+    else:
+        logging.info("JSONデータを逐次読み込みながらDataFrameを更新します...")
 
     df_updated = df.copy() # 元のDataFrameを変更しない
 
@@ -137,84 +470,39 @@ def update_dataframe_from_json(df, json_data):
     # movie_id を文字列に変換してからインデックスに設定
     df_updated['movie_id'] = df_updated['movie_id'].astype(str)
     df_indexed = df_updated.set_index('movie_id')
-    original_columns = df_updated.columns # インデックス設定後の列リスト
 
+    # 更新対象の列リスト (movie_id, titleを除く、かつDataFrameに存在する列のみ)
+    columns_to_update = [
+        col for col in DEFAULT_OUTPUT_COLUMNS
+        if col in df_indexed.columns and col not in ['movie_id', 'title']
+    ]
+
+    # 無効な要素を除き、movie_id を文字列にそろえたレコードを JSON_MERGE_BATCH_SIZE 件ずつ一括反映する
+    # (反映済みのセルは次のバッチでは欠損ではないため、全件を一度に反映した場合と同じく先に現れた値が残る)
+    records = []
+    update_count = 0
+    skipped_not_found = 0
     for details in json_data:
         if not isinstance(details, dict):
             logging.warning(f"JSONデータ内の無効な要素をスキップしました: {details}")
             continue
-
         movie_id = details.get('movie_id')
-        movie_id_str = str(movie_id) if movie_id is not None else None
-        title = details.get('title', '[タイトル不明]')
-
-        if movie_id_str is None:
-            logging.warning(f"movie_id が見つからないため、JSONデータ内の要素をスキップしました: {title}")
+        if movie_id is None:
+            logging.warning(f"movie_id が見つからないため、JSONデータ内の要素をスキップしました: {details.get('title', '[タイトル不明]')}")
             continue
-
-        logging.debug(f"--- JSONデータ処理開始: {title} (ID: {movie_id_str}) ---") # デバッグレベルに変更
-
-        if movie_id_str in df_indexed.index:
-            updated_this_iteration = False
-            update_log_messages = []
-
-            # 更新対象の列リスト (movie_id, titleを除く、かつDataFrameに存在する列のみ)
-            columns_to_update = [
-                col for col in DEFAULT_OUTPUT_COLUMNS
-                if col in df_indexed.columns and col not in ['movie_id', 'title']
-            ]
-
-            for col in columns_to_update:
-                # DataFrameの値が欠損しており、かつJSONデータにそのキーと値が存在する場合に更新
-                if pd.isna(df_indexed.loc[movie_id_str, col]) and details.get(col) is not None:
-                    value_to_update = details[col]
-                    log_message = f"{col}"
-
-                    try:
-                        # JSON文字列として保存する列
-                        if col in ['full_staff', 'full_cast', 'reviews']:
-                            if isinstance(value_to_update, (list, dict)):
-                                df_indexed.loc[movie_id_str, col] = json.dumps(value_to_update, ensure_ascii=False)
-                                log_message += "(JSON)"
-                            else:
-                                logging.warning(f"  -> [{movie_id_str}:{title}] {col} の値が予期しない型 ({type(value_to_update)}) のためスキップ: {str(value_to_update)[:50]}...")
-                                continue
-                        # 数値型に変換する列
-                        elif col in ['year', 'runtime']:
-                            numeric_value = pd.to_numeric(value_to_update, errors='coerce')
-                            if pd.notna(numeric_value):
-                                # Int64 に変換しようと試みるが、対象列がなければastypeでエラーになる可能性
-                                # loc で直接 int を代入するのが安全か
-                                df_indexed.loc[movie_id_str, col] = int(numeric_value)
-                                log_message += f":{int(numeric_value)}"
-                            else:
-                                df_indexed.loc[movie_id_str, col] = pd.NA
-                                log_message += ": [変換失敗]"
-                        # その他の文字列等
-                        else:
-                            df_indexed.loc[movie_id_str, col] = str(value_to_update)
-                            display_value = str(value_to_update)
-                            if len(display_value) > 30:
-                                display_value = display_value[:27] + "..."
-                            log_message += f":{display_value}"
-
-                        updated_this_iteration = True
-                        update_log_messages.append(log_message)
-
-                    except Exception as e:
-                         logging.warning(f"  -> [{movie_id_str}:{title}] {col} の更新中に予期せぬエラー: {e} (値: {str(value_to_update)[:50]}...)")
-                         continue
-
-            if updated_this_iteration:
-                logging.info(f"  -> [{movie_id_str}:{title}] DataFrame更新: {', '.join(update_log_messages)}")
-                update_count += 1
-            else:
-                logging.debug(f"  -> [{movie_id_str}:{title}] 更新対象の情報が見つからないか、既に値が存在するため、DataFrameは更新されませんでした。")
-
-        else:
-            logging.warning(f"元のDataFrameに movie_id = {movie_id_str} が見つかりません。JSONデータをスキップします。")
-
-        logging.debug(f"--- JSONデータ処理完了: {title} (ID: {movie_id_str}) ---")
+        movie_id_str = str(movie_id)
+        if movie_id_str not in df_indexed.index:
+            logging.debug(f"元のDataFrameに movie_id = {movie_id_str} が見つかりません。JSONデータをスキップします。")
+            skipped_not_found += 1
+            continue
+        records.append({**details, 'movie_id': movie_id_str})
+        if len(records) >= JSON_MERGE_BATCH_SIZE:
+            update_count += int(merge_records(df_indexed, records, columns_to_update, count_failed_numeric=True).sum())
+            records = []
+    if records:
+        update_count += int(merge_records(df_indexed, records, columns_to_update, count_failed_numeric=True).sum())
+    if skipped_not_found:
+        logging.warning(f"元のDataFrameに movie_id が見つからないJSONデータ {skipped_not_found} 件をスキップしました。")
 
     logging.info(f"JSONデータから合計 {update_count} 回のデータ更新を行いました。")
     # インデックスをリセットして元のDataFrameと同じ列順序に戻す
@@ -233,6 +521,69 @@ def setup_common_parser(description="映画の詳細情報を取得・更新す
     parser.add_argument('--json-input', default=None, help='Web検索の代わりに読み込むJSONファイルのパス (UTF-8)')
     parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='ログレベル (デフォルト: INFO)')
     # --debug フラグは main 側で解釈して log-level を上書きする方がシンプル
-    parser.add_argument('--debug', action='store_true', help='デバッグモード (ログレベルをDEBUGに設定)')
+    parser.add_argument('--debug', action='store_true', help='デバッグモード (ログレベルをDEBUGに設定し、取得したHTMLを _debug_pages/ に保存)')
+    # --- ページアーカイブ (movie_page_archive.py) ---
+    parser.add_argument('--archive', default=None, help='取得した作品ページを圧縮して追記保存するアーカイブのディレクトリ (WARC形式 + SQLite索引)')
+    parser.add_argument('--from-archive', default=None, help='ネットワークに出ず、アーカイブ済みの作品ページから抽出し直す (セレクタ修正後の再抽出用, --parse-workers で並列数を指定)')
+    # --- デバッグ用HTML保存 (scrapers/debug_capture.py) ---
+    parser.add_argument('--capture-dir', default=None, help='取得したHTMLを <DIR>/<サイト>/<movie_id>_<種類>_<日時>.html に保存する (デフォルト: 無効, --debug 時は _debug_pages)')
+    parser.add_argument('--capture-rate', type=float, default=1.0, help='HTMLを保存する作品の割合 (0-1, movie_id ごとにサンプリング, デフォルト: 1.0)')
+    parser.add_argument('--capture-max-mb', type=float, default=200, help='保存先の合計サイズの上限 (MB)。超えたら古いファイルから削除 (デフォルト: 200)')
+    # --- HTTP接続設定 (scrapers/http_client.py の共有セッションに適用) ---
+    parser.add_argument('--pool-size', type=int, default=10, help='ホストごとのkeep-alive接続プールサイズ (デフォルト: 10)')
+    parser.add_argument('--timeout', type=float, default=15, help='HTTPリクエストのタイムアウト秒数 (デフォルト: 15)')
+    parser.add_argument('--concurrency', type=int, default=1, help='asyncioによる並行処理数 (ホストごとの同時処理タイトル数, 1で逐次処理, デフォルト: 1)')
+    # --- HTML解析 (scrapers/html_parser.py) ---
+    parser.add_argument('--full-parse', action='store_true', help='部分解析を無効にし、常にページ全体を解析する (抽出できない場合の切り分け用)')
+    parser.add_argument('--parser', default=None, choices=['lxml', 'html.parser'], help='HTMLパーサー (デフォルト: lxml がインストールされていれば lxml、なければ html.parser)')
+    parser.add_argument('--parse-workers', type=int, default=0, help='作品ページの解析を行うワーカープロセス数 (0で取得と同じプロセスで解析, 目安はCPUコア数, デフォルト: 0)')
+    parser.add_argument('--structured-data', default='merge', choices=['fast', 'merge', 'off'],
+                        help='JSON-LD / OpenGraph の利用方法。merge: JSON-LD で埋まらなかった項目とキャストの領域だけHTMLを解析する, fast: JSON-LD で埋まらなかった項目の領域だけHTMLを解析する (キャストは役名なしの場合あり), off: 使わない (デフォルト: merge)')
+    # --- 2段パイプライン (検索ステージ -> 有界キュー -> 詳細ステージ) ---
+    parser.add_argument('--pipeline', action='store_true', help='検索と詳細取得を別々のワーカー群で並行処理するパイプラインモード')
+    parser.add_argument('--search-workers', type=int, default=2, help='パイプラインの検索ステージのワーカー数 (デフォルト: 2)')
+    parser.add_argument('--detail-workers', type=int, default=2, help='パイプラインの詳細ステージのワーカー数 (デフォルト: 2)')
+    parser.add_argument('--queue-size', type=int, default=50, help='パイプラインの各ステージ入力キューの上限件数 (デフォルト: 50)')
+    parser.add_argument('--queue-report-interval', type=float, default=10.0, help='パイプラインのキュー深さを報告する間隔(秒) (デフォルト: 10)')
+    # --- HTTPレスポンスのディスクキャッシュ (scrapers/http_cache.py) ---
+    parser.add_argument('--cache-dir', default=None, help='HTTPレスポンスキャッシュのディレクトリ (指定時のみ有効)')
+    parser.add_argument('--cache-ttl', type=float, default=24, help='キャッシュをそのまま使う期間(時間)。経過後はETag/Last-Modifiedで再検証 (デフォルト: 24)')
+    parser.add_argument('--cache-max-mb', type=float, default=1024, help='キャッシュの最大サイズ(MB)。超過分は最終アクセスが古いものから削除 (デフォルト: 1024)')
+    # --- タイトル -> 作品ページURL の解決結果キャッシュ (movie_resolution_cache.py) ---
+    parser.add_argument('--resolution-cache', default=None, help='タイトル解決結果を保存するSQLiteファイル。指定時は解決済みタイトルの検索を省略し、見つからなかったタイトルも記録する')
+    parser.add_argument('--negative-ttl', type=float, default=7, help='「見つからなかった」タイトルを再検索しない期間(日)。失敗が続くと最大8倍まで延長 (デフォルト: 7)')
+    parser.add_argument('--negative-policy', choices=['skip', 'deprioritize'], default='skip', help='ネガティブキャッシュ有効期限内のタイトルの扱い: skip=対象外, deprioritize=最後に回す (デフォルト: skip)')
+    # --- 対象選定の順序 (movie_scheduler.py) ---
+    parser.add_argument('--scheduler', default='movie_id', choices=['movie_id', 'priority'],
+                        help='処理対象を選ぶ順序。movie_id: movie_id 順, priority: 欠損列の数・サイトの取得率・URL索引/ネガティブキャッシュの状態から、1リクエストあたりに埋まる見込みのセルが多い順 (デフォルト: movie_id)')
+    parser.add_argument('--no-title-dedup', action='store_true', help='正規化したタイトルが同じ行もまとめずに1行ずつ取得する (デフォルトは1回だけ取得して各行に反映)')
+    # --- シャード (複数のプロセス・マシンで分担する) ---
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar='I/N',
+                        help='movie_id のハッシュで対象を N 分割し、i 番目 (0 から N-1) だけを処理する。各シャードの出力は merge_movie_shards.py でまとめる')
+    # --- 分割読み込み (大きな入力CSV向け) ---
+    parser.add_argument('--chunk-size', type=int, default=0, help='入力CSVをこの行数ずつ読み込み、チャンクごとに対象選定・取得・保存を行う (Web検索モードのみ, --work-queue とは併用不可, 0で全体を一度に読み込む, デフォルト: 0)')
+    # --- 作業キュー (movie_work_queue.py, 複数のワーカープロセスで分担する) ---
+    parser.add_argument('--work-queue', default=None, help='作業キューのSQLiteファイル。同じファイルを指定した複数のプロセスで対象を分担する (結果は export_work_queue.py でCSVに書き出せる)')
+    parser.add_argument('--worker-id', default=f"{socket.gethostname()}-{os.getpid()}", help='作業キューでのワーカー名 (デフォルト: <ホスト名>-<プロセスID>)')
+    parser.add_argument('--lease-batch', type=int, default=10, help='作業キューから一度にリースする件数 (デフォルト: 10)')
+    parser.add_argument('--lease-seconds', type=float, default=600, help='リースの有効期限(秒)。この間に結果の記録がなければ他のワーカーが引き継ぐ (デフォルト: 600)')
+    parser.add_argument('--max-attempts', type=int, default=3, help='作業キューで1件を試行する最大回数。超えたものは失敗とする (デフォルト: 3)')
+    # --- サイトごとのカバレッジ (movie_site_coverage.py) ---
+    parser.add_argument('--site-coverage', default='learned', choices=['declared', 'learned', 'off'],
+                        help='欠損している主要項目をサイトが埋められない行を対象から除く。learned: 過去の取得データ (MovieData_*) で取得率が高い列 (少なければ declared), declared: スクレイパーが宣言した列, off: 除かない (デフォルト: learned)')
+    parser.add_argument('--coverage-min-rate', type=float, default=0.05, help='learned で「埋められる」とみなす取得率の下限 (0-1, デフォルト: 0.05)')
+    parser.add_argument('--coverage-dir', default='.', help='learned で読み込む過去の取得データ (MovieData_<サイト>_*) のディレクトリ (デフォルト: カレントディレクトリ)')
+    # --- 抽出データ (MovieData_<サイト>_<日時>) の出力 ---
+    parser.add_argument('--output-format', default='json', choices=RECORD_OUTPUT_FORMATS, help='抽出データの出力形式。json: 従来のJSON配列, jsonl: 1行1レコードのJSON Lines (デフォルト: json)')
+    parser.add_argument('--compress', default='none', choices=list(COMPRESSION_SUFFIXES), help='抽出データの圧縮形式 (zstd は zstandard パッケージが必要, デフォルト: none)')
+    # --- チェックポイント (movie_run_journal.py) ---
+    parser.add_argument('--journal', default=None, help='取得結果を1件ずつ追記するジャーナル(JSONL)のパス (デフォルト: <出力CSV>.journal.jsonl)')
+    parser.add_argument('--resume', action='store_true', help='ジャーナルの記録を反映し、処理済みの movie_id を飛ばして再開する')
+    # --- レート制限 (scrapers/rate_limiter.py のホスト別トークンバケット) ---
+    parser.add_argument('--rate', type=float, default=None, help='全ホスト共通の目標スループット(リクエスト/秒, 0以下で無制限)。未指定時はホスト別のデフォルト値')
+    parser.add_argument('--host-rate', action='append', default=[], metavar='HOST=RATE', help='ホスト別の目標スループット (例: --host-rate eiga.com=2, 複数指定可)')
+    parser.add_argument('--burst', type=int, default=1, help='ホストごとに連続で即時送信できるリクエスト数 (デフォルト: 1)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='各リクエストに加えるランダム待機の最大秒数 (デフォルト: 0)')
+    parser.add_argument('--wait', type=float, default=None, help='[非推奨] 旧来の待機秒数。--rate 未指定時は 1/wait リクエスト/秒 として扱う')
 
     return parser 
\ No newline at end of file
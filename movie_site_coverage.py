@@ -0,0 +1,91 @@
+# Site Coverage
+# サイトごとに「実際に埋められる列」(カバレッジ) を決め、対象選定でそのサイトが埋められない行を除く。
+# - declared: 各スクレイパーの COVERAGE (作品ページから取得できる列) をそのまま使う
+# - learned : 過去の取得データ (MovieData_<サイト名>_*.json / .jsonl[.gz|.zst]) で値が入っていた割合を数え、
+#             --coverage-min-rate 以上の列だけを使う (件数が少ない場合は declared に戻す)
+# - off     : カバレッジを使わない (従来どおり)
+# 対象選定 (主要項目 year / director / summary のいずれかが欠損している行) では、行の欠損している主要項目に
+# サイトのカバレッジに含まれる列が1つもなければ、その行はそのサイトでは取得しない。
+# (どのスクレイパーも主要項目を宣言しているため、行を除けるのは learned で取得率の低い主要項目がある場合)
+
+import glob
+import logging
+import os
+
+import pandas as pd
+
+import movie_scraper_utils as utils
+
+MODES = ['declared', 'learned', 'off']
+MIN_RECORDS = 50      # learned でカバレッジを決めるのに必要な最低件数
+MAX_FILES = 10        # 読み込む取得データのファイル数 (新しい順)
+MAX_RECORDS = 20000   # 読み込むレコード数の上限
+
+_stats = {'skipped_rows': 0, 'avoided_requests': 0}
+
+
+def record_files(site_name, directory='.'):
+    """サイトの取得データのファイルを新しい順に返す"""
+    paths = glob.glob(os.path.join(directory, f"MovieData_{glob.escape(site_name)}_*"))
+    return sorted((p for p in paths if '.json' in os.path.basename(p)), key=os.path.getmtime, reverse=True)
+
+
+def _has_value(value):
+    return value is not None and value != '' and value != [] and value != {}
+
+
+def learn_rates(site_name, columns, directory='.', max_files=MAX_FILES, max_records=MAX_RECORDS):
+    """過去の取得データから列ごとに値が入っていた割合を数え、({列: 割合}, 件数) を返す"""
+    counts = dict.fromkeys(columns, 0)
+    total = 0
+    for path in record_files(site_name, directory)[:max_files]:
+        records = utils.iter_jsonl(path) if utils.is_jsonl_path(path) else (utils.load_json(path) or [])
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            total += 1
+            for col in columns:
+                if _has_value(record.get(col)):
+                    counts[col] += 1
+            if total >= max_records:
+                break
+        if total >= max_records:
+            break
+    rates = {col: count / total for col, count in counts.items()} if total else {}
+    return rates, total
+
+
+def site_coverage(site, args):
+    """サイトのカバレッジ (列名の集合) を返す。--site-coverage off の場合は None"""
+    if args.site_coverage == 'off':
+        return None
+    declared = set(site.coverage)
+    if args.site_coverage == 'declared':
+        return declared
+    rates, total = learn_rates(site.name, sorted(declared), args.coverage_dir)
+    if total < MIN_RECORDS:
+        logging.info(f"[{site.label}] 過去の取得データが {total} 件のため、宣言済みのカバレッジを使います。")
+        return declared
+    learned = {col for col, rate in rates.items() if rate >= args.coverage_min_rate}
+    rare = ', '.join(f"{col} {rates[col]:.0%}" for col in sorted(declared - learned))
+    logging.info(f"[{site.label}] 過去の取得データ {total} 件から学習したカバレッジ: {len(learned)}/{len(declared)} 列"
+                 + (f" (取得率が低いため除外: {rare})" if rare else ""))
+    return learned
+
+
+def record_skipped(rows, avoided_requests):
+    """対象から除いた行数と、それにより省略したリクエスト数を集計する (実行終了時のログ用)"""
+    _stats['skipped_rows'] += rows
+    _stats['avoided_requests'] += avoided_requests
+
+
+def get_stats():
+    return dict(_stats)
+
+
+def helpful_rows(df, coverage, columns):
+    """欠損している列 (columns のうち。対象選定では主要項目) にカバレッジの列が1つでもある行を True とする bool Series"""
+    covered = [col for col in columns if col in coverage and col in df.columns]
+    if not covered:
+        return pd.Series(False, index=df.index)
+    return df[covered].isna().any(axis=1)
@@ -0,0 +1,216 @@
+# Work Queue
+# 複数のワーカープロセスで1つの入力CSVを分担するためのローカル作業キュー (SQLite)。
+# - 各ワーカーは対象選定の結果をキューに登録し (登録済みの movie_id は無視)、--lease-batch 件ずつ
+#   「リース」(有効期限付きの処理権) を取って処理する。同じ movie_id を複数のワーカーが同時に処理することはない
+# - 結果を記録するたびに自分のリースを延長する。ワーカーが落ちて --lease-seconds 以上記録がなければ
+#   リースは期限切れになり、他のワーカーが引き継ぐ (試行回数が --max-attempts に達したものは failed)
+# - 取得結果 (ジャーナルと同じ形式) はキューに保存し、各ワーカーの終了時や export_work_queue.py で
+#   入力CSVに反映して Shift_JIS のCSVに書き出す
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+import movie_run_journal as run_journal
+import movie_scraper_utils as utils
+
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+POLL_SECONDS = 2.0     # 他のワーカーのリースが終わるのを待つ間隔
+
+# キュー内の状態
+STATE_PENDING = 'pending'   # 未処理 (またはリトライ待ち)
+STATE_LEASED = 'leased'     # いずれかのワーカーが処理中
+STATE_DONE = 'done'         # 結果を記録済み (見つからなかった場合も含む)
+STATE_FAILED = 'failed'     # 試行回数の上限に達した
+STATES = [STATE_PENDING, STATE_LEASED, STATE_DONE, STATE_FAILED]
+
+
+class WorkQueue:
+    """SQLite の作業キュー (スレッドセーフ, 複数プロセスから同時に開いてよい)。
+    record() はジャーナル (run_journal.RunJournal) と同じ形式なので ScrapeContext.journal として使える"""
+
+    def __init__(self, db_path, owner=None, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # トランザクションは自分で管理する (リースの取得は BEGIN IMMEDIATE で他プロセスと排他)
+        self._conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                site TEXT NOT NULL,
+                movie_id TEXT NOT NULL,
+                title TEXT,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                status TEXT,
+                url TEXT,
+                details TEXT,
+                last_error TEXT,
+                duplicates TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (site, movie_id)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_state ON items (site, state, lease_expires)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.recorded = 0
+
+    def _transaction(self, func, *args):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(*args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def check_input(self, input_path):
+        """キューを作成した入力CSVと異なるCSVで参加した場合に警告する"""
+        def check():
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'input'").fetchone()
+            if row is None:
+                self._conn.execute("INSERT INTO meta VALUES ('input', ?)", (input_path,))
+            return row[0] if row else input_path
+        registered = self._transaction(check)
+        if registered != input_path:
+            logging.warning(f"作業キュー '{self.db_path}' は '{registered}' から作成されています (今回の入力: '{input_path}')。")
+
+    def enqueue(self, site, target_df, duplicates=None):
+        """対象の (movie_id, title) を登録し、新たに登録した件数を返す (登録済みのものは状態を変えない)。
+        duplicates ({movie_id: [(同じタイトルの movie_id, title), ...]}) も保存し、結果を反映する際に使う"""
+        duplicates = duplicates or {}
+        rows = []
+        for movie_id, title in zip(target_df['movie_id'], target_df['title']):
+            group = duplicates.get(str(movie_id))
+            rows.append((site, str(movie_id), title, STATE_PENDING, time.time(),
+                         json.dumps(group, ensure_ascii=False) if group else None))
+
+        def insert():
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO items (site, movie_id, title, state, updated_at, duplicates) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            return self._conn.total_changes - before
+        return self._transaction(insert)
+
+    def lease(self, site, limit):
+        """未処理 (または期限切れのリース) を最大 limit 件リースし、[(movie_id, title), ...] を登録順に返す"""
+        def take():
+            now = time.time()
+            # 期限切れのリースのうち、試行回数の上限に達したものは諦める
+            self._conn.execute(
+                "UPDATE items SET state = ?, lease_owner = NULL, last_error = ?, updated_at = ? "
+                "WHERE site = ? AND state = ? AND lease_expires < ? AND attempts >= ?",
+                (STATE_FAILED, 'リースの期限切れ (試行回数の上限)', now, site, STATE_LEASED, now, self.max_attempts))
+            rows = self._conn.execute(
+                "SELECT rowid, movie_id, title FROM items WHERE site = ? AND (state = ? OR (state = ? AND lease_expires < ?)) "
+                "ORDER BY rowid LIMIT ?", (site, STATE_PENDING, STATE_LEASED, now, limit)).fetchall()
+            self._conn.executemany(
+                "UPDATE items SET state = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE rowid = ?", [(STATE_LEASED, self.owner, now + self.lease_seconds, now, row[0]) for row in rows])
+            return [(movie_id, title) for _, movie_id, title in rows]
+        return self._transaction(take)
+
+    def record(self, site, movie_id, title, status, movie_page_url=None, details=None):
+        """取得結果を保存して完了にし、このワーカーの残りのリースを延長する (RunJournal.record と同じ引数)"""
+        details_json = json.dumps(details, ensure_ascii=False) if details is not None else None
+
+        def complete():
+            now = time.time()
+            self._conn.execute(
+                "UPDATE items SET state = ?, status = ?, url = ?, details = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE site = ? AND movie_id = ? AND state != ?",
+                (STATE_DONE, status, movie_page_url, details_json, now, site, str(movie_id), STATE_DONE))
+            self._conn.execute("UPDATE items SET lease_expires = ? WHERE site = ? AND state = ? AND lease_owner = ?",
+                               (now + self.lease_seconds, site, STATE_LEASED, self.owner))
+        self._transaction(complete)
+        self.recorded += 1
+
+    def release(self, site, error=None, count_attempt=True):
+        """結果を記録しないまま残ったこのワーカーのリースを手放す。
+        count_attempt=False (中断時) の場合は試行回数に数えない。手放した件数を返す"""
+        def give_back():
+            now = time.time()
+            if not count_attempt:
+                self._conn.execute("UPDATE items SET attempts = attempts - 1 WHERE site = ? AND state = ? AND lease_owner = ?",
+                                   (site, STATE_LEASED, self.owner))
+            cursor = self._conn.execute(
+                "UPDATE items SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, lease_owner = NULL, "
+                "last_error = ?, updated_at = ? WHERE site = ? AND state = ? AND lease_owner = ?",
+                (self.max_attempts, STATE_FAILED, STATE_PENDING, error, now, site, STATE_LEASED, self.owner))
+            return cursor.rowcount
+        return self._transaction(give_back)
+
+    def counts(self, site=None):
+        """{状態: 件数} を返す"""
+        with self._lock:
+            query = "SELECT state, COUNT(*) FROM items" + (" WHERE site = ?" if site else "") + " GROUP BY state"
+            rows = self._conn.execute(query, (site,) if site else ()).fetchall()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(rows)
+        return counts
+
+    def next_expiry(self, site):
+        """他のワーカーが処理中のリースのうち、最も早く期限が切れる時刻 (なければ None)"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(lease_expires) FROM items WHERE site = ? AND state = ?",
+                                     (site, STATE_LEASED)).fetchone()
+        return row[0]
+
+    def sites(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT site FROM items ORDER BY site")]
+
+    def iter_results(self, site):
+        """詳細情報を取得できた結果を登録順に返す (movie_id 付きの details 辞書)。
+        同じタイトルの行 (enqueue の duplicates) には同じ details を movie_id を変えて返す"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT movie_id, title, details, duplicates FROM items WHERE site = ? AND state = ? AND status = ? ORDER BY rowid",
+                (site, STATE_DONE, run_journal.STATUS_OK)).fetchall()
+        for movie_id, title, details, duplicates in rows:
+            for target_id, target_title in [(movie_id, title)] + json.loads(duplicates or '[]'):
+                record = json.loads(details)
+                record['movie_id'] = target_id
+                record['title'] = target_title
+                yield record
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def apply_results(df_indexed, queue, sites, batch_size=500):
+    """キューに保存された各サイトの結果を df_indexed (movie_id インデックス) の欠損セルに反映し、更新した行数を返す。
+    sites は優先順位順 (同じセルには先のサイトの値が入る)"""
+    columns = [col for col in df_indexed.columns if col not in ['title', 'source']]
+    updated = set()
+    for site in sites:
+        batch = []
+        for record in queue.iter_results(site):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                updated.update(_merge(df_indexed, batch, columns))
+                batch = []
+        updated.update(_merge(df_indexed, batch, columns))
+    return len(updated)
+
+
+def _merge(df_indexed, records, columns):
+    flags = utils.merge_records(df_indexed, records, columns)
+    return {record['movie_id'] for record, flag in zip(records, flags) if flag}
+
+
+def log_counts(queue, site=None, label=None):
+    counts = queue.counts(site)
+    logging.info(f"作業キュー{f' [{label}]' if label else ''}: 完了 {counts[STATE_DONE]} 件, 未処理 {counts[STATE_PENDING]} 件, "
+                 f"処理中 {counts[STATE_LEASED]} 件, 失敗 {counts[STATE_FAILED]} 件")
+    return counts
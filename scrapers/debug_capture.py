@@ -0,0 +1,166 @@
+# Debug Capture
+# 取得したHTMLをデバッグ用に保存する仕組み (デフォルトは無効)。
+# - サンプリング: configure(sample_rate=0.1) なら約10%の作品だけを保存する
+#   (movie_id のハッシュで決めるため、同じ作品の検索ページと作品ページはそろって保存される)
+# - 非同期: ファイル書き込みはバックグラウンドのライタースレッドが行い、取得処理を待たせない
+#   (キューがいっぱいの場合は保存を諦めて件数だけ数える)
+# - 上限付きのローテーション: 保存先ディレクトリの合計サイズが max_bytes を超えたら古いファイルから削除する
+# - 1ページ1ファイル: <保存先>/<サイト>/<movie_id>_<種類>_<日時>_<連番>.html (同じファイルを上書きしない)
+#
+# movie_id は呼び出し側 (movie_scrape_runner) が movie() で設定する (contextvars のため、スレッドごとに独立)。
+
+import contextlib
+import contextvars
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+
+DEFAULT_DIR = '_debug_pages'
+DEFAULT_MAX_BYTES = 200 * 1024 ** 2
+QUEUE_SIZE = 256   # 書き込み待ちのページ数の上限
+
+current_movie_id = contextvars.ContextVar('debug_capture_movie_id', default=None)
+
+_config = {
+    'directory': None,   # None なら無効
+    'sample_rate': 0.0,
+    'max_bytes': DEFAULT_MAX_BYTES,
+}
+_stats = {'captured': 0, 'written': 0, 'dropped': 0, 'rotated': 0}
+_lock = threading.Lock()
+_writer = None
+_SAFE_KEY = re.compile(r'[^0-9A-Za-z_.\-]+')
+
+
+@contextlib.contextmanager
+def movie(movie_id):
+    """この中で保存されるページに movie_id を付ける"""
+    token = current_movie_id.set(movie_id)
+    try:
+        yield
+    finally:
+        current_movie_id.reset(token)
+
+
+def configure(directory=None, sample_rate=1.0, max_bytes=DEFAULT_MAX_BYTES):
+    """directory を指定すると保存を有効にする (None で無効)。既存のライターは閉じてから切り替える"""
+    global _writer
+    close()
+    with _lock:
+        _config['directory'] = directory
+        _config['sample_rate'] = min(max(float(sample_rate), 0.0), 1.0)
+        _config['max_bytes'] = int(max_bytes)
+        if directory and _config['sample_rate'] > 0:
+            _writer = _Writer(directory, _config['max_bytes'])
+            logging.info(f"デバッグ用HTML保存: {directory} (サンプリング率 {_config['sample_rate']:g}, 上限 {max_bytes / 1024 ** 2:g}MB)")
+
+
+def is_enabled():
+    return _writer is not None
+
+
+def capture(site, kind, url, content):
+    """ページをサンプリングして保存キューに入れる (保存しない場合は何もしない)。
+    site: ファイル名用のサイト名, kind: 'search' / 'detail' など"""
+    writer = _writer
+    if writer is None:
+        return
+    key = current_movie_id.get() or url or 'unknown'
+    if zlib.crc32(str(key).encode('utf-8')) / 2 ** 32 >= _config['sample_rate']:
+        return
+    with _lock:
+        _stats['captured'] += 1
+    writer.put(site, kind, key, content)
+
+
+def get_stats():
+    with _lock:
+        return dict(_stats)
+
+
+def close():
+    """書き込み待ちのページを書き終えてからライターを止める"""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+
+def _count(key, n=1):
+    with _lock:
+        _stats[key] += n
+
+
+class _Writer:
+    """保存キューを1本のバックグラウンドスレッドで書き出し、合計サイズの上限を守る"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._seq = 0
+        self._files = self._scan() # (パス, サイズ) を古い順に
+        self._total = sum(size for _, size in self._files)
+        self._thread = threading.Thread(target=self._run, name='debug-capture', daemon=True)
+        self._thread.start()
+
+    def _scan(self):
+        """前回までに保存したファイルも上限の対象にする"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.html'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, path, stat.st_size))
+        return [(path, size) for _, path, size in sorted(files)]
+
+    def put(self, site, kind, key, content):
+        try:
+            self._queue.put_nowait((site, kind, key, content, time.time()))
+        except queue.Full:
+            _count('dropped')
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+            except OSError as e:
+                logging.warning(f"デバッグ用HTMLの保存中にエラー: {e}")
+
+    def _write(self, site, kind, key, content, captured_at):
+        site_dir = os.path.join(self.directory, _SAFE_KEY.sub('_', site))
+        os.makedirs(site_dir, exist_ok=True)
+        self._seq += 1
+        timestamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(captured_at))
+        name = f"{_SAFE_KEY.sub('_', str(key))[-80:]}_{kind}_{timestamp}_{self._seq:06d}.html"
+        path = os.path.join(site_dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        self._files.append((path, len(content)))
+        self._total += len(content)
+        _count('written')
+        logging.debug(f"  デバッグ用にHTMLを '{path}' に保存しました。")
+        self._rotate()
+
+    def _rotate(self):
+        rotated = 0
+        while self._total > self.max_bytes and len(self._files) > 1:
+            path, size = self._files.pop(0)
+            self._total -= size
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            rotated += 1
+        if rotated:
+            _count('rotated', rotated)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
@@ -1,48 +1,90 @@
 # Eiga.com Scraper
 
 import requests
-from bs4 import BeautifulSoup
 import re
 import logging
-import os # デバッグHTML保存用
 
-# User-Agent設定 (このスクレイパー固有)
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-}
+from scrapers import http_client # 共有HTTPセッション (接続プール)
+from scrapers import html_parser # 共有HTMLパーサー (lxml / html.parser)
+from scrapers import debug_capture # デバッグ用HTMLの保存 (サンプリング・非同期)
+from scrapers import page_encoding # ホストごとの文字コード
+from scrapers import structured_data # JSON-LD / OpenGraph の高速抽出
+
+# --- CSSセレクタ (モジュール読み込み時に1度だけコンパイル) ---
+SEARCH_RESULT_LINK = html_parser.compile_selector('#rslt-movie > ul > li > a')
+PRODUCTION_INFO = html_parser.compile_selector('.movie-info > p.data, p.data')
+STAFF_SECTION = html_parser.compile_selector('#staff-cast dl.movie-staff')
+CAST_ITEMS = html_parser.compile_selector('ul.movie-cast > li')
+CAST_NAME = html_parser.compile_selector('span[itemprop="name"]')
+CAST_ROLE = html_parser.compile_selector('small')
+REVIEW_SUMMARY = html_parser.compile_selector('.review-l')
+REVIEW_SCORE = html_parser.compile_selector('.rating-star')
+REVIEW_COUNT = html_parser.compile_selector('.rvw-count a')
+
+# --- 部分解析: 抽出で読む領域だけを木にする (広告・スクリプト・おすすめ欄などは構築しない) ---
+SEARCH_REGIONS = html_parser.region_strainer(
+    html_parser.Region('div', {'id': 'rslt-movie'}),
+)
+# 項目ごとの領域 (構造化データで埋まらなかった項目の領域だけを解析する: structured_data.extract_details)
+_DATA = (html_parser.Region('p', {'class': 'data'}),)          # 公開年・製作国・上映時間・配給
+_STAFF = (html_parser.Region('div', {'id': 'staff-cast'}),)    # スタッフ (dl.movie-staff)
+_CAST = (html_parser.Region('ul', {'class': 'movie-cast'}),)   # キャスト
+DETAIL_FIELD_REGIONS = html_parser.FieldRegions({
+    'year': _DATA, 'country': _DATA, 'runtime': _DATA, 'distributor': _DATA,
+    'director': _STAFF, 'producer': _STAFF, 'cinematographer': _STAFF, 'full_staff': _STAFF,
+    'summary': (html_parser.Region('div', {'id': 'story'}),),     # あらすじ
+    'cast': _CAST, 'full_cast': _CAST,
+    'reviews': (html_parser.Region(None, {'class': 'review-l'}),), # レビュー概要
+})
+DETAIL_REGIONS = DETAIL_FIELD_REGIONS.strainer()
 
 def search_eiga_com(title):
-    """映画.comで映画タイトルを検索し、最上位の作品ページのURLを取得する"""
+    """映画.comで映画タイトルを検索し、最上位の作品ページのURLを取得する
+    (見つからなければ None、取得に失敗した場合は http_client.FETCH_FAILED)"""
     search_url = f"https://eiga.com/search/{requests.utils.quote(title)}"
     try:
         logging.info(f"[映画.com] 検索中: {title} (URL: {search_url})")
-        response = requests.get(search_url, headers=HEADERS, timeout=15) # タイムアウト少し延長
+        response = http_client.fetch(search_url)
         response.raise_for_status() # HTTPエラーチェック
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # 検索結果リストの最初の映画リンクを取得 (#rslt-movie を優先)
-        search_results = soup.select('#rslt-movie > ul > li > a')
-        if search_results:
-            movie_page_url = "https://eiga.com" + search_results[0]['href']
+        debug_capture.capture('eigacom', 'search', search_url, response.content) # --capture-dir / --debug 指定時のみ保存
+        # ヘッダー / ホストごとに記憶した文字コードを使い、ページごとの文字コード推定を省く
+        encoding = page_encoding.encoding_for(search_url, response.content, response.headers.get('Content-Type'))
+        movie_page_url = parse_search_results(response.content, encoding)
+        if movie_page_url:
             logging.info(f"  [映画.com] 作品ページURL発見: {movie_page_url}")
             return movie_page_url
         else:
             # 人物などでヒットした場合も考慮するかもしれないが、一旦映画のみ
             logging.warning(f"  [映画.com] 検索結果で作品ページが見つかりませんでした: {title}")
             return None
+    except http_client.RequestCancelled:
+        logging.debug(f"  [映画.com] 検索を取りやめました (他のサイトで取得済み): {title}")
+        return http_client.FETCH_FAILED
     except requests.exceptions.Timeout:
         logging.error(f"[映画.com] 検索タイムアウト: {title} ({search_url})")
-        return None
+        return http_client.FETCH_FAILED
     except requests.exceptions.RequestException as e:
         logging.error(f"[映画.com] 検索リクエストエラー ({title}): {e}")
-        return None
+        return http_client.FETCH_FAILED
     except Exception as e:
         logging.error(f"[映画.com] 検索処理中の予期せぬエラー ({title}): {e}")
-        return None
+        return http_client.FETCH_FAILED
 
-def scrape_movie_details(movie_page_url, debug_mode=False):
-    """映画ページのURLから詳細情報を標準化された辞書形式で取得する"""
-    details = {
+def parse_search_results(content, encoding=None):
+    """検索結果ページのHTMLから最上位の作品ページURLを返す (見つからなければ None)"""
+    soup = html_parser.make_soup(content, parse_only=SEARCH_REGIONS, encoding=encoding)
+    # 検索結果リストの最初の映画リンクを取得 (#rslt-movie を優先)
+    first_result = SEARCH_RESULT_LINK.select_one(soup)
+    if first_result:
+        return "https://eiga.com" + first_result['href']
+    return None
+
+# 作品ページから取得できる列。対象選定で、このサイトでは埋められない行を除くのに使う (movie_site_coverage.py)
+COVERAGE = ('year', 'director', 'summary', 'cast', 'producer', 'cinematographer', 'country',
+            'runtime', 'distributor', 'full_staff', 'full_cast', 'reviews')
+
+def _empty_details():
+    return {
         'source': 'eiga.com', # 情報源を追加
         'year': None,
         'director': None,
@@ -57,31 +99,55 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
         'full_cast': None,  # JSON化する前のリスト/辞書
         'reviews': None     # JSON化する前のリスト/辞書
     }
+
+def scrape_movie_details(movie_page_url, extract=None):
+    """映画ページのURLから詳細情報を標準化された辞書形式で取得する
+    extract: 取得したHTMLの解析関数 (デフォルト: extract_movie_details。ワーカープロセスで解析する場合に差し替える)
+    取得に失敗した場合は http_client.FETCH_FAILED を返す"""
+    details = _empty_details()
     if not movie_page_url or not movie_page_url.startswith("https://eiga.com"):
         logging.warning(f"無効なURLのためスキップ: {movie_page_url}")
         return details # 空のdetailsを返す
 
     try:
         logging.info(f"[映画.com] 詳細情報取得中: {movie_page_url}")
-        response = requests.get(movie_page_url, headers=HEADERS, timeout=15) # タイムアウト少し延長
+        response = http_client.fetch(movie_page_url)
         response.raise_for_status()
 
-        # --- デバッグ用HTML保存 ---
-        if debug_mode:
-            try:
-                debug_filename = "_debug_last_scraped_page_eigacom.html"
-                with open(debug_filename, "wb") as f:
-                    f.write(response.content)
-                logging.debug(f"  [映画.com] デバッグ用にHTMLを '{debug_filename}' に保存しました。")
-            except Exception as e:
-                logging.warning(f"  [映画.com] デバッグ用HTMLファイルの保存中にエラー: {e}")
-        # --- デバッグ用ここまで ---
+        debug_capture.capture('eigacom', 'detail', movie_page_url, response.content) # --capture-dir / --debug 指定時のみ保存
+
+        encoding = page_encoding.encoding_for(movie_page_url, response.content, response.headers.get('Content-Type'))
+        return (extract or extract_movie_details)(response.content, movie_page_url, encoding)
+
+    except http_client.RequestCancelled:
+        logging.debug(f"  [映画.com] 詳細取得を取りやめました (他のサイトで取得済み): {movie_page_url}")
+        return http_client.FETCH_FAILED
+    except requests.exceptions.Timeout:
+        logging.error(f"[映画.com] 詳細取得タイムアウト: {movie_page_url}")
+        return http_client.FETCH_FAILED
+    except requests.exceptions.RequestException as e:
+        logging.error(f"[映画.com] 詳細取得リクエストエラー ({movie_page_url}): {e}")
+        return http_client.FETCH_FAILED
+    except Exception as e:
+        logging.error(f"[映画.com] 詳細取得処理中の予期せぬエラー ({movie_page_url}): {e}")
+        return http_client.FETCH_FAILED
+
+def extract_movie_details(content, movie_page_url=None, encoding=None):
+    """作品ページのHTMLから詳細情報を抽出する (ネットワークアクセスなし)。
+    JSON-LD を先に読み、HTMLは JSON-LD で埋まらなかった項目の領域だけを解析する (すべて埋まれば解析しない)"""
+    def dom_extract(fields):
+        return _extract_from_html(content, movie_page_url, encoding, DETAIL_FIELD_REGIONS.strainer(fields))
+    return structured_data.extract_details(content, _empty_details(), dom_extract, encoding, COVERAGE)
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+def _extract_from_html(content, movie_page_url=None, encoding=None, regions=DETAIL_REGIONS):
+    """作品ページのHTMLを解析して詳細情報を抽出する (regions: 解析する領域。領域外の項目は None のまま)"""
+    details = _empty_details()
+    try:
+        soup = html_parser.make_soup(content, parse_only=regions, encoding=encoding)
 
         # --- 各種情報抽出 ---
         # 基本情報 (公開年、製作国、上映時間、配給)
-        production_info_tag = soup.select_one('.movie-info > p.data, p.data') # セレクタ調整
+        production_info_tag = PRODUCTION_INFO.select_one(soup) # セレクタ調整
         if production_info_tag:
             production_text = production_info_tag.get_text(separator=" / ", strip=True) # separator変更
             logging.debug(f"  基本情報テキスト: {production_text}")
@@ -111,7 +177,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
                 logging.debug(f"    配給会社: {details['distributor']}")
 
         # スタッフ情報
-        staff_section = soup.select_one('#staff-cast dl.movie-staff')
+        staff_section = STAFF_SECTION.select_one(soup)
         if staff_section:
             full_staff_dict = {}
             directors = []
@@ -152,13 +218,13 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
             logging.debug(f"    あらすじ取得 (先頭): {details['summary'][:50]}...")
 
         # キャスト情報
-        cast_list_items = soup.select('ul.movie-cast > li')
+        cast_list_items = CAST_ITEMS.select(soup)
         if cast_list_items:
             full_cast_list = []
             main_cast_strings = [] # ログ用
             for item in cast_list_items:
-                actor_name_tag = item.select_one('span[itemprop="name"]')
-                role_name_tag = item.select_one('small')
+                actor_name_tag = CAST_NAME.select_one(item)
+                role_name_tag = CAST_ROLE.select_one(item)
                 actor_name = actor_name_tag.text.strip() if actor_name_tag else None
                 role_name = role_name_tag.text.strip() if role_name_tag else None
 
@@ -178,10 +244,10 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
 
 
         # レビュー情報 (スコアと件数のみ取得する方針に変更)
-        review_summary_section = soup.select_one('.review-l') # スコアと件数があるセクション
+        review_summary_section = REVIEW_SUMMARY.select_one(soup) # スコアと件数があるセクション
         if review_summary_section:
-            score_tag = review_summary_section.select_one('.rating-star')
-            count_tag = review_summary_section.select_one('.rvw-count a') # 件数リンク
+            score_tag = REVIEW_SCORE.select_one(review_summary_section)
+            count_tag = REVIEW_COUNT.select_one(review_summary_section) # 件数リンク
             reviews_dict = {}
             if score_tag:
                 score_class = next((cls for cls in score_tag.get('class', []) if cls.startswith('val')), None)
@@ -202,14 +268,8 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
 
         return details
 
-    except requests.exceptions.Timeout:
-        logging.error(f"[映画.com] 詳細取得タイムアウト: {movie_page_url}")
-        return details # 取得できた部分だけ返す
-    except requests.exceptions.RequestException as e:
-        logging.error(f"[映画.com] 詳細取得リクエストエラー ({movie_page_url}): {e}")
-        return details
     except Exception as e:
         logging.error(f"[映画.com] 詳細取得処理中の予期せぬエラー ({movie_page_url}): {e}")
-        return details
+        return details # 取得できた部分だけ返す
 
 # TODO: Move Eiga.com specific search and scrape functions here 
\ No newline at end of file
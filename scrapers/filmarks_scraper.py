@@ -1,99 +1,162 @@
 # scrapers/filmarks_scraper.py
 import requests
-from bs4 import BeautifulSoup
 import re
 import logging
-import os
 from urllib.parse import quote
 import json
 
-# User-Agent設定 (共通)
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-}
+from scrapers import http_client # 共有HTTPセッション (接続プール)
+from scrapers import html_parser # 共有HTMLパーサー (lxml / html.parser)
+from scrapers import debug_capture # デバッグ用HTMLの保存 (サンプリング・非同期)
+from scrapers import page_encoding # ホストごとの文字コード
+from scrapers import structured_data # JSON-LD / OpenGraph の高速抽出
+
+# --- CSSセレクタ (モジュール読み込み時に1度だけコンパイル) ---
+# 最初の結果ブロック内の `/movies/` で始まるリンク
+SEARCH_RESULT_LINK = html_parser.compile_selector('div.p-content-cassette a[href^="/movies/"]')
+OTHER_INFO = html_parser.compile_selector('div.p-content-detail__other-info')
+LINKED_ITEMS = html_parser.compile_selector('li > a')
+TITLE_H2 = html_parser.compile_selector('h2.p-content-detail__title')
+SYNOPSIS = html_parser.compile_selector('div.p-content-detail__synopsis content-detail-synopsis')
+PEOPLE_SECTION = html_parser.compile_selector('div.p-content-detail__people-list')
+DIRECTOR_NAMES = html_parser.compile_selector('li a div.c2-button-tertiary-s__text')
+CAST_NAME = html_parser.compile_selector('a div.c2-button-tertiary-s-multi-text__text')
+CAST_ROLE = html_parser.compile_selector('a div.c2-button-tertiary-s-multi-text__subtext')
+GENRE_DIV = html_parser.compile_selector('div.p-content-detail__genre')
+RATING_SCORE = html_parser.compile_selector('div.p-content-detail-state div.c2-rating-l__text')
+REVIEW_COUNT = html_parser.compile_selector('div.p-mark-histogram__top__total-count')
+
+# --- 部分解析: 抽出で読む領域だけを木にする (広告・スクリプト・おすすめ欄などは構築しない) ---
+SEARCH_REGIONS = html_parser.region_strainer(
+    html_parser.Region('div', {'class': 'p-content-cassette'}),
+)
+# 項目ごとの領域 (構造化データで埋まらなかった項目の領域だけを解析する: structured_data.extract_details)
+_OTHER_INFO = (html_parser.Region('div', {'class': 'p-content-detail__other-info'}),) # 上映日・製作国・上映時間
+_PEOPLE = (html_parser.Region('div', {'class': 'p-content-detail__people-list'}),)    # 監督・出演者
+DETAIL_FIELD_REGIONS = html_parser.FieldRegions({
+    # タイトル横の年は「タイトルの h2 の次の h2」から取るため、h2 はすべて残して兄弟関係を保つ
+    'year': (html_parser.Region('h2'),) + _OTHER_INFO,
+    'country': _OTHER_INFO, 'runtime': _OTHER_INFO,
+    'summary': (
+        html_parser.Region('script', {'type': 'application/ld+json'}),
+        html_parser.Region('div', {'class': 'p-content-detail__synopsis'}),
+    ),
+    'director': _PEOPLE, 'full_staff': _PEOPLE, 'cast': _PEOPLE, 'full_cast': _PEOPLE,
+    'distributor': (html_parser.Region('div', {'class': 'p-content-detail__genre'}),),
+    'reviews': (
+        html_parser.Region('div', {'class': 'p-content-detail-state'}),
+        html_parser.Region('div', {'class': 'p-mark-histogram__top__total-count'}),
+    ),
+}, common=(html_parser.Region('title'),))
+DETAIL_REGIONS = DETAIL_FIELD_REGIONS.strainer()
 
 def search_filmarks(title):
-    """Filmarksで映画タイトルを検索し、最上位の作品ページのURLを取得する (推測)"""
+    """Filmarksで映画タイトルを検索し、最上位の作品ページのURLを取得する (推測)
+    (見つからなければ None、取得に失敗した場合は http_client.FETCH_FAILED)"""
     search_query = quote(title)
     search_url = f"https://filmarks.com/search/movies?q={search_query}" # Filmarksの検索URL (要確認)
     try:
         logging.info(f"[Filmarks] 検索中: {title} (URL: {search_url})")
-        response = requests.get(search_url, headers=HEADERS, timeout=15)
+        response = http_client.fetch(search_url)
         response.raise_for_status()
 
-        # --- デバッグ用に検索結果HTMLを保存 ---
-        try:
-            debug_filename = "_debug_search_result_filmarks.html"
-            with open(debug_filename, "wb") as f:
-                f.write(response.content)
-            logging.debug(f"  [Filmarks] デバッグ用に検索結果HTMLを '{debug_filename}' に保存しました。")
-        except Exception as e:
-            logging.warning(f"  [Filmarks] デバッグ用検索結果HTMLの保存中にエラー: {e}")
-        # --- デバッグ用ここまで ---
+        debug_capture.capture('filmarks', 'search', search_url, response.content) # --capture-dir / --debug 指定時のみ保存
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # --- !! 推測セレクタ !! ---
-        # 検索結果リストの最初の映画リンクを探す
-        # 以前の推測: result_link = soup.select_one('.p-content-cassette__title a[href^="/movies/"]')
-        # HTML構造に基づき修正: 最初の結果ブロック内の `/movies/` で始まるリンクを探す
-        result_link = soup.select_one('div.p-content-cassette a[href^="/movies/"]') # 修正後のセレクタ
-
-        if result_link and result_link.get('href'):
-            # 相対URLを絶対URLに変換
-            movie_page_url = "https://filmarks.com" + result_link['href']
+        # ヘッダー / ホストごとに記憶した文字コードを使い、ページごとの文字コード推定を省く
+        encoding = page_encoding.encoding_for(search_url, response.content, response.headers.get('Content-Type'))
+        movie_page_url = parse_search_results(response.content, encoding)
+        if movie_page_url:
             logging.info(f"  [Filmarks] 作品ページURL発見: {movie_page_url}")
             return movie_page_url
         else:
             logging.warning(f"  [Filmarks] 検索結果で作品ページが見つかりませんでした: {title}")
             return None
+    except http_client.RequestCancelled:
+        logging.debug(f"  [Filmarks] 検索を取りやめました (他のサイトで取得済み): {title}")
+        return http_client.FETCH_FAILED
     except requests.exceptions.Timeout:
         logging.error(f"[Filmarks] 検索タイムアウト: {title} ({search_url})")
-        return None
+        return http_client.FETCH_FAILED
     except requests.exceptions.RequestException as e:
         logging.error(f"[Filmarks] 検索リクエストエラー ({title}): {e}")
-        return None
+        return http_client.FETCH_FAILED
     except Exception as e:
         logging.error(f"[Filmarks] 検索処理中の予期せぬエラー ({title}): {e}")
-        return None
+        return http_client.FETCH_FAILED
+
+def parse_search_results(content, encoding=None):
+    """検索結果ページのHTMLから最上位の作品ページURLを返す (見つからなければ None)"""
+    soup = html_parser.make_soup(content, parse_only=SEARCH_REGIONS, encoding=encoding)
+    result_link = SEARCH_RESULT_LINK.select_one(soup)
+    if result_link and result_link.get('href'):
+        # 相対URLを絶対URLに変換
+        return "https://filmarks.com" + result_link['href']
+    return None
 
-def scrape_movie_details(movie_page_url, debug_mode=False):
-    """Filmarks映画ページのURLから詳細情報を標準化された辞書形式で取得する"""
-    details = {
+# 作品ページから取得できる列 (プロデューサー・撮影の欄はない)。対象選定で、このサイトでは埋められない行を除くのに使う (movie_site_coverage.py)
+COVERAGE = ('year', 'director', 'summary', 'cast', 'country', 'runtime', 'distributor',
+            'full_staff', 'full_cast', 'reviews')
+
+def _empty_details():
+    return {
         'source': 'filmarks.com', # 情報源
         'year': None, 'director': None, 'summary': None, 'cast': None,
         'producer': None, 'cinematographer': None, 'country': None,
         'runtime': None, 'distributor': None, 'full_staff': None,
         'full_cast': None, 'reviews': None
     }
+
+def scrape_movie_details(movie_page_url, extract=None):
+    """Filmarks映画ページのURLから詳細情報を標準化された辞書形式で取得する
+    extract: 取得したHTMLの解析関数 (デフォルト: extract_movie_details。ワーカープロセスで解析する場合に差し替える)
+    取得に失敗した場合は http_client.FETCH_FAILED を返す"""
+    details = _empty_details()
     if not movie_page_url or not movie_page_url.startswith("https://filmarks.com"):
         logging.warning(f"無効なURLのためスキップ: {movie_page_url}")
         return details
 
     try:
         logging.info(f"[Filmarks] 詳細情報取得中: {movie_page_url}")
-        response = requests.get(movie_page_url, headers=HEADERS, timeout=15)
+        response = http_client.fetch(movie_page_url)
         response.raise_for_status()
 
-        # --- デバッグ用HTML保存 ---
-        if debug_mode:
-            try:
-                debug_filename = "_debug_last_scraped_page_filmarks.html"
-                with open(debug_filename, "wb") as f:
-                    f.write(response.content)
-                logging.debug(f"  [Filmarks] デバッグ用にHTMLを '{debug_filename}' に保存しました。")
-            except Exception as e:
-                logging.warning(f"  [Filmarks] デバッグ用HTMLファイルの保存中にエラー: {e}")
-        # --- デバッグ用ここまで ---
+        debug_capture.capture('filmarks', 'detail', movie_page_url, response.content) # --capture-dir / --debug 指定時のみ保存
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+        encoding = page_encoding.encoding_for(movie_page_url, response.content, response.headers.get('Content-Type'))
+        return (extract or extract_movie_details)(response.content, movie_page_url, encoding)
+
+    except http_client.RequestCancelled:
+        logging.debug(f"  [Filmarks] 詳細取得を取りやめました (他のサイトで取得済み): {movie_page_url}")
+        return http_client.FETCH_FAILED
+    except requests.exceptions.Timeout:
+        logging.error(f"[Filmarks] 詳細取得タイムアウト: {movie_page_url}")
+        return http_client.FETCH_FAILED
+    except requests.exceptions.RequestException as e:
+        logging.error(f"[Filmarks] 詳細取得リクエストエラー ({movie_page_url}): {e}")
+        return http_client.FETCH_FAILED
+    except Exception as e:
+        logging.error(f"[Filmarks] 詳細取得処理中の予期せぬエラー ({movie_page_url}): {e}")
+        return http_client.FETCH_FAILED
+
+def extract_movie_details(content, movie_page_url=None, encoding=None):
+    """作品ページのHTMLから詳細情報を抽出する (ネットワークアクセスなし)。
+    JSON-LD を先に読み、HTMLは JSON-LD で埋まらなかった項目の領域だけを解析する (すべて埋まれば解析しない)"""
+    def dom_extract(fields):
+        return _extract_from_html(content, movie_page_url, encoding, DETAIL_FIELD_REGIONS.strainer(fields))
+    return structured_data.extract_details(content, _empty_details(), dom_extract, encoding, COVERAGE)
+
+def _extract_from_html(content, movie_page_url=None, encoding=None, regions=DETAIL_REGIONS):
+    """作品ページのHTMLを解析して詳細情報を抽出する (regions: 解析する領域。領域外の項目は None のまま)"""
+    details = _empty_details()
+    try:
+        soup = html_parser.make_soup(content, parse_only=regions, encoding=encoding)
 
         # --- 各種情報抽出 (セレクタ修正) ---
         logging.debug(f"  ページタイトル: {soup.title.string if soup.title else '[タイトル不明]'}")
 
         # 年・国・時間 (ヘッダー付近の div.p-content-detail__other-info から抽出)
         # 以前の推測: meta_div = soup.select_one('div.p-content-detail__meta')
-        other_info_div = soup.select_one('div.p-content-detail__other-info')
+        other_info_div = OTHER_INFO.select_one(soup)
         if other_info_div:
             # h3 タグの内容を結合して解析する方が確実か？
             # 例: 上映日：2023年04月28日 / 製作国：日本 / アメリカ / 上映時間：114分
@@ -105,14 +168,14 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
                     full_text += elem.get_text(strip=True) + " "
                     last_h3 = elem.get_text(strip=True)
                 elif elem.name == 'ul' and last_h3 and "製作国" in last_h3:
-                    countries = [a.get_text(strip=True) for a in elem.select('li > a')]
+                    countries = [a.get_text(strip=True) for a in LINKED_ITEMS.select(elem)]
                     full_text += ", ".join(countries) + " " # 国を連結
 
             logging.debug(f"  メタ情報テキスト(結合): {full_text}")
 
             # 年 (YYYY年) - ページタイトル横からも取得試行
             year_from_title = None
-            title_h2 = soup.select_one('h2.p-content-detail__title')
+            title_h2 = TITLE_H2.select_one(soup)
             if title_h2:
                 next_h2 = title_h2.find_next_sibling('h2') # Filmarksではタイトル横のh2に年情報があることが多い
                 if next_h2 and next_h2.small and next_h2.small.a:
@@ -143,7 +206,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
             if country_h3:
                 country_ul = country_h3.find_next_sibling('ul')
                 if country_ul:
-                    country_list = [a.get_text(strip=True) for a in country_ul.select('li > a')]
+                    country_list = [a.get_text(strip=True) for a in LINKED_ITEMS.select(country_ul)]
                     if country_list:
                         details['country'] = " / ".join(country_list)
                         logging.debug(f"    国(リストから取得): {details['country']}")
@@ -165,7 +228,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
             logging.warning(f"    JSON-LDの解析中にエラー: {e}")
 
         if not summary_text:
-            synopsis_tag = soup.select_one('div.p-content-detail__synopsis content-detail-synopsis')
+            synopsis_tag = SYNOPSIS.select_one(soup)
             if synopsis_tag and synopsis_tag.get('outline'):
                  summary_text = synopsis_tag['outline']
                  logging.debug("    あらすじ(content-detail-synopsisタグのoutline属性から取得)")
@@ -181,7 +244,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
 
 
         # 監督・キャスト・スタッフ・配給など (div.p-content-detail__people-list などから)
-        people_section = soup.select_one('div.p-content-detail__people-list')
+        people_section = PEOPLE_SECTION.select_one(soup)
         if people_section:
              directors = []
              full_staff_dict = {}
@@ -195,7 +258,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
                  director_parent_div = director_heading.parent
                  director_list_ul = director_parent_div.find('ul')
                  if director_list_ul:
-                     names = [a_div.get_text(strip=True) for a_div in director_list_ul.select('li a div.c2-button-tertiary-s__text')]
+                     names = [a_div.get_text(strip=True) for a_div in DIRECTOR_NAMES.select(director_list_ul)]
                      if names:
                          directors = names
                          full_staff_dict['監督'] = [{"name": n, "role": ""} for n in names]
@@ -206,8 +269,8 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
              if cast_heading:
                   cast_items = cast_heading.find_next_siblings('h4', class_='p-people-list__item')
                   for item in cast_items:
-                      name_tag = item.select_one('a div.c2-button-tertiary-s-multi-text__text')
-                      role_tag = item.select_one('a div.c2-button-tertiary-s-multi-text__subtext')
+                      name_tag = CAST_NAME.select_one(item)
+                      role_tag = CAST_ROLE.select_one(item)
                       actor_name = name_tag.get_text(strip=True) if name_tag else None
                       role_name = role_tag.get_text(strip=True) if role_tag else None
                       if actor_name:
@@ -226,13 +289,13 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
              logging.debug(f"    キャスト (主要): {details['cast']}")
 
         # 配給 (div.p-content-detail__genre 内から)
-        genre_div = soup.select_one('div.p-content-detail__genre')
+        genre_div = GENRE_DIV.select_one(soup)
         if genre_div:
             distributor_heading = genre_div.find('h3', string=lambda t: t and "配給" in t)
             if distributor_heading:
                  distributor_ul = distributor_heading.find_next_sibling('ul')
                  if distributor_ul:
-                     dist_names = [a.get_text(strip=True) for a in distributor_ul.select('li > a')]
+                     dist_names = [a.get_text(strip=True) for a in LINKED_ITEMS.select(distributor_ul)]
                      if dist_names:
                          details['distributor'] = ", ".join(dist_names)
                          logging.debug(f"    配給: {details['distributor']}")
@@ -240,7 +303,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
         # レビュー情報 (スコアと件数)
         reviews_dict = {}
         # スコア
-        score_tag = soup.select_one('div.p-content-detail-state div.c2-rating-l__text') # 修正
+        score_tag = RATING_SCORE.select_one(soup)
         if score_tag:
              try:
                  score_text = score_tag.get_text(strip=True)
@@ -249,7 +312,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
              except ValueError:
                  logging.warning(f"    レビュースコアの取得または変換に失敗: {score_tag.get_text(strip=True)}")
         # 件数
-        count_tag = soup.select_one('div.p-mark-histogram__top__total-count') # 修正
+        count_tag = REVIEW_COUNT.select_one(soup)
         if count_tag:
              count_text = count_tag.get_text(strip=True)
              count_match = re.search(r'(\d{1,3}(?:,\d{3})*|\d+)', count_text) # カンマ区切り対応
@@ -265,12 +328,6 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
 
         return details
 
-    except requests.exceptions.Timeout:
-        logging.error(f"[Filmarks] 詳細取得タイムアウト: {movie_page_url}")
-        return details
-    except requests.exceptions.RequestException as e:
-        logging.error(f"[Filmarks] 詳細取得リクエストエラー ({movie_page_url}): {e}")
-        return details
     except Exception as e:
         logging.error(f"[Filmarks] 詳細取得処理中の予期せぬエラー ({movie_page_url}): {e}")
         return details 
\ No newline at end of file
@@ -0,0 +1,142 @@
+# HTML Parser Backend
+# 全スクレイパー共通のHTML解析レイヤー。
+# - BeautifulSoup のツリービルダーを切り替え可能にする (lxml があれば lxml、なければ html.parser)
+# - CSSセレクタは soupsieve でモジュール読み込み時に1度だけコンパイルし、ページごとの再解析を省く
+# - 各サイトが抽出に使う領域 (Region) を宣言し、その部分木だけを構築する (部分解析)。
+#   領域は項目ごとに宣言し (FieldRegions)、構造化データで埋まらなかった項目の領域だけを解析することもできる
+
+import logging
+import threading
+
+from collections import namedtuple
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml # noqa: F401 (lxml バックエンドの有無の確認のみ)
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+BACKENDS = ['lxml', 'html.parser']
+DEFAULT_BACKEND = 'lxml' if LXML_AVAILABLE else 'html.parser'
+
+_config = {
+    'backend': DEFAULT_BACKEND,
+    'partial': True,   # False なら領域の指定を無視してページ全体を解析する
+}
+
+# 抽出に使う領域。name (タグ名, None なら任意) と attrs (属性名 -> 値) がすべて一致する要素を表す。
+# attrs の 'class' は複数クラスのうち1つと一致すればよい。
+Region = namedtuple('Region', ['name', 'attrs'], defaults=[None, {}])
+
+
+def configure(backend=None, partial=None):
+    """解析に使うツリービルダーを設定する (None ならデフォルト)。lxml が使えない場合は html.parser に戻す。
+    partial=False で部分解析を無効にし、常にページ全体を解析する"""
+    if partial is not None:
+        _config['partial'] = bool(partial)
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"未対応のHTMLパーサーです: {backend}")
+    if backend == 'lxml' and not LXML_AVAILABLE:
+        logging.warning("lxml がインストールされていないため、html.parser で解析します (pip install lxml)")
+        backend = 'html.parser'
+    _config['backend'] = backend
+    logging.debug(f"HTMLパーサー: {backend}")
+
+
+def get_backend():
+    return _config['backend']
+
+
+def is_partial():
+    return _config['partial']
+
+
+def _region_matches(region, name, attrs):
+    if region.name is not None and region.name != name:
+        return False
+    for key, value in region.attrs.items():
+        actual = attrs.get(key)
+        if actual is None:
+            return False
+        if key == 'class':
+            classes = actual.split() if isinstance(actual, str) else actual
+            if value not in classes:
+                return False
+        elif actual != value:
+            return False
+    return True
+
+
+class _RegionStrainer(SoupStrainer):
+    """いずれかの領域に一致する要素 (とその子孫) だけを木に加える (bs4 4.13 以降)"""
+
+    def __init__(self, regions):
+        super().__init__()
+        self.regions = regions
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        attrs = attrs or {}
+        return any(_region_matches(region, name, attrs) for region in self.regions)
+
+    def allow_string_creation(self, string):
+        return False # 領域の外にある文字列は捨てる
+
+
+def region_strainer(*regions):
+    """領域の一覧から、make_soup の parse_only に渡す SoupStrainer を作る"""
+    if hasattr(SoupStrainer, 'allow_tag_creation'):
+        return _RegionStrainer(regions)
+    # bs4 4.12 以前: name に関数を渡すと (タグ名, 属性) で呼ばれる
+    return SoupStrainer(lambda name, attrs: isinstance(name, str) and
+                        any(_region_matches(region, name, dict(attrs or {})) for region in regions))
+
+
+class FieldRegions:
+    """項目ごとの抽出領域 ({項目: (Region, ...)})。指定した項目の領域 (と common) だけを解析する strainer を作る。
+    strainer は項目の組み合わせごとに作り置きする"""
+
+    def __init__(self, regions, common=()):
+        self.regions = regions
+        self.common = tuple(common)
+        self._strainers = {}
+        self._lock = threading.Lock()
+
+    def strainer(self, fields=None):
+        """fields (None なら全項目) の抽出に必要な領域の strainer"""
+        key = None if fields is None else frozenset(fields)
+        with self._lock:
+            strainer = self._strainers.get(key)
+            if strainer is None:
+                names = self.regions if fields is None else [field for field in self.regions if field in key]
+                regions = list(self.common)
+                for name in names:
+                    regions.extend(region for region in self.regions[name] if region not in regions)
+                strainer = region_strainer(*regions)
+                self._strainers[key] = strainer
+            return strainer
+
+
+def make_soup(content, parse_only=None, encoding=None):
+    """レスポンス本文 (bytes または str) から BeautifulSoup オブジェクトを作る。
+    parse_only (region_strainer の戻り値) を指定すると、その領域の部分木だけを構築する。
+    encoding (page_encoding.encoding_for の戻り値) を指定すると、その文字コードでデコードした str を渡して
+    ページごとの文字コード推定を省略する。デコードできなければ bytes のまま渡して推定させる
+    (lxml は from_encoding が誤っていてもエラーにならず文字化けするため、デコードの成否で判定する)"""
+    kwargs = {}
+    if parse_only is not None and _config['partial']:
+        kwargs['parse_only'] = parse_only
+    if encoding and isinstance(content, bytes):
+        try:
+            content = content.decode(encoding)
+        except (UnicodeDecodeError, LookupError):
+            logging.debug(f"  {encoding} でデコードできないため、文字コードを推定します。")
+    return BeautifulSoup(content, _config['backend'], **kwargs)
+
+
+def compile_selector(css):
+    """CSSセレクタをコンパイルする。戻り値の select(tag) / select_one(tag) で検索する"""
+    return soupsieve.compile(css)
@@ -0,0 +1,174 @@
+# Persistent HTTP Response Cache
+# 共有取得レイヤー (http_client.fetch) 用のディスクキャッシュ。
+# - 本文は内容のSHA-256をキーにした objects/ 以下のファイルに保存 (同一内容は1ファイル)
+# - URL -> 本文ハッシュ・ETag・Last-Modified・取得時刻などの索引は SQLite に保存
+# - TTL内はネットワークに出ずに返し、TTL切れは If-None-Match / If-Modified-Since で再検証する
+# - 合計サイズが上限を超えたら最終アクセスが古いものから削除する (LRU)
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_TTL = 24 * 3600            # 秒
+DEFAULT_MAX_BYTES = 1024 ** 3      # 1GB
+# キャッシュに保存するレスポンスヘッダー (デコードと再検証に必要なもののみ)
+STORED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Date']
+
+
+class HttpCache:
+    """URLをキーにしたレスポンスキャッシュ (スレッドセーフ)"""
+
+    def __init__(self, cache_dir, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                body_hash TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    # --- 内部ヘルパー ---
+    def _object_path(self, body_hash):
+        return os.path.join(self.objects_dir, body_hash[:2], body_hash)
+
+    def _write_object(self, body):
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._object_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 途中で中断されても壊れたファイルが残らないよう、一時ファイルから置き換える
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        return body_hash
+
+    def _remove_object_if_unused(self, body_hash):
+        in_use = self._conn.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+        if not in_use:
+            try:
+                os.remove(self._object_path(body_hash))
+            except FileNotFoundError:
+                pass
+
+    # --- 公開API ---
+    def lookup(self, url):
+        """URLの索引エントリを辞書で返す (なければ None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, body_hash, status, headers, etag, last_modified, fetched_at, size FROM entries WHERE url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        keys = ['url', 'body_hash', 'status', 'headers', 'etag', 'last_modified', 'fetched_at', 'size']
+        return dict(zip(keys, row))
+
+    def is_fresh(self, entry):
+        return (time.time() - entry['fetched_at']) < self.ttl
+
+    def conditional_headers(self, entry):
+        """再検証用のリクエストヘッダーを返す"""
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def build_response(self, entry):
+        """キャッシュエントリから requests.Response を組み立てる。本文が失われていれば None"""
+        try:
+            with open(self._object_path(entry['body_hash']), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), entry['url']))
+            self._conn.commit()
+        response = requests.Response()
+        response.status_code = entry['status']
+        response._content = body
+        response.headers = CaseInsensitiveDict(json.loads(entry['headers']))
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = entry['url']
+        response.from_cache = True
+        return response
+
+    def store(self, url, response):
+        """正常レスポンス (200) を保存する"""
+        if response.status_code != 200:
+            return
+        body = response.content
+        headers = {k: response.headers[k] for k in STORED_HEADERS if k in response.headers}
+        now = time.time()
+        with self._lock:
+            # 本文の書き込みも排他区間内で行い、並行する削除 (LRU) と競合しないようにする
+            body_hash = self._write_object(body)
+            old = self._conn.execute("SELECT body_hash, size FROM entries WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body_hash, response.status_code, json.dumps(headers), headers.get('ETag'),
+                 headers.get('Last-Modified'), now, now, len(body)))
+            self._total_bytes += len(body) - (old[1] if old else 0)
+            if old and old[0] != body_hash:
+                self._remove_object_if_unused(old[0])
+            self._conn.commit()
+            self.stats['stored'] += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def mark_revalidated(self, entry, response):
+        """304 Not Modified を受けたエントリの取得時刻 (と新しい検証子) を更新する"""
+        etag = response.headers.get('ETag') or entry['etag']
+        last_modified = response.headers.get('Last-Modified') or entry['last_modified']
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entries SET fetched_at = ?, last_access = ?, etag = ?, last_modified = ? WHERE url = ?",
+                (now, now, etag, last_modified, entry['url']))
+            self._conn.commit()
+
+    def _evict_locked(self):
+        for url, body_hash, size in self._conn.execute(
+                "SELECT url, body_hash, size FROM entries ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._remove_object_if_unused(body_hash)
+            self.stats['evicted'] += 1
+            self._total_bytes -= size
+            if self._total_bytes <= self.max_bytes:
+                break
+        self._conn.commit()
+        logging.debug(f"HTTPキャッシュを上限 {self.max_bytes} バイト以下に縮小しました (現在 {self._total_bytes} バイト)")
+
+    def count(self, event):
+        """統計カウンタ (hits, revalidated, misses) を1つ進める"""
+        with self._lock:
+            self.stats[event] += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,174 @@
+# Shared HTTP Client
+# 全スクレイパー共通の取得レイヤー。
+# requests.Session を1つ共有し、ホストごとの keep-alive 接続プールを再利用する。
+# configure_cache() でディスクキャッシュ (http_cache.HttpCache) を有効にできる。
+# cancellation(event) の中で event がセットされると、以降の送信は行わず RequestCancelled を送出する
+# (複数サイトへの同時問い合わせで、不要になったリクエストを打ち切るために使う)。
+
+import contextlib
+import contextvars
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scrapers import http_cache, rate_limiter
+
+# User-Agent設定 (全サイト共通)
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+}
+
+DEFAULT_POOL_SIZE = 10   # ホストごとに保持する接続数
+DEFAULT_TIMEOUT = 15     # 秒
+POOL_HOSTS = 8           # プールをキャッシュするホスト数 (対象サイトは4ホスト程度)
+
+_config = {
+    'pool_size': DEFAULT_POOL_SIZE,
+    'timeout': DEFAULT_TIMEOUT,
+}
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+_cancel_event = contextvars.ContextVar('http_client_cancel_event', default=None)
+_cancelled = 0
+_cancelled_lock = threading.Lock()
+
+
+class RequestCancelled(requests.exceptions.RequestException):
+    """cancellation() の event がセットされたため、リクエストを送信しなかった"""
+
+
+class _FetchFailed:
+    """取得に失敗した (タイムアウト・HTTPエラー・取りやめ) ことを表す値。
+    「見つからなかった」(None) と区別するためにスクレイパーの search_* / scrape_movie_details が返す。
+    None と同じく偽として扱われるため、`if movie_page_url:` などの判定はそのまま使える"""
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'FETCH_FAILED'
+
+
+FETCH_FAILED = _FetchFailed()
+
+
+def configure(pool_size=None, timeout=None):
+    """接続プールサイズとタイムアウトを設定する。既存のセッションは次回取得時に作り直される。"""
+    global _session
+    with _session_lock:
+        if pool_size is not None:
+            _config['pool_size'] = max(1, int(pool_size))
+        if timeout is not None:
+            _config['timeout'] = float(timeout)
+        if _session is not None:
+            _session.close()
+            _session = None
+    logging.debug(f"HTTPクライアント設定: プールサイズ={_config['pool_size']}, タイムアウト={_config['timeout']}秒")
+
+
+def get_session():
+    """共有セッションを返す (初回呼び出し時に作成)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=_config['pool_size'])
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def configure_cache(cache_dir, ttl=http_cache.DEFAULT_TTL, max_bytes=http_cache.DEFAULT_MAX_BYTES):
+    """ディスクキャッシュを有効にする (cache_dir が None なら無効)"""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+    if cache_dir:
+        _cache = http_cache.HttpCache(cache_dir, ttl=ttl, max_bytes=max_bytes)
+        logging.info(f"HTTPキャッシュ: {cache_dir} (TTL {ttl / 3600:g}時間, 上限 {max_bytes / 1024 ** 2:g}MB)")
+
+
+def get_cache_stats():
+    """キャッシュの統計 (hits, revalidated, misses, stored, evicted) を返す。無効時は None"""
+    return dict(_cache.stats) if _cache is not None else None
+
+
+@contextlib.contextmanager
+def cancellation(event):
+    """この中 (asyncio.to_thread で実行する関数を含む) の送信を、event (threading.Event) で打ち切れるようにする"""
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+def get_cancelled_count():
+    """打ち切りにより送信しなかったリクエスト数"""
+    return _cancelled
+
+
+def _check_cancelled(url):
+    global _cancelled
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        with _cancelled_lock:
+            _cancelled += 1
+        raise RequestCancelled(f"リクエストを取りやめました: {url}")
+
+
+def _send(url, timeout, headers=None, **kwargs):
+    _check_cancelled(url)
+    rate_limiter.acquire(urlsplit(url).hostname)
+    _check_cancelled(url) # レート制限の待機中に不要になった場合も送信しない
+    return get_session().get(url, timeout=timeout, headers=headers, **kwargs)
+
+
+def fetch(url, timeout=None, **kwargs):
+    """共有セッション経由でGETリクエストを送信し、レスポンスを返す。
+    キャッシュ有効時はTTL内ならネットワークに出ずに返し、TTL切れは条件付きリクエストで再検証する。
+    送信前にホストごとのレート制限 (rate_limiter) の枠を待つ。
+    例外 (requests.exceptions.*) は呼び出し側でハンドリングする。"""
+    if timeout is None:
+        timeout = _config['timeout']
+    cache = _cache
+    if cache is None or kwargs:
+        return _send(url, timeout, **kwargs)
+
+    entry = cache.lookup(url)
+    if entry and cache.is_fresh(entry):
+        response = cache.build_response(entry)
+        if response is not None:
+            cache.count('hits')
+            logging.debug(f"  [キャッシュ] ヒット: {url}")
+            return response
+
+    response = _send(url, timeout, headers=cache.conditional_headers(entry))
+    if response.status_code == 304 and entry:
+        cached = cache.build_response(entry)
+        if cached is not None:
+            cache.mark_revalidated(entry, response)
+            cache.count('revalidated')
+            logging.debug(f"  [キャッシュ] 再検証 (304): {url}")
+            return cached
+        # 本文が失われていた場合は条件なしで取り直す
+        response = _send(url, timeout)
+    cache.count('misses')
+    cache.store(url, response)
+    return response
+
+
+def close():
+    """共有セッションを閉じる"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,80 @@
+# Page Encoding
+# レスポンス本文の文字コードを、HTTPヘッダー (Content-Type の charset) または <meta charset> から決め、
+# ホストごとに記憶して次回以降はそのまま使う。決まった文字コードを html_parser.make_soup に渡すことで、
+# ページごとの文字コード推定 (UnicodeDammit / charset_normalizer) を省略する。
+# (その文字コードでデコードできないページは、make_soup が従来どおり BeautifulSoup に推定させる)
+
+import codecs
+import logging
+import re
+import threading
+from urllib.parse import urlsplit
+
+# <meta charset> を探す範囲 (先頭から)
+SNIFF_BYTES = 4096
+# 宣言された文字コードを、実際のページで使われる上位互換の文字コードに読み替える
+ENCODING_SUPERSETS = {
+    'shift_jis': 'cp932',   # 機種依存文字 (①, ㈱ など) を含むページがある
+    'iso8859-1': 'cp1252',  # HTML5 の仕様どおり
+    'ascii': 'cp1252',
+}
+
+_META_CHARSET = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([A-Za-z0-9_.:\-]+)', re.I)
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([A-Za-z0-9_.:\-]+)', re.I)
+
+_host_encodings = {}
+_lock = threading.Lock()
+
+
+def normalize(name):
+    """文字コード名を Python のコーデック名に正規化する (不明な名前は None)"""
+    try:
+        name = codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+    return ENCODING_SUPERSETS.get(name, name)
+
+
+def from_content_type(content_type):
+    """Content-Type ヘッダーの charset (なければ None)"""
+    match = _HEADER_CHARSET.search(content_type or '')
+    return normalize(match.group(1)) if match else None
+
+
+def from_meta(content):
+    """本文先頭の <meta charset> / <meta http-equiv="Content-Type"> の charset (なければ None)"""
+    match = _META_CHARSET.search(content[:SNIFF_BYTES])
+    return normalize(match.group(1).decode('ascii')) if match else None
+
+
+def _host(url):
+    return urlsplit(url).hostname if url else None
+
+
+def encoding_for(url, content, content_type=None):
+    """ページの文字コードを決める。ヘッダー > ホストごとの記憶 > <meta charset> の順に使い、結果をホストごとに記憶する"""
+    host = _host(url)
+    encoding = from_content_type(content_type)
+    if encoding is None:
+        with _lock:
+            encoding = _host_encodings.get(host)
+        if encoding is not None:
+            return encoding
+        encoding = from_meta(content)
+    if encoding is not None and host is not None:
+        with _lock:
+            if _host_encodings.get(host) != encoding:
+                logging.debug(f"  [{host}] 文字コード: {encoding}")
+                _host_encodings[host] = encoding
+    return encoding
+
+
+def forget(url):
+    with _lock:
+        _host_encodings.pop(_host(url), None)
+
+
+def get_host_encodings():
+    """ホストごとに記憶している文字コード"""
+    with _lock:
+        return dict(_host_encodings)
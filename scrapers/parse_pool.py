@@ -0,0 +1,66 @@
+# Parse Pool
+# 作品ページの解析 (HTML解析・正規表現による抽出) は CPU を使い GIL を保持するため、
+# スレッドを増やしても通信待ちの重なり以上には速くならない。
+# ParsePool は取得した生のバイト列をワーカープロセス (ProcessPoolExecutor) へ渡して
+# 各スクレイパーの extract_movie_details を実行し、小さな details 辞書だけを受け取る。
+#
+# ワーカーは spawn で起動し、親プロセスのパーサー設定 (html_parser / structured_data) と
+# ログレベルを initializer で引き継ぐ。
+
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from scrapers import html_parser, structured_data
+
+
+def default_workers():
+    """CPUコア数 (取得できない場合は1)"""
+    return os.cpu_count() or 1
+
+
+def _init_worker(backend, partial, structured_mode, log_level):
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stdout)
+    html_parser.configure(backend, partial=partial)
+    structured_data.configure(structured_mode)
+
+
+class ParsePool:
+    """extract_movie_details をワーカープロセスで実行するプール (スレッドセーフ)"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(html_parser.get_backend(), html_parser.is_partial(), structured_data.get_mode(), logging.getLogger().level),
+        )
+
+    def submit(self, extract, content, movie_page_url=None, encoding=None):
+        """extract(content, movie_page_url, encoding) をワーカープロセスで実行する Future を返す。
+        extract はモジュールのトップレベル関数 (pickle 可能) であること"""
+        return self._executor.submit(extract, content, movie_page_url, encoding)
+
+    def submit_task(self, func, *args):
+        """任意のトップレベル関数 func(*args) をワーカープロセスで実行する Future を返す"""
+        return self._executor.submit(func, *args)
+
+    def extractor(self, extract):
+        """extract と同じ呼び出し方で、解析をワーカープロセスに任せる関数を返す。
+        呼び出したスレッドは結果が返るまで待つが、その間 GIL は解放される"""
+        def run(content, movie_page_url=None, encoding=None):
+            return self.submit(extract, content, movie_page_url, encoding).result()
+        return run
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
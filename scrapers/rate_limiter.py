@@ -0,0 +1,116 @@
+# Per-host Rate Limiter
+# ホストごとのトークンバケットでリクエスト送信間隔を制御する。
+# スレッドセーフなので、並行モードの複数ワーカーから共有しても全体のスループットが目標値に収まる。
+
+import logging
+import random
+import threading
+import time
+
+# ホストごとのデフォルト目標スループット (リクエスト/秒)
+# 従来の --wait (映画.com 0.2秒, Yahoo!映画 0.5秒, Filmarks 0.3秒) 相当の負荷を目安にしている
+DEFAULT_HOST_RATES = {
+    'eiga.com': 4.0,
+    'search.yahoo.co.jp': 1.5,
+    'movies.yahoo.co.jp': 1.5,
+    'filmarks.com': 3.0,
+}
+DEFAULT_RATE = 2.0   # 上記以外のホスト
+DEFAULT_BURST = 1    # 連続して即時送信できるリクエスト数
+
+
+class TokenBucket:
+    """トークンバケット。rate <= 0 の場合は制限しない"""
+
+    def __init__(self, rate, burst=DEFAULT_BURST, jitter=0.0):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.jitter = max(0.0, float(jitter))
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+        self.acquired = 0
+
+    def reserve(self):
+        """トークンを1つ予約し、送信まで待つべき秒数を返す (待機はしない)"""
+        with self._lock:
+            self.acquired += 1
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # トークンが足りない場合は負の残高として予約し、後続の呼び出しはさらに後ろに並ぶ
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            if self.jitter:
+                wait += random.uniform(0, self.jitter)
+            self.waited_seconds += wait
+            return wait
+
+    def acquire(self):
+        """送信可能になるまでブロックする"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_config = {
+    'host_rates': dict(DEFAULT_HOST_RATES),
+    'default_rate': DEFAULT_RATE,
+    'burst': DEFAULT_BURST,
+    'jitter': 0.0,
+}
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def configure(rate=None, burst=None, jitter=None, host_rates=None):
+    """目標スループットを設定する。rate は全ホスト共通の値 (ホスト別デフォルトを上書き)、
+    host_rates は {ホスト名: リクエスト/秒} で個別に指定する。"""
+    with _buckets_lock:
+        if rate is not None:
+            _config['host_rates'] = {host: rate for host in DEFAULT_HOST_RATES}
+            _config['default_rate'] = rate
+        if host_rates:
+            _config['host_rates'].update(host_rates)
+        if burst is not None:
+            _config['burst'] = burst
+        if jitter is not None:
+            _config['jitter'] = jitter
+        _buckets.clear()
+    logging.debug(f"レート制限設定: {_config}")
+
+
+def get_bucket(host):
+    """ホストに対応するトークンバケットを返す (なければ作成)"""
+    host = (host or '').lower()
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            rate = _config['host_rates'].get(host, _config['default_rate'])
+            bucket = TokenBucket(rate, _config['burst'], _config['jitter'])
+            _buckets[host] = bucket
+        return bucket
+
+
+def acquire(host):
+    """指定ホストへの送信枠を取得するまで待機する"""
+    return get_bucket(host).acquire()
+
+
+def get_stats():
+    """ホストごとの {'requests': 件数, 'waited_seconds': 累計待機秒数} を返す"""
+    with _buckets_lock:
+        return {host: {'requests': b.acquired, 'waited_seconds': round(b.waited_seconds, 3)}
+                for host, b in _buckets.items()}
+
+
+def parse_host_rate(value):
+    """'host=rate' 形式の文字列を (host, rate) に変換する (argparse の type 用)"""
+    host, sep, rate = value.partition('=')
+    if not sep or not host:
+        raise ValueError(f"'ホスト名=リクエスト/秒' の形式で指定してください: {value}")
+    return host.strip().lower(), float(rate)
@@ -0,0 +1,204 @@
+# Structured Data Fast Path
+# 作品ページの本文から JSON-LD (schema.org Movie) と OpenGraph の meta タグを正規表現で取り出し、
+# HTMLを解析する前に year / director / cast / runtime / summary / reviews (評価) を埋め、
+# DOM 抽出 (各スクレイパーの HTML解析) はまだ空いている項目の領域 (html_parser.FieldRegions) だけを解析して補う。
+# 空いている項目がなければHTMLは解析しない。
+#
+# 優先順位: JSON-LD > HTML (DOM) > OpenGraph
+# (cast / full_cast は JSON-LD に役名がないため HTML (DOM) を優先する。
+#  og:description は要約が途中で切られていることが多いため、DOM で取れなかった場合のみ使う)
+
+import html
+import json
+import logging
+import re
+
+from scrapers import page_encoding
+
+MODES = ['fast', 'merge', 'off']
+# fast : JSON-LD で埋まらなかったカバレッジ (各スクレイパーの COVERAGE) の項目だけを DOM 抽出する
+#        (JSON-LD にキャストがあれば cast / full_cast は役名なし)
+# merge: fast に加えて cast / full_cast (DOM_PREFERRED_FIELDS) も DOM 抽出する (DOM 抽出のみの場合と同じ結果)
+# off  : 構造化データを使わない (ページ全体の領域を DOM 抽出)
+DEFAULT_MODE = 'merge'
+# DOM 抽出で取れた場合は JSON-LD より優先する項目 (JSON-LD には役名がない)
+DOM_PREFERRED_FIELDS = ('cast', 'full_cast')
+SUMMARY_MAX_LENGTH = 300
+# OpenGraph から取れる項目 (DOM 抽出のあとも空いている場合だけ meta タグを読む)
+OPEN_GRAPH_FIELDS = ('summary', 'year', 'runtime')
+
+_config = {
+    'mode': DEFAULT_MODE,
+}
+
+_JSON_LD_BLOCK = re.compile(r'<script[^>]*?type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script\s*>', re.S | re.I)
+_META_TAG = re.compile(r'<meta\s[^>]*>', re.I)
+_META_ATTR = re.compile(r'(property|name|content)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')', re.I)
+_ISO_DURATION = re.compile(r'^P(?:\d+D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$', re.I)
+
+
+def configure(mode=None):
+    mode = mode or DEFAULT_MODE
+    if mode not in MODES:
+        raise ValueError(f"未対応の構造化データモードです: {mode}")
+    _config['mode'] = mode
+
+
+def get_mode():
+    return _config['mode']
+
+
+# --- 値の変換 ---
+def _year_from(value):
+    match = re.search(r'(\d{4})', str(value or ''))
+    return int(match.group(1)) if match else None
+
+
+def _minutes_from_iso_duration(value):
+    """'PT118M' / 'PT1H58M' などを分に変換する"""
+    match = _ISO_DURATION.match(str(value or '').strip())
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds = (int(g) if g else 0 for g in match.groups())
+    return hours * 60 + minutes + (1 if seconds >= 30 else 0)
+
+
+def _names(value):
+    """Person / Organization (またはそのリスト、文字列) から名前のリストを取り出す"""
+    items = value if isinstance(value, list) else [value]
+    names = []
+    for item in items:
+        name = item.get('name') if isinstance(item, dict) else item
+        if isinstance(name, str) and name.strip():
+            names.append(html.unescape(name.strip()))
+    return names
+
+
+def _summary(text):
+    text = ' '.join(html.unescape(text).split())
+    return text[:SUMMARY_MAX_LENGTH] + ('...' if len(text) > SUMMARY_MAX_LENGTH else '')
+
+
+def _is_movie(node):
+    node_type = node.get('@type')
+    return node_type == 'Movie' or (isinstance(node_type, list) and 'Movie' in node_type)
+
+
+def _find_movie(data):
+    """JSON-LD の値 (辞書/リスト/@graph) から @type Movie のノードを探す"""
+    if isinstance(data, list):
+        for item in data:
+            movie = _find_movie(item)
+            if movie:
+                return movie
+    elif isinstance(data, dict):
+        if _is_movie(data):
+            return data
+        if '@graph' in data:
+            return _find_movie(data['@graph'])
+    return None
+
+
+# --- 抽出 ---
+def extract_json_ld(content):
+    """HTML (str) の JSON-LD から取得できる項目を辞書で返す"""
+    fields = {}
+    for block in _JSON_LD_BLOCK.findall(content):
+        try:
+            movie = _find_movie(json.loads(block))
+        except (ValueError, RecursionError) as e:
+            logging.debug(f"    JSON-LDの解析をスキップ: {e}")
+            continue
+        if not movie:
+            continue
+        year = _year_from(movie.get('dateCreated') or movie.get('datePublished'))
+        if year:
+            fields['year'] = year
+        directors = _names(movie.get('director'))
+        if directors:
+            fields['director'] = ", ".join(directors)
+        actors = _names(movie.get('actor') or movie.get('actors'))
+        if actors:
+            fields['full_cast'] = [{"name": name, "role": None} for name in actors]
+            fields['cast'] = ", ".join(actors[:4]) # 主要キャストは4名まで
+        runtime = _minutes_from_iso_duration(movie.get('duration'))
+        if runtime:
+            fields['runtime'] = runtime
+        summary = movie.get('outline') or movie.get('description')
+        if isinstance(summary, str) and summary.strip():
+            fields['summary'] = _summary(summary)
+        rating = movie.get('aggregateRating')
+        if isinstance(rating, dict):
+            reviews = {}
+            try:
+                if rating.get('ratingValue') not in (None, ''):
+                    reviews['average_score'] = float(rating['ratingValue'])
+                count = rating.get('ratingCount') or rating.get('reviewCount')
+                if count not in (None, ''):
+                    reviews['review_count'] = int(str(count).replace(',', ''))
+            except (TypeError, ValueError):
+                pass
+            if reviews:
+                fields['reviews'] = reviews
+        break # 最初の Movie ノードのみ使う
+    return fields
+
+
+def extract_open_graph(content):
+    """HTML (str) の OpenGraph meta タグから取得できる項目を辞書で返す"""
+    meta = {}
+    for tag in _META_TAG.findall(content):
+        attrs = {m.group(1).lower(): (m.group(2) if m.group(2) is not None else m.group(3)) for m in _META_ATTR.finditer(tag)}
+        key = attrs.get('property') or attrs.get('name')
+        if key and 'content' in attrs:
+            meta.setdefault(key.lower(), attrs['content'])
+    fields = {}
+    if meta.get('og:description', '').strip():
+        fields['summary'] = _summary(meta['og:description'])
+    year = _year_from(meta.get('video:release_date'))
+    if year:
+        fields['year'] = year
+    if meta.get('video:duration', '').isdigit():
+        fields['runtime'] = round(int(meta['video:duration']) / 60)
+    return fields
+
+
+def dom_fields(details, coverage, mode=None):
+    """JSON-LD を反映した details から、DOM 抽出で埋める項目のリストを返す (空なら HTMLを解析しない)"""
+    fields = [field for field in coverage if details.get(field) is None]
+    if (mode or _config['mode']) == 'merge':
+        fields += [field for field in DOM_PREFERRED_FIELDS if field in coverage and field not in fields]
+    return fields
+
+
+def extract_details(content, details, dom_extract, encoding=None, coverage=None):
+    """構造化データを優先して details を埋め、まだ空いている項目だけを dom_extract (DOM 抽出) で埋める。
+    details: サイトの空の詳細辞書,
+    dom_extract: dom_extract(fields) で fields (None なら全項目) の領域を解析した DOM 抽出結果の辞書を返す関数,
+    encoding: 本文の文字コード (page_encoding.encoding_for の戻り値。None なら <meta charset> に従う),
+    coverage: サイトで取得できる項目 (None なら details の全項目)"""
+    mode = _config['mode']
+    if mode == 'off':
+        return dom_extract(None)
+
+    text = content
+    if isinstance(text, bytes):
+        text = text.decode(encoding or page_encoding.from_meta(text) or 'utf-8', errors='replace')
+    for key, value in extract_json_ld(text).items():
+        details[key] = value
+
+    if coverage is None:
+        coverage = [key for key in details if key != 'source']
+    fields = dom_fields(details, coverage, mode)
+    if fields:
+        for key, value in dom_extract(fields).items():
+            if details.get(key) is None or (key in DOM_PREFERRED_FIELDS and value is not None):
+                details[key] = value
+    else:
+        logging.debug("    構造化データ (JSON-LD) でカバレッジの項目がそろったため、HTMLの解析を省略しました。")
+
+    if any(details.get(key) is None for key in OPEN_GRAPH_FIELDS):
+        for key, value in extract_open_graph(text).items():
+            if details.get(key) is None:
+                details[key] = value
+    return details
@@ -3,19 +3,66 @@
 # TODO: Implement Yahoo! Eiga specific search and scrape functions here 
 
 import requests
-from bs4 import BeautifulSoup
 import re
 import logging
-import os
 from urllib.parse import quote # URLエンコード用
 
-# User-Agent設定 (映画.comと同じものを使用)
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-}
+from scrapers import http_client # 共有HTTPセッション (接続プール)
+from scrapers import html_parser # 共有HTMLパーサー (lxml / html.parser)
+from scrapers import debug_capture # デバッグ用HTMLの保存 (サンプリング・非同期)
+from scrapers import page_encoding # ホストごとの文字コード
+from scrapers import structured_data # JSON-LD / OpenGraph の高速抽出
+
+# --- CSSセレクタ (モジュール読み込み時に1度だけコンパイル) ---
+# 映画セクション内の最初の movies.yahoo.co.jp へのリンク (前方一致で eiga.com などを除外)
+SEARCH_RESULT_LINK = html_parser.compile_selector('div.sw-CardBase a.sw-Card__titleInner[href^="https://movies.yahoo.co.jp/movie/"]')
+PAGE_TITLE = html_parser.compile_selector('title')
+SPEC_DL = html_parser.compile_selector('dl.spec, section[data-test=detail-spec] dl') # 推測
+BASIC_INFO = html_parser.compile_selector('p.basicInfo, .Header__info') # 推測
+STAFF_SECTION = html_parser.compile_selector('section#staff, section[data-test=detail-staff]') # 推測
+STAFF_ROLES = html_parser.compile_selector('dt')
+STAFF_NAMES = html_parser.compile_selector('a')
+STORY = html_parser.compile_selector('section#story p, p[data-test=story], div.Story__content') # 推測
+CAST_SECTION = html_parser.compile_selector('section#cast, section[data-test=detail-cast]') # 推測
+CAST_ITEMS = html_parser.compile_selector('li, div.Cast__item') # 推測
+CAST_NAME = html_parser.compile_selector('.name a, .Cast__name, p a')
+CAST_ROLE = html_parser.compile_selector('.role, .Cast__role, p + p') # 名前の次に来る要素を仮定
+REVIEW_SECTION = html_parser.compile_selector('.Review__average, section[data-test=detail-review-score]') # 推測
+REVIEW_SCORE = html_parser.compile_selector('.Rating__value, .Score__value') # 推測
+REVIEW_COUNT = html_parser.compile_selector('.Review__count, .Score__text em') # 推測
+
+# --- 部分解析: 抽出で読む領域だけを木にする (広告・スクリプト・おすすめ欄などは構築しない) ---
+SEARCH_REGIONS = html_parser.region_strainer(
+    html_parser.Region('div', {'class': 'sw-CardBase'}),
+)
+# 項目ごとの領域 (構造化データで埋まらなかった項目の領域だけを解析する: structured_data.extract_details)
+_SPEC = (  # 公開年・製作国・上映時間・配給 (dl がなければ基本情報の p)
+    html_parser.Region('dl', {'class': 'spec'}),
+    html_parser.Region('section', {'data-test': 'detail-spec'}),
+    html_parser.Region('p', {'class': 'basicInfo'}),
+    html_parser.Region(None, {'class': 'Header__info'}),
+)
+_STAFF = (html_parser.Region('section', {'id': 'staff'}), html_parser.Region('section', {'data-test': 'detail-staff'}))
+_CAST = (html_parser.Region('section', {'id': 'cast'}), html_parser.Region('section', {'data-test': 'detail-cast'}))
+DETAIL_FIELD_REGIONS = html_parser.FieldRegions({
+    'year': _SPEC, 'country': _SPEC, 'runtime': _SPEC, 'distributor': _SPEC,
+    'director': _STAFF, 'producer': _STAFF, 'cinematographer': _STAFF, 'full_staff': _STAFF,
+    'summary': (
+        html_parser.Region('section', {'id': 'story'}),
+        html_parser.Region('p', {'data-test': 'story'}),
+        html_parser.Region('div', {'class': 'Story__content'}),
+    ),
+    'cast': _CAST, 'full_cast': _CAST,
+    'reviews': (
+        html_parser.Region(None, {'class': 'Review__average'}),
+        html_parser.Region('section', {'data-test': 'detail-review-score'}),
+    ),
+}, common=(html_parser.Region('title'),))
+DETAIL_REGIONS = DETAIL_FIELD_REGIONS.strainer()
 
 def search_yahoo_eiga(title):
-    """Yahoo!映画で映画タイトルを検索し、最上位の作品ページのURLを取得する (推測)"""
+    """Yahoo!映画で映画タイトルを検索し、最上位の作品ページのURLを取得する (推測)
+    (見つからなければ None、取得に失敗した場合は http_client.FETCH_FAILED)"""
     search_query = quote(title)
     # search_url = f"https://movies.yahoo.co.jp/search/?q={search_query}" # 元のURL
     # リダイレクト先の可能性が高い search.yahoo.co.jp を直接使う方が安定するかも
@@ -23,81 +70,105 @@ def search_yahoo_eiga(title):
     try:
         logging.info(f"[Yahoo!映画] 検索中: {title} (URL: {search_url})")
         # allow_redirects=True (デフォルト) でリダイレクトに対応
-        response = requests.get(search_url, headers=HEADERS, timeout=15)
+        response = http_client.fetch(search_url)
         response.raise_for_status()
 
-        # --- デバッグ用に検索結果HTMLを保存 ---
-        try:
-            debug_filename = "_debug_search_result_yahoo.html"
-            with open(debug_filename, "wb") as f:
-                f.write(response.content)
-            logging.debug(f"  [Yahoo!映画] デバッグ用に検索結果HTMLを '{debug_filename}' に保存しました。")
-        except Exception as e:
-            logging.warning(f"  [Yahoo!映画] デバッグ用検索結果HTMLの保存中にエラー: {e}")
-        # --- デバッグ用ここまで ---
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # --- !! 新しい推測セレクタ (search.yahoo.co.jp 向け) !! ---
-        # 例: <div class="sw-CardBase ..."> <a class="sw-Card__titleInner" href="https://movies.yahoo.co.jp/movie/..."> ... </a> </div>
-        # 映画セクション内の最初の movies.yahoo.co.jp へのリンクを探す
-        # result_link = soup.select_one('div.sw-CardBase a.sw-Card__titleInner[href*="/movie/"]') # 以前のセレクタ (eiga.comも拾ってしまう)
-        result_link = soup.select_one('div.sw-CardBase a.sw-Card__titleInner[href^="https://movies.yahoo.co.jp/movie/"]') # 前方一致に変更
-
-        if result_link and result_link.get('href'):
-            movie_page_url = result_link['href'] # 絶対URLのはず
-            # クエリパラメータなどを除去する場合
-            movie_page_url = movie_page_url.split('?')[0]
+        debug_capture.capture('yahoo', 'search', search_url, response.content) # --capture-dir / --debug 指定時のみ保存
+
+        # ヘッダー / ホストごとに記憶した文字コードを使い、ページごとの文字コード推定を省く
+        encoding = page_encoding.encoding_for(search_url, response.content, response.headers.get('Content-Type'))
+        movie_page_url = parse_search_results(response.content, encoding)
+        if movie_page_url:
             logging.info(f"  [Yahoo!映画] 作品ページURL発見: {movie_page_url}")
             return movie_page_url
         else:
             logging.warning(f"  [Yahoo!映画] 検索結果HTML内で作品ページリンクが見つかりませんでした: {title}")
             return None
+    except http_client.RequestCancelled:
+        logging.debug(f"  [Yahoo!映画] 検索を取りやめました (他のサイトで取得済み): {title}")
+        return http_client.FETCH_FAILED
     except requests.exceptions.Timeout:
         logging.error(f"[Yahoo!映画] 検索タイムアウト: {title} ({search_url})")
-        return None
+        return http_client.FETCH_FAILED
     except requests.exceptions.RequestException as e:
         logging.error(f"[Yahoo!映画] 検索リクエストエラー ({title}): {e}")
-        return None
+        return http_client.FETCH_FAILED
     except Exception as e:
         logging.error(f"[Yahoo!映画] 検索処理中の予期せぬエラー ({title}): {e}")
-        return None
-
-def scrape_movie_details(movie_page_url, debug_mode=False):
-    """Yahoo!映画ページのURLから詳細情報を標準化された辞書形式で取得する (推測)"""
-    details = {
+        return http_client.FETCH_FAILED
+
+def parse_search_results(content, encoding=None):
+    """検索結果ページのHTMLから最上位の作品ページURLを返す (見つからなければ None)"""
+    soup = html_parser.make_soup(content, parse_only=SEARCH_REGIONS, encoding=encoding)
+    # 例: <div class="sw-CardBase ..."> <a class="sw-Card__titleInner" href="https://movies.yahoo.co.jp/movie/..."> ... </a> </div>
+    result_link = SEARCH_RESULT_LINK.select_one(soup)
+    if result_link and result_link.get('href'):
+        # 絶対URLのはず。クエリパラメータなどは除去する
+        return result_link['href'].split('?')[0]
+    return None
+
+# 作品ページから取得できる列。対象選定で、このサイトでは埋められない行を除くのに使う (movie_site_coverage.py)
+COVERAGE = ('year', 'director', 'summary', 'cast', 'producer', 'cinematographer', 'country',
+            'runtime', 'distributor', 'full_staff', 'full_cast', 'reviews')
+
+def _empty_details():
+    return {
         'source': 'yahoo.co.jp', # 情報源
         'year': None, 'director': None, 'summary': None, 'cast': None,
         'producer': None, 'cinematographer': None, 'country': None,
         'runtime': None, 'distributor': None, 'full_staff': None,
         'full_cast': None, 'reviews': None
     }
+
+def scrape_movie_details(movie_page_url, extract=None):
+    """Yahoo!映画ページのURLから詳細情報を標準化された辞書形式で取得する (推測)
+    extract: 取得したHTMLの解析関数 (デフォルト: extract_movie_details。ワーカープロセスで解析する場合に差し替える)
+    取得に失敗した場合は http_client.FETCH_FAILED を返す"""
+    details = _empty_details()
     if not movie_page_url or not movie_page_url.startswith("https://movies.yahoo.co.jp"):
         logging.warning(f"無効なURLのためスキップ: {movie_page_url}")
         return details
 
     try:
         logging.info(f"[Yahoo!映画] 詳細情報取得中: {movie_page_url}")
-        response = requests.get(movie_page_url, headers=HEADERS, timeout=15)
+        response = http_client.fetch(movie_page_url)
         response.raise_for_status()
 
-        # --- デバッグ用HTML保存 ---
-        if debug_mode:
-            try:
-                debug_filename = "_debug_last_scraped_page_yahoo.html"
-                with open(debug_filename, "wb") as f:
-                    f.write(response.content)
-                logging.debug(f"  [Yahoo!映画] デバッグ用にHTMLを '{debug_filename}' に保存しました。")
-            except Exception as e:
-                logging.warning(f"  [Yahoo!映画] デバッグ用HTMLファイルの保存中にエラー: {e}")
-        # --- デバッグ用ここまで ---
+        debug_capture.capture('yahoo', 'detail', movie_page_url, response.content) # --capture-dir / --debug 指定時のみ保存
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+        encoding = page_encoding.encoding_for(movie_page_url, response.content, response.headers.get('Content-Type'))
+        return (extract or extract_movie_details)(response.content, movie_page_url, encoding)
+
+    except http_client.RequestCancelled:
+        logging.debug(f"  [Yahoo!映画] 詳細取得を取りやめました (他のサイトで取得済み): {movie_page_url}")
+        return http_client.FETCH_FAILED
+    except requests.exceptions.Timeout:
+        logging.error(f"[Yahoo!映画] 詳細取得タイムアウト: {movie_page_url}")
+        return http_client.FETCH_FAILED
+    except requests.exceptions.RequestException as e:
+        logging.error(f"[Yahoo!映画] 詳細取得リクエストエラー ({movie_page_url}): {e}")
+        return http_client.FETCH_FAILED
+    except Exception as e:
+        logging.error(f"[Yahoo!映画] 詳細取得処理中の予期せぬエラー ({movie_page_url}): {e}")
+        return http_client.FETCH_FAILED
+
+def extract_movie_details(content, movie_page_url=None, encoding=None):
+    """作品ページのHTMLから詳細情報を抽出する (ネットワークアクセスなし)。
+    JSON-LD を先に読み、HTMLは JSON-LD で埋まらなかった項目の領域だけを解析する (すべて埋まれば解析しない)"""
+    def dom_extract(fields):
+        return _extract_from_html(content, movie_page_url, encoding, DETAIL_FIELD_REGIONS.strainer(fields))
+    return structured_data.extract_details(content, _empty_details(), dom_extract, encoding, COVERAGE)
+
+def _extract_from_html(content, movie_page_url=None, encoding=None, regions=DETAIL_REGIONS):
+    """作品ページのHTMLを解析して詳細情報を抽出する (regions: 解析する領域。領域外の項目は None のまま)"""
+    details = _empty_details()
+    try:
+        soup = html_parser.make_soup(content, parse_only=regions, encoding=encoding)
 
         # --- !! 各種情報抽出 (推測セレクタ) !! ---
 
         # タイトル (h1などから取得確認用)
-        title_tag = soup.select_one('title') # <title>タグから取得試行
+        title_tag = PAGE_TITLE.select_one(soup) # <title>タグから取得試行
         page_title = title_tag.text.strip() if title_tag else "[タイトル不明]"
         logging.debug(f"  ページタイトル: {page_title}")
 
@@ -105,7 +176,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
         # 例: <p class="basicInfo"><span>YYYY年公開</span> / <span>国名</span> / <span>XX分</span></p>
         # または <dl class="spec"><dt>公開</dt><dd>YYYY年</dd>...</dl>
         basic_info_text = ""
-        spec_dl = soup.select_one('dl.spec, section[data-test=detail-spec] dl') # 推測
+        spec_dl = SPEC_DL.select_one(soup)
         if spec_dl:
              dds = spec_dl.find_all('dd')
              if len(dds) > 0 : basic_info_text = " / ".join(dd.get_text(" ", strip=True) for dd in dds)
@@ -125,7 +196,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
                  details['distributor'] = dt_map['配給'].get_text(" ", strip=True)
 
         else: # dl がない場合、pタグを探す
-            basic_info_tag = soup.select_one('p.basicInfo, .Header__info') # 推測
+            basic_info_tag = BASIC_INFO.select_one(soup)
             if basic_info_tag:
                 basic_info_text = basic_info_tag.get_text(separator=" / ", strip=True)
                 logging.debug(f"  基本情報テキスト(p): {basic_info_text}")
@@ -146,18 +217,18 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
 
         # スタッフ情報
         # 例: <section id="staff"> <dl><dt>監督</dt><dd><a>名前</a></dd>...</dl> </section>
-        staff_section = soup.select_one('section#staff, section[data-test=detail-staff]') # 推測
+        staff_section = STAFF_SECTION.select_one(soup)
         if staff_section:
             full_staff_dict = {}
             directors = []
             producers = []
             cinematographers = []
-            dts = staff_section.select('dt')
+            dts = STAFF_ROLES.select(staff_section)
             for dt in dts:
                 role = dt.get_text(strip=True)
                 dd = dt.find_next_sibling('dd')
                 if role and dd:
-                    names = [a.get_text(strip=True) for a in dd.select('a')]
+                    names = [a.get_text(strip=True) for a in STAFF_NAMES.select(dd)]
                     if not names: names = [dd.get_text(" ", strip=True)] # aタグがない場合
 
                     if names:
@@ -175,7 +246,7 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
 
         # あらすじ
         # 例: <section id="story"><p>...</p></section> または <p class="text" data-test="story">...</p>
-        story_tag = soup.select_one('section#story p, p[data-test=story], div.Story__content') # 推測
+        story_tag = STORY.select_one(soup)
         if story_tag:
             summary_text = story_tag.get_text(" ", strip=True)
             details['summary'] = summary_text[:300] + ('...' if len(summary_text) > 300 else '')
@@ -183,16 +254,16 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
 
         # キャスト情報
         # 例: <section id="cast"> <ul><li><p class="name"><a>俳優名</a></p><p class="role">役名</p></li></ul></section>
-        cast_section = soup.select_one('section#cast, section[data-test=detail-cast]') # 推測
+        cast_section = CAST_SECTION.select_one(soup)
         if cast_section:
             full_cast_list = []
             main_cast_strings = []
             # <li> またはそれに類する要素を探す
-            cast_items = cast_section.select('li, div.Cast__item') # 推測
+            cast_items = CAST_ITEMS.select(cast_section)
             for item in cast_items:
                 # 名前と役名を探すセレクタ (推測)
-                name_tag = item.select_one('.name a, .Cast__name, p a')
-                role_tag = item.select_one('.role, .Cast__role, p + p') # 名前の次に来る要素を仮定
+                name_tag = CAST_NAME.select_one(item)
+                role_tag = CAST_ROLE.select_one(item)
 
                 actor_name = name_tag.get_text(strip=True) if name_tag else None
                 role_name = role_tag.get_text(strip=True) if role_tag else None
@@ -212,11 +283,11 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
 
         # レビュー情報 (スコアと件数)
         # 例: <span class="ratingValue">4.1</span> <span class="reviewCount">(123件)</span>
-        review_section = soup.select_one('.Review__average, section[data-test=detail-review-score]') # 推測
+        review_section = REVIEW_SECTION.select_one(soup)
         if review_section:
             reviews_dict = {}
-            score_tag = review_section.select_one('.Rating__value, .Score__value') # 推測
-            count_tag = review_section.select_one('.Review__count, .Score__text em') # 推測
+            score_tag = REVIEW_SCORE.select_one(review_section)
+            count_tag = REVIEW_COUNT.select_one(review_section)
             if score_tag:
                  try: reviews_dict['average_score'] = float(score_tag.text.strip())
                  except ValueError: pass
@@ -230,12 +301,6 @@ def scrape_movie_details(movie_page_url, debug_mode=False):
 
         return details
 
-    except requests.exceptions.Timeout:
-        logging.error(f"[Yahoo!映画] 詳細取得タイムアウト: {movie_page_url}")
-        return details
-    except requests.exceptions.RequestException as e:
-        logging.error(f"[Yahoo!映画] 詳細取得リクエストエラー ({movie_page_url}): {e}")
-        return details
     except Exception as e:
         logging.error(f"[Yahoo!映画] 詳細取得処理中の予期せぬエラー ({movie_page_url}): {e}")
         return details 
\ No newline at end of file
@@ -0,0 +1,70 @@
+# 取得データの反映 (utils.merge_records / update_dataframe_from_json): 欠損セルにのみ、先に現れた有効な値を入れる
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_scraper_utils as utils # noqa: E402
+
+
+def _catalogue():
+    df = pd.DataFrame({
+        'movie_id': ['001', '002', '003'],
+        'title': ['作品A', '作品B', '作品C'],
+        'year': [2001, np.nan, np.nan],
+        'director': ['既存の監督', np.nan, np.nan],
+        'summary': [np.nan, np.nan, np.nan],
+    })
+    return utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+
+
+def test_merge_records_fills_only_missing_cells_with_the_first_valid_value():
+    df_indexed = _catalogue().set_index('movie_id')
+    records = [
+        {'movie_id': '001', 'year': 1999, 'director': '上書きしない', 'summary': 'あらすじA'},
+        {'movie_id': '001', 'year': 1990},
+        {'movie_id': '002', 'year': None, 'director': '監督B'},
+        {'movie_id': '002', 'year': 2002.7, 'director': '後の監督'},
+        {'movie_id': '999', 'year': 2000},
+    ]
+
+    updated = utils.merge_records(df_indexed, records, ['year', 'director', 'summary'])
+
+    # 既存の値しかないレコード・DataFrameにない movie_id のレコードは更新に数えない
+    assert list(updated) == [True, False, True, True, False]
+    assert df_indexed.loc['001', 'year'] == 2001 and df_indexed.loc['001', 'director'] == '既存の監督'
+    assert df_indexed.loc['001', 'summary'] == 'あらすじA'
+    # 同じ movie_id のレコードは先に現れた有効な値を採用し、year は小数部を切り捨てた整数にする
+    assert df_indexed.loc['002', 'director'] == '監督B' and df_indexed.loc['002', 'year'] == 2002
+    assert df_indexed['year'].dtype == 'Int16'
+    assert df_indexed.loc['003'].drop('title').isna().all()
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, utils.JSON_MERGE_BATCH_SIZE])
+def test_update_dataframe_from_json_counts_records_that_filled_a_cell(monkeypatch, caplog, batch_size):
+    monkeypatch.setattr(utils, 'JSON_MERGE_BATCH_SIZE', batch_size)
+    df = _catalogue()
+    json_data = [
+        {'movie_id': '001', 'director': '上書きしない'},
+        {'movie_id': '002', 'director': '監督B', 'full_cast': [{'name': '俳優', 'role': None}]},
+        {'movie_id': '002', 'director': '後の監督'},
+        {'movie_id': '003', 'year': '不明'},
+        {'movie_id': '999', 'year': 2000},
+        '無効な要素',
+        {'title': 'movie_id なし'},
+    ]
+
+    with caplog.at_level(logging.INFO):
+        result = utils.update_dataframe_from_json(df, json_data)
+
+    # バッチの境界によらず、先に反映した値が残る。数値に変換できない year も更新を試みた回数に数える (従来の集計)
+    assert "合計 2 回のデータ更新" in caplog.text
+    assert result.set_index('movie_id').loc['002', 'director'] == '監督B'
+    assert result.set_index('movie_id').loc['002', 'full_cast'] == '[{"name": "俳優", "role": null}]'
+    assert pd.isna(result.set_index('movie_id').loc['003', 'year'])
+    assert list(result.columns) == list(df.columns)
+    assert df['director'].isna().sum() == 2 # 元のDataFrameは変更しない
@@ -0,0 +1,83 @@
+# --resume: ジャーナルに記録済みの結果はネットワークなしで反映し、取得に失敗したタイトルだけを再取得する
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_scraper_utils as utils # noqa: E402
+import movie_scrape_runner as runner # noqa: E402
+import movie_run_journal as run_journal # noqa: E402
+from scrapers import http_client # noqa: E402
+
+
+def _args(tmp_path, *options):
+    parser = utils.setup_common_parser()
+    parser.add_argument('--limit', type=int, default=9999)
+    return parser.parse_args(['--input', 'in.csv', '--output', str(tmp_path / 'out.csv'), *options])
+
+
+def _site(searched, failing=()):
+    """タイトルを記録し、failing のタイトルは検索に失敗 (タイムアウトなど) するサイト"""
+    def search(title):
+        searched.append(title)
+        if title in failing:
+            return http_client.FETCH_FAILED
+        return None if title == '見つからない' else f"https://example.com/{title}"
+
+    def scrape(url, extract=None):
+        return {'year': 2001, 'director': f"監督 ({url.rsplit('/', 1)[1]})", 'source': 'example.com'}
+
+    return runner.SiteConfig('example.com', 'テスト', search, scrape, None, 'example.com', frozenset({'year', 'director'}))
+
+
+def _catalogue():
+    df = pd.DataFrame({
+        'movie_id': ['001', '002', '003'],
+        'title': ['作品A', '見つからない', '作品C'],
+        'year': [np.nan] * 3,
+        'director': [np.nan] * 3,
+        'summary': [np.nan] * 3,
+    })
+    return utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+
+
+def _run(tmp_path, site, *options):
+    df = _catalogue()
+    with utils.RecordWriter(str(tmp_path / 'records.jsonl'), 'jsonl') as record_writer:
+        df, _, _ = runner.run_web_scraping(df, df[['movie_id', 'title']], site, _args(tmp_path, *options), record_writer)
+    return df.set_index('movie_id')
+
+
+def test_resume_skips_recorded_rows_and_retries_fetch_errors(tmp_path):
+    journal_path = str(tmp_path / 'run.journal.jsonl')
+    searched = []
+    _run(tmp_path, _site(searched, failing={'作品C'}), '--journal', journal_path)
+
+    # 取得に失敗したタイトルはジャーナルに記録しない
+    entries = list(run_journal.read_journal(journal_path))
+    assert [(e['movie_id'], e['status']) for e in entries] == [('001', run_journal.STATUS_OK),
+                                                              ('002', run_journal.STATUS_NOT_FOUND)]
+
+    searched.clear()
+    df_indexed = _run(tmp_path, _site(searched), '--journal', journal_path, '--resume')
+
+    assert searched == ['作品C']
+    assert df_indexed.loc['001', 'director'] == '監督 (作品A)' # ジャーナルから反映
+    assert df_indexed.loc['003', 'director'] == '監督 (作品C)'
+    assert pd.isna(df_indexed.loc['002', 'director'])
+    assert len(list(run_journal.read_journal(journal_path))) == 3
+
+
+def test_resume_ignores_a_truncated_last_line(tmp_path):
+    journal_path = str(tmp_path / 'run.journal.jsonl')
+    _run(tmp_path, _site([]), '--journal', journal_path)
+    with open(journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"site": "example.com", "movie_id": "00') # 書き込み途中で中断された行
+
+    searched = []
+    _run(tmp_path, _site(searched), '--journal', journal_path, '--resume')
+
+    assert searched == []
+    assert [e['movie_id'] for e in run_journal.read_journal(journal_path)] == ['001', '002', '003']
@@ -0,0 +1,54 @@
+# 列の型 (utils.COLUMN_DTYPES): 値を失わずに変換でき、CSVに保存して読み直しても同じ値になる
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_scraper_utils as utils # noqa: E402
+
+
+def test_schema_values_round_trip_through_the_csv(tmp_path):
+    df = pd.DataFrame({
+        'movie_id': ['001', '002'],
+        'title': ['作品A', '作品B'],
+        'year': [2001.0, np.nan],
+        'runtime': [120.0, np.nan],
+        'country': ['日本', np.nan],
+        'summary': ['あらすじ', np.nan],
+    })
+    df = utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+    assert df['year'].dtype == 'Int16' and df['runtime'].dtype == 'Int32'
+    assert isinstance(df['country'].dtype, pd.CategoricalDtype)
+
+    path = tmp_path / 'out.csv'
+    utils.save_csv(df, path)
+    # 欠損を含む整数の列も "2001.0" ではなく整数として書き出す
+    assert '001,作品A,2001,' in path.read_text(encoding='shift_jis')
+
+    reloaded = utils.check_and_add_columns(utils.load_csv(path), utils.DEFAULT_OUTPUT_COLUMNS)
+    pd.testing.assert_frame_equal(reloaded, df)
+
+
+@pytest.mark.parametrize('values, dtype, fits', [
+    ([2001.0, np.nan], 'Int16', True),
+    ([2001.5], 'Int16', False),
+    ([70000], 'Int16', False),
+    ([70000], 'Int32', True),
+    (['2001'], 'Int16', False),
+    ([True], 'Int16', False),
+    (['あらすじ'], utils.TEXT_DTYPE, True),
+])
+def test_fits_dtype(values, dtype, fits):
+    assert utils._fits_dtype(pd.Series(values), dtype) is fits
+
+
+def test_apply_schema_keeps_columns_that_would_lose_values():
+    df = pd.DataFrame({'movie_id': ['001', '002'], 'year': [2001.5, np.nan], 'runtime': [90.0, np.nan]})
+
+    df = utils.apply_schema(df)
+
+    assert df['year'].dtype == 'float64' and df.loc[0, 'year'] == 2001.5
+    assert df['runtime'].dtype == 'Int32' and df.loc[0, 'runtime'] == 90
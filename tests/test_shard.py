@@ -0,0 +1,50 @@
+# --shard i/N: movie_id のハッシュで対象を N 個に分け、各シャードは重複なくすべての行を分担する
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_scraper_utils as utils # noqa: E402
+import movie_scrape_runner as runner # noqa: E402
+
+
+def _args(*options):
+    parser = utils.setup_common_parser()
+    parser.add_argument('--limit', type=int, default=9999)
+    return parser.parse_args(['--input', 'in.csv', '--output', 'out.csv', *options])
+
+
+@pytest.mark.parametrize('count', [1, 3, 8])
+def test_shards_are_disjoint_and_cover_every_movie_id(count):
+    movie_ids = pd.Series([f"{i:05d}" for i in range(1000)])
+
+    masks = [utils.in_shard(movie_ids, (index, count)) for index in range(count)]
+
+    assert (sum(mask.astype(int) for mask in masks) == 1).all()
+
+
+def test_sharded_targets_partition_the_unsharded_targets():
+    df = pd.DataFrame({
+        'movie_id': [f"{i:03d}" for i in range(60)],
+        'title': [f"作品{i}" for i in range(60)],
+        'year': [2000 if i % 5 == 0 else np.nan for i in range(60)],
+        'director': ['監督' if i % 5 == 0 else np.nan for i in range(60)],
+        'summary': ['あらすじ' if i % 5 == 0 else np.nan for i in range(60)],
+    })
+    df = utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+    expected = set(runner.select_targets(df, None, _args())['movie_id'])
+
+    shards = [set(runner.select_targets(df, None, _args('--shard', f"{index}/3"))['movie_id']) for index in range(3)]
+
+    assert sum(len(shard) for shard in shards) == len(expected) == 48
+    assert set().union(*shards) == expected
+
+
+@pytest.mark.parametrize('value', ['3/3', '-1/3', '1', 'a/b', '0/0'])
+def test_parse_shard_rejects_invalid_values(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        utils.parse_shard(value)
@@ -0,0 +1,60 @@
+# --site-coverage の対象選定: 欠損している主要項目を、過去の取得データで取得率の低いサイトでは取得しない
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_scraper_utils as utils # noqa: E402
+import movie_scrape_runner as runner # noqa: E402
+import movie_site_coverage as site_coverage # noqa: E402
+
+
+def _args(coverage_dir, *options):
+    parser = utils.setup_common_parser()
+    parser.add_argument('--limit', type=int, default=9999)
+    return parser.parse_args(['--input', 'in.csv', '--output', 'out.csv', '--coverage-dir', str(coverage_dir), *options])
+
+
+def _catalogue():
+    df = pd.DataFrame({
+        'movie_id': ['001', '002', '003'],
+        'title': ['あらすじだけない', '年がない', 'そろっている'],
+        'year': [2001, np.nan, 2003],
+        'director': ['監督A', '監督B', '監督C'],
+        'summary': [np.nan, 'あらすじ', 'あらすじ'],
+    })
+    return utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+
+
+def _write_records(directory, site_name, count=site_coverage.MIN_RECORDS):
+    """year / director / cast は取れるが summary は一度も取れていないサイトの取得データ"""
+    records = [{'movie_id': str(i), 'title': f"作品{i}", 'year': 2000, 'director': '監督', 'summary': None, 'cast': '俳優'}
+               for i in range(count)]
+    path = os.path.join(directory, f"MovieData_{site_name}_20240101000000.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False)
+
+
+def test_default_coverage_skips_rows_missing_only_unfillable_major_columns(tmp_path):
+    site = runner.SITE_CONFIGS['filmarks.com']
+    _write_records(tmp_path, site.name)
+    before = site_coverage.get_stats()
+
+    target_df = runner.select_targets(_catalogue(), site, _args(tmp_path))
+
+    # 主要項目のうち summary しか欠けていない 001 は、summary を埋められないサイトでは対象にしない
+    # (cast など主要項目以外の欠損列を埋められても、対象選定の理由になった列が埋まらないため)
+    assert list(target_df['movie_id']) == ['002']
+    assert site_coverage.get_stats()['skipped_rows'] - before['skipped_rows'] == 1
+
+
+def test_coverage_off_keeps_every_row_missing_a_major_column(tmp_path):
+    site = runner.SITE_CONFIGS['filmarks.com']
+    _write_records(tmp_path, site.name)
+
+    target_df = runner.select_targets(_catalogue(), site, _args(tmp_path, '--site-coverage', 'off'))
+
+    assert list(target_df['movie_id']) == ['001', '002']
@@ -0,0 +1,68 @@
+# 構造化データ (JSON-LD) 優先の抽出: JSON-LD で埋まらなかった項目の領域だけをHTMLから解析する
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scrapers import structured_data # noqa: E402
+from benchmarks.bench_parser import PARSERS, load_expected, load_fixture # noqa: E402
+
+COVERAGE = ('year', 'director', 'summary', 'cast', 'full_cast', 'country')
+
+
+def _page(movie):
+    block = json.dumps({'@context': 'https://schema.org', '@type': 'Movie', **movie}, ensure_ascii=False)
+    return f'<html><head><script type="application/ld+json">{block}</script></head><body></body></html>'.encode('utf-8')
+
+
+def _extract(content, mode):
+    calls = []
+
+    def dom_extract(fields):
+        calls.append(fields)
+        return {'country': '日本', 'cast': '俳優A (役A)', 'full_cast': [{'name': '俳優A', 'role': '役A'}]}
+
+    structured_data.configure(mode)
+    try:
+        details = structured_data.extract_details(content, dict.fromkeys(COVERAGE), dom_extract, 'utf-8', COVERAGE)
+    finally:
+        structured_data.configure(None)
+    return details, calls
+
+
+FULL_MOVIE = {'dateCreated': '2001-01-01', 'director': {'name': '監督A'}, 'description': 'あらすじ',
+              'actor': [{'name': '俳優A'}], 'countryOfOrigin': '日本'}
+
+
+def test_fast_skips_html_when_json_ld_fills_every_field(monkeypatch):
+    monkeypatch.setattr(structured_data, 'extract_json_ld',
+                        lambda text: {'year': 2001, 'director': '監督A', 'summary': 'あらすじ', 'country': '日本',
+                                      'cast': '俳優A', 'full_cast': [{'name': '俳優A', 'role': None}]})
+    details, calls = _extract(_page(FULL_MOVIE), 'fast')
+
+    assert calls == []
+    assert details['cast'] == '俳優A'
+
+
+@pytest.mark.parametrize('mode, fields', [
+    ('fast', ['country']),
+    ('merge', ['country', 'cast', 'full_cast']),
+])
+def test_html_is_parsed_only_for_fields_missing_after_json_ld(mode, fields):
+    details, calls = _extract(_page(FULL_MOVIE), mode)
+
+    assert calls == [fields]
+    assert details['year'] == 2001 and details['country'] == '日本'
+    # 役名のあるHTMLのキャストを優先する (fast では JSON-LD にあるキャストの領域は解析しない)
+    assert details['cast'] == '俳優A (役A)'
+
+
+@pytest.mark.parametrize('name', [name for name in PARSERS if name.endswith('_detail')])
+def test_default_mode_keeps_every_field_of_the_html_extraction(name):
+    result = PARSERS[name](load_fixture(name))
+    expected = load_expected()[name]
+
+    assert [field for field, value in result.items() if value is None and expected[field] is not None] == []
+    assert result['cast'] == expected['cast'] and result['full_cast'] == expected['full_cast']
@@ -0,0 +1,74 @@
+# 同じタイトルの行は1回だけ検索・取得し、結果を同じタイトルのすべての movie_id に反映する
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_scraper_utils as utils # noqa: E402
+import movie_scrape_runner as runner # noqa: E402
+
+
+def _args(tmp_path, *options):
+    parser = utils.setup_common_parser()
+    parser.add_argument('--limit', type=int, default=9999)
+    return parser.parse_args(['--input', 'in.csv', '--output', str(tmp_path / 'out.csv'), *options])
+
+
+def _site(searched):
+    def search(title):
+        searched.append(title)
+        return f"https://example.com/{utils.normalize_title(title)}"
+
+    def scrape(url, extract=None):
+        return {'year': 1954, 'director': '本多猪四郎', 'source': 'example.com'}
+
+    return runner.SiteConfig('example.com', 'テスト', search, scrape, None, 'example.com', frozenset({'year', 'director'}))
+
+
+def _catalogue():
+    df = pd.DataFrame({
+        'movie_id': ['001', '002', '003', '004', '005'],
+        'title': ['ゴジラ', 'ｺﾞｼﾞﾗ', ' ゴジラ ', '別の映画', np.nan],
+        'year': [np.nan, np.nan, 1984, np.nan, np.nan],
+        'director': [np.nan] * 5,
+        'summary': [np.nan] * 5,
+    })
+    return utils.check_and_add_columns(df, utils.DEFAULT_OUTPUT_COLUMNS)
+
+
+def test_group_titles_groups_normalized_titles_but_not_empty_ones():
+    unique_df, duplicates = runner.group_titles(_catalogue())
+
+    assert list(unique_df['movie_id']) == ['001', '004', '005']
+    assert duplicates == {'001': [('002', 'ｺﾞｼﾞﾗ'), ('003', ' ゴジラ ')]}
+
+
+def test_result_is_fanned_out_to_every_duplicate_row(tmp_path):
+    df = _catalogue().head(4)
+    searched = []
+    records_path = tmp_path / 'records.jsonl'
+    with utils.RecordWriter(str(records_path), 'jsonl') as record_writer:
+        df, _, update_count = runner.run_web_scraping(df, df[['movie_id', 'title']], _site(searched),
+                                                      _args(tmp_path), record_writer)
+
+    assert searched == ['ゴジラ', '別の映画']
+    df_indexed = df.set_index('movie_id')
+    assert (df_indexed.loc[['001', '002', '003', '004'], 'director'] == '本多猪四郎').all()
+    assert df_indexed.loc['003', 'year'] == 1984 # 既存の値は上書きしない
+    assert update_count == 4
+    # 抽出データも各 movie_id とその行のタイトルで書き出す
+    records = list(utils.iter_jsonl(str(records_path)))
+    assert [(r['movie_id'], r['title']) for r in records] == [('001', 'ゴジラ'), ('002', 'ｺﾞｼﾞﾗ'), ('003', ' ゴジラ '),
+                                                              ('004', '別の映画')]
+
+
+def test_no_title_dedup_fetches_every_row(tmp_path):
+    df = _catalogue().head(3)
+    searched = []
+    with utils.RecordWriter(str(tmp_path / 'records.jsonl'), 'jsonl') as record_writer:
+        runner.run_web_scraping(df, df[['movie_id', 'title']], _site(searched), _args(tmp_path, '--no-title-dedup'),
+                                record_writer)
+
+    assert searched == ['ゴジラ', 'ｺﾞｼﾞﾗ', ' ゴジラ ']
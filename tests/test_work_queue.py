@@ -0,0 +1,63 @@
+# 作業キュー (movie_work_queue.WorkQueue): リースの期限切れ・試行回数の上限・手放したリースの再処理
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import movie_run_journal as run_journal # noqa: E402
+import movie_work_queue as work_queue # noqa: E402
+
+SITE = 'example.com'
+TARGETS = pd.DataFrame({'movie_id': ['001', '002', '003'], 'title': ['作品A', '作品B', '作品C']})
+
+
+def _queue(path, owner, **kwargs):
+    return work_queue.WorkQueue(str(path), owner=owner, **kwargs)
+
+
+def test_leases_are_not_shared_until_they_expire(tmp_path):
+    path = tmp_path / 'queue.sqlite'
+    expired = _queue(path, 'worker-a', lease_seconds=-1) # リースした時点で期限切れ
+    active = _queue(path, 'worker-b')
+    assert active.enqueue(SITE, TARGETS) == 3
+    assert expired.enqueue(SITE, TARGETS) == 0
+
+    assert active.lease(SITE, 2) == [('001', '作品A'), ('002', '作品B')]
+    assert expired.lease(SITE, 10) == [('003', '作品C')]
+    # 期限切れのリースは他のワーカーが引き継ぐ
+    assert active.lease(SITE, 10) == [('003', '作品C')]
+    assert active.counts(SITE)[work_queue.STATE_LEASED] == 3
+
+
+def test_expired_leases_fail_after_max_attempts(tmp_path):
+    queue = _queue(tmp_path / 'queue.sqlite', 'worker-a', lease_seconds=-1, max_attempts=2)
+    queue.enqueue(SITE, TARGETS.head(1))
+
+    assert queue.lease(SITE, 10) == [('001', '作品A')]
+    assert queue.lease(SITE, 10) == [('001', '作品A')]
+    assert queue.lease(SITE, 10) == []
+
+    counts = queue.counts(SITE)
+    assert counts[work_queue.STATE_FAILED] == 1 and counts[work_queue.STATE_LEASED] == 0
+    assert queue.next_expiry(SITE) is None
+
+
+def test_release_returns_unrecorded_leases_for_retry(tmp_path):
+    queue = _queue(tmp_path / 'queue.sqlite', 'worker-a', max_attempts=2)
+    queue.enqueue(SITE, TARGETS)
+    queue.lease(SITE, 3)
+    queue.record(SITE, '001', '作品A', run_journal.STATUS_OK, 'https://example.com/1', {'year': 2001})
+
+    # 中断 (count_attempt=False) は試行回数に数えない
+    assert queue.release(SITE, error='中断', count_attempt=False) == 2
+    assert queue.lease(SITE, 10) == [('002', '作品B'), ('003', '作品C')]
+    assert queue.release(SITE, error='取得に失敗') == 2
+    assert queue.lease(SITE, 1) == [('002', '作品B')]
+    # 試行回数が上限に達したものは手放すと失敗にする
+    assert queue.release(SITE, error='取得に失敗') == 1
+
+    counts = queue.counts(SITE)
+    assert counts == {work_queue.STATE_PENDING: 1, work_queue.STATE_LEASED: 0,
+                      work_queue.STATE_DONE: 1, work_queue.STATE_FAILED: 1}
+    assert [record['movie_id'] for record in queue.iter_results(SITE)] == ['001']